@@ -0,0 +1,108 @@
+import unittest
+import numpy as np
+import sys
+import os
+import io
+import copy
+import shutil
+import tempfile
+import contextlib
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark_particionamento as bp
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """
+    Testes unitários para a suíte de benchmarks e a comparação de relatórios.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        """
+        Executa uma vez todos os benchmarks em malhas pequenas.
+        """
+        cls.report = bp.run_benchmarks(sizes=(100, 400), subsets=(2, 8, 128), repeats=1)
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_report_structure(self):
+        """
+        Testa se todos os benchmarks são medidos em todos os tamanhos, com os metadados da máquina.
+        """
+        measured = {(entry['benchmark'], entry['cells'], entry['n_subsets']) for entry in self.report['results']}
+        for name, (_, uses_subsets) in bp.BENCHMARKS.items():
+            for cells in (100, 400):
+                self.assertIn((name, cells, 2 if uses_subsets else None), measured)
+        
+        # k = 128 excede um quarto das colunas ativas das duas malhas
+        self.assertFalse(any(entry['n_subsets'] == 128 for entry in self.report['results']))
+        
+        for entry in self.report['results']:
+            self.assertEqual(entry['status'], 'ok')
+            self.assertEqual(entry['min'], min(entry['times']))
+        for field in ('platform', 'cpu_count', 'python', 'numpy', 'timestamp'):
+            self.assertIn(field, self.report['metadata'])
+    
+    def test_synthetic_inputs(self):
+        """
+        Testa se os dados sintéticos são reprodutíveis e têm aproximadamente o tamanho pedido.
+        """
+        np.testing.assert_array_equal(bp.synthetic_weights(1000, seed=4), bp.synthetic_weights(1000, seed=4))
+        self.assertEqual(bp.synthetic_weights(10000).size, 10000)
+        nx, ny, nz = bp._mesh_shape(10**6)
+        self.assertLess(abs(nx * ny * nz - 10**6) / 10**6, 0.05)
+    
+    def test_save_load_and_compare(self):
+        """
+        Testa a gravação em JSON e a detecção de regressões acima do limiar.
+        """
+        path = os.path.join(self.temp_dir, 'base.json')
+        bp.save_report(self.report, path)
+        baseline = bp.load_report(path)
+        self.assertEqual(baseline['results'], self.report['results'])
+        
+        current = copy.deepcopy(baseline)
+        slow = current['results'][0]
+        slow['min'] = slow['median'] = slow['min'] * 2 + 0.01
+        fast = current['results'][1]
+        fast['min'] = fast['median'] = fast['min'] * 1.05
+        
+        comparison = bp.compare_reports(baseline, current, threshold=0.10)
+        self.assertEqual(len(comparison['rows']), len(baseline['results']))
+        self.assertEqual([row[:3] for row in comparison['regressions']],
+                         [(slow['benchmark'], slow['cells'], slow['n_subsets'])])
+        self.assertEqual(comparison['metadata_differences'], {})
+        
+        # Aumentos abaixo da diferença absoluta mínima não são regressões
+        self.assertEqual(bp.compare_reports(baseline, current, min_seconds=1.0)['regressions'], [])
+    
+    def test_command_line(self):
+        """
+        Testa os comandos `run` e `compare` e o código de saída em caso de regressão.
+        """
+        base = os.path.join(self.temp_dir, 'base.json')
+        new = os.path.join(self.temp_dir, 'new.json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = bp.main(['run', '-o', base, '--benchmarks', 'create_3d_mesh',
+                              'recursive_binary_subset_division_balanced', '--sizes', '100', '--subsets', '2',
+                              '--repeats', '1'])
+        self.assertEqual(status, 0)
+        self.assertEqual(len(bp.load_report(base)['results']), 2)
+        
+        report = bp.load_report(base)
+        for entry in report['results']:
+            entry['min'] = entry['median'] = entry['min'] + 1.0
+        bp.save_report(report, new)
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(bp.main(['compare', base, base]), 0)
+            self.assertEqual(bp.main(['compare', base, new, '--threshold', '0.2']), 1)
+        self.assertIn('REGRESSÃO', output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
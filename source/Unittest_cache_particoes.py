@@ -0,0 +1,151 @@
+import unittest
+import numpy as np
+import sys
+import os
+import shutil
+import tempfile
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import particionamento_por_bissecao as ppb
+import mesh3d as m3d
+import cache_particoes as cp
+
+class TestPartitionCache(unittest.TestCase):
+    """
+    Testes unitários para o cache de partições em dois níveis.
+    """
+    
+    def setUp(self):
+        """
+        Cria mapas de pesos de teste e um diretório temporário para o nível em disco.
+        """
+        rng = np.random.default_rng(3)
+        self.weights = rng.integers(0, 9, size=(10, 12))
+        self.other_weights = rng.integers(0, 9, size=(10, 12))
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """
+        Remove o diretório temporário.
+        """
+        shutil.rmtree(self.temp_dir)
+    
+    def test_memory_hit_returns_same_partition(self):
+        """
+        Testa se uma segunda consulta igual é servida da memória com o mesmo resultado.
+        """
+        cache = cp.PartitionCache()
+        first = cache.partition(self.weights, 4, mask=self.weights > 0)
+        second = cache.partition(self.weights, 4, mask=self.weights > 0)
+        
+        np.testing.assert_array_equal(first.labels, second.labels)
+        self.assertEqual(first.prefixes, second.prefixes)
+        self.assertEqual(set(first.tree), set(second.tree))
+        
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['memory_hits'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+    
+    def test_key_depends_on_content_and_subsets(self):
+        """
+        Testa se a chave muda com os pesos, a máscara e o número de subdomínios,
+        mas não com opções que não alteram o resultado.
+        """
+        state = ppb.PartitionState(self.weights)
+        key = cp.PartitionCache.key(state, 4)
+        
+        self.assertEqual(key, cp.PartitionCache.key(ppb.PartitionState(self.weights.copy()), 4))
+        self.assertEqual(key, cp.PartitionCache.key(state, 4, workers=8))
+        self.assertNotEqual(key, cp.PartitionCache.key(state, 5))
+        self.assertNotEqual(key, cp.PartitionCache.key(ppb.PartitionState(self.other_weights), 4))
+        self.assertNotEqual(key, cp.PartitionCache.key(ppb.PartitionState(self.weights, self.weights > 0), 4))
+    
+    def test_memory_eviction(self):
+        """
+        Testa o descarte LRU do nível em memória.
+        """
+        cache = cp.PartitionCache(max_entries=1)
+        cache.partition(self.weights, 2)
+        cache.partition(self.other_weights, 2)
+        cache.partition(self.weights, 2)
+        
+        stats = cache.stats()
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['memory_evictions'], 2)
+        self.assertEqual(stats['memory_entries'], 1)
+    
+    def test_disk_tier(self):
+        """
+        Testa se uma nova instância encontra no disco a partição gravada por outra.
+        """
+        cache = cp.PartitionCache(cache_dir=self.temp_dir)
+        expected = cache.partition(self.weights, 3, refine=0.05)
+        
+        fresh = cp.PartitionCache(cache_dir=self.temp_dir)
+        restored = fresh.partition(self.weights, 3, refine=0.05)
+        
+        np.testing.assert_array_equal(restored.labels, expected.labels)
+        self.assertEqual(restored.prefixes, expected.prefixes)
+        self.assertEqual(restored.cut_report, expected.cut_report)
+        for report in restored.cut_report.values():
+            self.assertIsInstance(report['moves'], int)
+            self.assertIsInstance(report['deviation'], float)
+            self.assertIsInstance(report['balanced'], bool)
+        self.assertEqual(fresh.stats()['disk_hits'], 1)
+        self.assertEqual(fresh.stats()['misses'], 0)
+        
+        # O estado restaurado pode ser reparticionado a partir da árvore armazenada
+        restored.repartition(self.weights, tolerance=0.05)
+        self.assertEqual(restored.recut_prefixes, [])
+    
+    def test_disk_tier_3d(self):
+        """
+        Testa a gravação e a leitura em disco de partições de malhas 3D, com eixos de três componentes.
+        """
+        mesh = m3d.create_3d_mesh()
+        for n_subsets in (2, 3, 4):
+            expected = cp.PartitionCache(cache_dir=self.temp_dir).partition(mesh, n_subsets, mask=mesh > 0)
+            fresh = cp.PartitionCache(cache_dir=self.temp_dir)
+            restored = fresh.partition(mesh, n_subsets, mask=mesh > 0)
+            
+            self.assertEqual(fresh.stats()['disk_hits'], 1)
+            np.testing.assert_array_equal(restored.labels, expected.labels)
+            self.assertEqual(sorted(restored.tree), sorted(expected.tree))
+            for prefix, axis in expected.tree.items():
+                if axis is None:
+                    self.assertIsNone(restored.tree[prefix])
+                else:
+                    np.testing.assert_allclose(restored.tree[prefix], axis)
+                    self.assertEqual(len(restored.tree[prefix]), 3)
+    
+    def test_disk_size_limit(self):
+        """
+        Testa o descarte de arquivos quando o limite de tamanho do disco é excedido.
+        """
+        cache = cp.PartitionCache(cache_dir=self.temp_dir, max_disk_bytes=1)
+        cache.partition(self.weights, 2)
+        cache.partition(self.other_weights, 2)
+        
+        stats = cache.stats()
+        self.assertEqual(stats['disk_evictions'], 1)
+        self.assertEqual(len(os.listdir(self.temp_dir)), 1)
+    
+    def test_dict_api_uses_cache(self):
+        """
+        Testa a opção de cache da API de dicionários.
+        """
+        input_dict = ppb.generate_input_synthetic_dictionary(5, 6)
+        cache = cp.PartitionCache()
+        
+        result = ppb.recursive_binary_subset_division_balanced(input_dict, 3, cache=cache)
+        cached = ppb.recursive_binary_subset_division_balanced(input_dict, 3, cache=cache)
+        
+        self.assertEqual(result, cached)
+        self.assertEqual(result, ppb.recursive_binary_subset_division_balanced(input_dict, 3))
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import itertools
+import numpy as np
+import sys
+import os
+from collections import deque
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import particionamento_por_bissecao as ppb
+import conectividade as conn
+
+def _count_components_bfs(labels, connectivity):
+    """Contagem de referência por busca em largura sobre a grade de rótulos."""
+    offsets = [offset for offset in itertools.product((-1, 0, 1), repeat=labels.ndim)
+               if any(offset) and (connectivity in (8, 26) or sum(map(abs, offset)) == 1)]
+    seen = np.zeros(labels.shape, dtype=bool)
+    count = 0
+    for cell in zip(*np.nonzero(labels >= 0)):
+        if seen[cell]:
+            continue
+        count += 1
+        seen[cell] = True
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            for offset in offsets:
+                other = tuple(a + b for a, b in zip(current, offset))
+                if all(0 <= a < size for a, size in zip(other, labels.shape)) and not seen[other] \
+                        and labels[other] == labels[current]:
+                    seen[other] = True
+                    queue.append(other)
+    return count
+
+class TestConnectivity(unittest.TestCase):
+    """
+    Testes unitários para a rotulação vetorizada de componentes conectados.
+    """
+    
+    def test_label_components_stencils(self):
+        """
+        Testa a rotulação em 2D e 3D, com as duas vizinhanças, contra uma busca em largura.
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            ndim = int(rng.choice([2, 3]))
+            labels = rng.integers(-1, 3, size=tuple(rng.integers(1, 8, ndim)))
+            for connectivity in conn._CONNECTIVITIES[ndim]:
+                components, n_components = conn.label_components(labels, connectivity)
+                self.assertEqual(n_components, _count_components_bfs(labels, connectivity))
+                self.assertTrue(np.all((components >= 0) == (labels >= 0)))
+    
+    def test_diagonal_mask(self):
+        """
+        Testa uma diagonal: 4 componentes com 4 vizinhos e 1 componente com 8 vizinhos.
+        """
+        mask = np.eye(4, dtype=bool)
+        
+        components, n_components = conn.label_components(mask)
+        self.assertEqual(n_components, 4)
+        np.testing.assert_array_equal(components[mask], [0, 1, 2, 3])
+        self.assertFalse(conn.is_connected(mask))
+        self.assertTrue(conn.is_connected(mask, connectivity=8))
+        self.assertTrue(conn.is_connected(np.zeros((3, 3), dtype=bool)))
+        
+        with self.assertRaises(ValueError):
+            conn.label_components(mask, connectivity=6)
+    
+    def test_components_per_label(self):
+        """
+        Testa a contagem de componentes por rótulo, inclusive para rótulos ausentes.
+        """
+        labels = np.array([[0, 1, 0, -1],
+                           [0, 1, 1, -1]])
+        
+        np.testing.assert_array_equal(conn.components_per_label(labels), [2, 1])
+        np.testing.assert_array_equal(conn.components_per_label(labels, n_labels=4), [2, 1, 0, 0])
+        
+        # Com 8 vizinhos, as células de mesmo rótulo em diagonal formam um único componente
+        diagonal = np.array([[0, 1],
+                             [1, 0]])
+        np.testing.assert_array_equal(conn.components_per_label(diagonal), [2, 2])
+        np.testing.assert_array_equal(conn.components_per_label(diagonal, connectivity=8), [1, 1])
+    
+    def test_prefix_connectivity(self):
+        """
+        Testa a conectividade dos prefixos contra a rotulação de cada prefixo.
+        """
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            shape = tuple(rng.integers(1, 9, 2))
+            indices = rng.permutation(np.flatnonzero(rng.random(shape) < 0.7))
+            if len(indices) == 0:
+                continue
+            local, local_shape = ppb._indices_to_local(indices, shape)
+            connected = conn.prefix_connectivity(ppb._neighbor_table(local, local_shape))
+            
+            self.assertEqual(len(connected), len(indices) + 1)
+            for cut in range(len(indices) + 1):
+                mask = np.zeros(shape, dtype=bool)
+                mask.ravel()[indices[:cut]] = True
+                self.assertEqual(connected[cut], conn.is_connected(mask))
+    
+    def test_label_cell_components(self):
+        """
+        Testa a rotulação sobre a tabela de vizinhos, com e sem separação por lado.
+        """
+        indices = np.array([0, 1, 2, 5, 8, 7])
+        local, local_shape = ppb._indices_to_local(indices, (3, 3))
+        neighbors = ppb._neighbor_table(local, local_shape)
+        
+        labels = conn.label_cell_components(neighbors)
+        self.assertTrue(np.all(labels == labels[0]))
+        
+        side = np.array([0, 0, 0, 1, 1, 1])
+        labels = conn.label_cell_components(neighbors, side)
+        self.assertEqual(len(set(labels[side == 0])), 1)
+        self.assertEqual(len(set(labels[side == 1])), 1)
+        self.assertNotEqual(labels[0], labels[-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import numpy as np
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import mesh3d as m3d
+import particionamento_por_bissecao as ppb
+import instrumentacao as instr
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Testes unitários para a instrumentação de fases, nós e contadores.
+    """
+    
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        self.weights = rng.integers(1, 9, size=(40, 50))
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_disabled_by_default(self):
+        """
+        Testa se, sem `profile`, as chamadas de instrumentação não têm efeito.
+        """
+        self.assertFalse(instr.enabled())
+        self.assertIs(instr.phase('sort'), instr.phase('cut_sweep'))
+        self.assertIs(instr.node('0', 10), instr.phase('sort'))
+        instr.count('cells', 10)
+        
+        @instr.timed('teste')
+        def add(a, b=1):
+            return a + b
+        
+        self.assertEqual(add(2, b=3), 5)
+        self.assertEqual(add.__name__, 'add')
+    
+    def test_partition_nodes_and_counters(self):
+        """
+        Testa o registro de um nó por bisseção, com as fases e os contadores de cada um.
+        """
+        with instr.profile() as stats:
+            self.assertTrue(instr.enabled())
+            state = ppb.PartitionState(self.weights)
+            state.partition(16)
+        self.assertFalse(instr.enabled())
+        
+        self.assertEqual(sorted(record['name'] for record in stats.nodes), sorted(state.tree))
+        counters = stats.counters()
+        self.assertEqual(counters['bisections'], 15)
+        self.assertEqual(counters['cells'], sum(record['cells'] for record in stats.nodes))
+        self.assertGreater(counters['cuts_evaluated'], 0)
+        
+        totals = stats.phase_totals()
+        for name in ('inertia', 'axis_selection', 'sort', 'neighbors', 'cut_sweep', 'connectivity'):
+            self.assertIn(name, totals)
+        self.assertEqual(totals['cut_sweep']['calls'], 15)
+        
+        # O nó raiz contém todas as células e o tempo dos filhos
+        root = stats.node('')[0]
+        self.assertEqual(root['cells'], self.weights.size)
+        self.assertLessEqual(root['self_time'], root['duration'])
+        self.assertLessEqual(root['duration'], stats.elapsed)
+        self.assertIn('sort', stats.summary())
+    
+    def test_batched_levels(self):
+        """
+        Testa se a recursão em largura registra um nó por nível.
+        """
+        with instr.profile() as stats:
+            ppb.PartitionState(self.weights).partition(16, batched=True)
+        self.assertEqual([record['name'] for record in stats.nodes], ['0', '1', '2', '3'])
+        self.assertEqual({record['category'] for record in stats.nodes}, {'nível'})
+        self.assertEqual(stats.counters()['bisections'], 15)
+    
+    def test_nested_phases_are_exclusive(self):
+        """
+        Testa se o tempo de uma fase aninhada não é contado na fase externa.
+        """
+        @instr.timed('inner')
+        def inner():
+            time.sleep(0.02)
+        
+        with instr.profile() as stats:
+            with instr.phase('outer'):
+                inner()
+                instr.count('events', 2)
+        
+        totals = stats.phase_totals()
+        self.assertGreaterEqual(totals['inner']['time'], 0.02)
+        self.assertLess(totals['outer']['time'], 0.01)
+        self.assertEqual(stats.outside['counters'], {'events': 2})
+    
+    def test_mesh_and_threads_outside_nodes(self):
+        """
+        Testa se o trabalho fora da recursão e de outras threads é registrado em `outside`.
+        """
+        with instr.profile() as stats:
+            mesh = m3d.create_3d_mesh()
+            m3d.compute_weight_array(mesh)
+            worker = threading.Thread(target=lambda: m3d.compute_inertia_matrix_3d(mesh))
+            worker.start()
+            worker.join()
+        
+        self.assertEqual(stats.nodes, [])
+        self.assertEqual(set(stats.outside['phases']), {'create_3d_mesh', 'weight_array', 'inertia'})
+        self.assertEqual(stats.outside['counters']['mesh_cells'], mesh.size)
+    
+    def test_region_growing_phase(self):
+        """
+        Testa o registro do crescimento de região como fase própria.
+        """
+        indices = np.arange(self.weights.size)
+        with instr.profile() as stats:
+            ppb.region_growing_partition_indices(self.weights.ravel(), self.weights.shape, indices, 1, 1)
+        self.assertEqual(stats.phase_totals()['region_growing']['calls'], 1)
+    
+    def test_chrome_trace(self):
+        """
+        Testa a exportação do rastro: eventos completos, com os nós filhos contidos no pai.
+        """
+        with instr.profile() as stats:
+            ppb.PartitionState(self.weights).partition(4)
+        path = os.path.join(self.temp_dir, 'trace.json')
+        stats.save_chrome_trace(path)
+        with open(path) as file:
+            trace = json.load(file)
+        
+        events = trace['traceEvents']
+        self.assertTrue(all(event['ph'] == 'X' for event in events))
+        nodes = {event['name']: event for event in events if event['cat'] == 'node'}
+        self.assertEqual(set(nodes), {'nó raiz', 'nó 0', 'nó 1'})
+        root = nodes['nó raiz']
+        for name in ('nó 0', 'nó 1'):
+            self.assertGreaterEqual(nodes[name]['ts'], root['ts'])
+            self.assertLessEqual(nodes[name]['ts'] + nodes[name]['dur'], root['ts'] + root['dur'] + 1e-3)
+        self.assertEqual(root['args']['cells'], self.weights.size)
+        self.assertEqual(trace['otherData']['counters']['bisections'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -116,7 +116,64 @@ class TestMesh3D(unittest.TestCase):
         self.assertEqual(refined_mesh[2, 2, 1], 27)
         self.assertEqual(refined_mesh[1,1,0],1)
         self.assertEqual(refined_mesh[0,0,0],0)
-    
+
+    def test_structured_interval_tables(self):
+        """Test create_3d_mesh and refine_mesh with structured interval arrays"""
+        intervals = {0: {2: [(3, 4)], 3: [(2, 5)]}, 1: {1: [(2, 5)], 2: [(1, 9)]}}
+        table = mesh3d.active_intervals_to_array(intervals)
+        self.assertEqual(table.dtype, mesh3d.ACTIVE_INTERVAL_DTYPE)
+        mesh = mesh3d.create_3d_mesh(6, 6, 2, table)
+        np.testing.assert_array_equal(mesh, mesh3d.create_3d_mesh(6, 6, 2, intervals))
+
+        # Intervalos sobrepostos acumulam o produto dos fatores
+        regions = {0: {3: [(2, 4, 2, 1, 1)]}, 1: {2: [(1, 3, 2, 2, 1), (3, 5, 3, 1, 1)]}}
+        table, warnings = mesh3d.refinement_regions_to_array(regions)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(len(warnings), 0)
+        refined = mesh3d.refine_mesh(mesh, table)
+        np.testing.assert_array_equal(refined, mesh3d.refine_mesh(mesh, regions))
+        np.testing.assert_array_equal(refined[2, 1:6, 1], [4, 4, 12, 3, 3])
+        np.testing.assert_array_equal(refined[3, 2:5, 0], [2, 2, 2])
+
+    def test_refine_mesh_warnings(self):
+        """Test that refine_mesh collects the warnings instead of printing one per interval"""
+        mesh = mesh3d.create_3d_mesh()
+        regions = {1: {3: [(2, 4), (2, 4, 2, 2, 1)], 9: [(0, 1, 2, 1, 1)]}, 2: {4: [(5, 8, 2, 1, 1)]}}
+
+        refined, warnings = mesh3d.refine_mesh(mesh, regions, return_warnings=True)
+        self.assertEqual(len(warnings), 3)
+        self.assertIn('inválido', warnings[0])
+        self.assertIn('linha 9', warnings[1])
+        self.assertIn('colunas 5-8', warnings[2])
+        np.testing.assert_array_equal(refined[3, 1:6, 1], [1, 4, 4, 4, 1])
+
+        captured = io.StringIO()
+        sys.stdout = captured
+        try:
+            np.testing.assert_array_equal(mesh3d.refine_mesh(mesh, regions), refined)
+        finally:
+            sys.stdout = sys.__stdout__
+        self.assertEqual(captured.getvalue().count('\n'), 1)
+
+        interval_mesh, interval_warnings = mesh3d.IntervalMesh.from_dense(mesh).refine(regions, return_warnings=True)
+        np.testing.assert_array_equal(interval_warnings, warnings)
+        np.testing.assert_array_equal(interval_mesh.to_dense(int), refined)
+
+    def test_vectorized_mesh_size(self):
+        """Test building and refining a large mesh from structured tables"""
+        nx, ny, nz = 400, 500, 5
+        layers, rows = np.divmod(np.arange(nx * nz), nx)
+        active = np.zeros(nx * nz, dtype=mesh3d.ACTIVE_INTERVAL_DTYPE)
+        active['k'], active['i'], active['j_start'], active['j_end'] = layers, rows, rows % 7, ny - rows % 5
+        regions = np.zeros(nx * nz, dtype=mesh3d.REFINEMENT_INTERVAL_DTYPE)
+        regions['k'], regions['i'], regions['j_start'], regions['j_end'] = layers, rows, 100, 399
+        regions['factor_i'], regions['factor_j'], regions['factor_k'] = 2, 2, 1
+
+        mesh = mesh3d.create_3d_mesh(nx, ny, nz, active)
+        refined = mesh3d.refine_mesh(mesh, regions)
+        self.assertEqual(mesh.sum(), np.sum((ny - rows % 5) - rows % 7))
+        self.assertEqual(refined.sum(), mesh.sum() + 3 * nx * nz * 300)
+
     def test_compute_weight_array(self):
         """Test compute_weight_array function"""
         # Create a simple 3D mesh
@@ -141,6 +198,83 @@ class TestMesh3D(unittest.TestCase):
         self.assertEqual(weights[2, 2], 6)  # 0 + 0 + 0 + 6
         self.assertEqual(weights[0, 1], 0)  # No active cells in this position
 
+    def test_compute_weight_array_streaming(self):
+        """Test compute_weight_array_streaming on .npy, raw and Fortran-ordered files"""
+        rng = np.random.default_rng(0)
+        mesh = rng.integers(0, 4, size=(13, 7, 5)).astype(np.uint8)
+        expected = mesh3d.compute_weight_array(mesh)
+        
+        npy_path = os.path.join(self.temp_dir, 'mesh.npy')
+        np.save(npy_path, mesh)
+        raw_path = os.path.join(self.temp_dir, 'mesh.raw')
+        mesh.tofile(raw_path)
+        fortran_path = os.path.join(self.temp_dir, 'mesh_fortran.npy')
+        np.save(fortran_path, np.asfortranarray(mesh))
+        
+        # Slabs of a few planes, serial and threaded
+        for workers in (None, 3):
+            weights = mesh3d.compute_weight_array_streaming(npy_path, slab_bytes=100, workers=workers)
+            np.testing.assert_array_equal(weights, expected)
+            
+            weights = mesh3d.compute_weight_array_streaming(raw_path, slab_bytes=100, workers=workers,
+                                                             shape=mesh.shape, mesh_dtype=np.uint8)
+            np.testing.assert_array_equal(weights, expected)
+            
+            weights = mesh3d.compute_weight_array_streaming(fortran_path, slab_bytes=100, workers=workers)
+            np.testing.assert_array_equal(weights, expected)
+        
+        # Z slabs on a C-ordered file and a custom accumulator dtype
+        weights = mesh3d.compute_weight_array_streaming(npy_path, dtype=np.int32, slab_axis=2, slab_bytes=100)
+        self.assertEqual(weights.dtype, np.int32)
+        np.testing.assert_array_equal(weights, expected)
+        
+        with self.assertRaises(ValueError):
+            mesh3d.compute_weight_array_streaming(raw_path)
+
+    def test_interval_mesh(self):
+        """Test IntervalMesh against create_3d_mesh, refine_mesh and compute_weight_array"""
+        regions = {
+            1: {
+                3: [(2, 4, 2, 2, 1), (5, 6, 3, 1, 1)],
+                4: [(3, 5, 2, 3, 1)]
+            },
+            2: {3: [(0, 7, 2, 1, 1), (1, 2, 1, 1, 3)]}  # Intervalos sobrepostos multiplicam os fatores
+        }
+        dense = mesh3d.create_3d_mesh()
+        refined = mesh3d.refine_mesh(dense, regions)
+        
+        mesh = mesh3d.IntervalMesh.from_intervals()
+        np.testing.assert_array_equal(mesh.to_dense(int), dense)
+        self.assertEqual(mesh.active_cells, np.count_nonzero(dense))
+        self.assertEqual(mesh.values.dtype, np.uint8)
+        self.assertEqual(mesh.rows.dtype, np.uint8)
+        
+        refined_mesh = mesh.refine(regions)
+        np.testing.assert_array_equal(refined_mesh.to_dense(int), refined)
+        np.testing.assert_array_equal(mesh3d.compute_weight_array(refined_mesh),
+                                      mesh3d.compute_weight_array(refined))
+        self.assertEqual(refined_mesh.total_weight, refined.sum())
+        
+        # Conversão a partir do array denso
+        encoded = mesh3d.IntervalMesh.from_dense(refined)
+        np.testing.assert_array_equal(encoded.to_dense(int), refined)
+        self.assertEqual(encoded.n_runs, refined_mesh.n_runs)
+    
+    def test_interval_mesh_memory(self):
+        """Test that IntervalMesh memory scales with the active runs, not with nx * ny * nz"""
+        intervals = {k: {i: [(100, 140)] for i in range(0, 3000, 100)} for k in range(0, 200, 50)}
+        mesh = mesh3d.IntervalMesh.from_intervals(3000, 3000, 200, intervals)
+        
+        self.assertEqual(mesh.n_runs, 30 * 4)
+        self.assertEqual(mesh.active_cells, 30 * 4 * 40)
+        self.assertEqual(mesh.rows.dtype, np.uint16)
+        self.assertLess(mesh.nbytes, 1000)
+        
+        weights = mesh.weight_array(dtype=np.int32)
+        self.assertEqual(weights.shape, (3000, 3000))
+        self.assertEqual(weights[100, 120], 4)
+        self.assertEqual(weights.sum(), mesh.total_weight)
+
     def test_plot_weights_output(self):
         """Test if the function plot_weights generates a plot without errors."""
         weight_array = np.array([[1, 2], [3, 4]])
@@ -161,6 +295,102 @@ class TestMesh3D(unittest.TestCase):
         mesh3d.plot_both_mesh_views(mesh)
         plt.close()
 
+    def test_mesh_boundary_faces(self):
+        """Test that faces shared by two cells of the same class are culled."""
+        vertices, cells = mesh3d.mesh_boundary_faces(np.ones((2, 1, 1)))
+        self.assertEqual(vertices.shape, (10, 4, 3))
+        np.testing.assert_array_equal(np.bincount(cells), [5, 5])
+        
+        # A solid box only keeps its surface
+        vertices, _ = mesh3d.mesh_boundary_faces(np.ones((4, 3, 2)))
+        self.assertEqual(len(vertices), 2 * (4 * 3 + 4 * 2 + 3 * 2))
+        
+        # Different classes keep the shared face on both sides; undrawn cells have no faces
+        classes = np.array([1, 2]).reshape(2, 1, 1)
+        self.assertEqual(len(mesh3d.mesh_boundary_faces(classes)[0]), 12)
+        vertices, cells = mesh3d.mesh_boundary_faces(classes, drawn=classes == 1)
+        self.assertEqual(len(vertices), 6)
+        self.assertTrue(np.all(cells == 0))
+        self.assertTrue(np.all(vertices[:, :, 0] <= 1))
+
+    def test_plot_mesh_single_collection(self):
+        """Test that a mesh and a partition overlay are drawn as one collection per axis."""
+        mesh = np.zeros((30, 30, 6), dtype=int)
+        mesh[5:25, 5:25, :] = 1
+        mesh[10:15, 10:15, 2:4] = 3
+        for show_refinement in (False, True):
+            fig = plt.figure()
+            ax = fig.add_subplot(111, projection='3d')
+            mesh3d.plot_mesh_in_axis(ax, mesh, show_refinement)
+            self.assertEqual(len(ax.collections), 1)
+            plt.close(fig)
+        
+        labels = np.where(mesh > 0, np.arange(30)[:, None, None] // 10, -1)
+        ax = mesh3d.plot_partition_3d(labels)
+        self.assertEqual(len(ax.collections), 1)
+        # Only the outer surface of each of the three slabs is drawn
+        self.assertEqual(len(ax.collections[0].get_facecolors()), 1760)
+        plt.close('all')
+
+    def test_block_reduce(self):
+        """Test block aggregation, including incomplete blocks and label sampling."""
+        array = np.arange(15).reshape(3, 5)
+        np.testing.assert_array_equal(mesh3d.block_reduce(array, 1), array)
+        np.testing.assert_array_equal(mesh3d.block_reduce(array, 2, 'sum'), [[12, 20, 13], [21, 25, 14]])
+        np.testing.assert_array_equal(mesh3d.block_reduce(array, 2, 'max'), [[6, 8, 9], [11, 13, 14]])
+        np.testing.assert_array_equal(mesh3d.block_reduce(array, 2, 'sample'), [[0, 2, 4], [10, 12, 14]])
+        with self.assertRaises(ValueError):
+            mesh3d.block_reduce(array, 2, 'median')
+
+    def test_partition_boundaries(self):
+        """Test that boundary edges are found and merged into straight segments."""
+        labels = np.array([[0, 0, 1],
+                           [0, 0, 1],
+                           [2, 2, 2]])
+        segments = mesh3d.partition_boundaries(labels)
+        expected = {((1.5, -0.5), (1.5, 1.5)),   # 0 | 1
+                    ((-0.5, 1.5), (2.5, 1.5))}   # 0 and 1 / 2, merged into one segment
+        self.assertEqual({tuple(map(tuple, segment)) for segment in segments}, expected)
+        self.assertEqual(len(mesh3d.partition_boundaries(np.zeros((4, 4), dtype=int))), 0)
+
+    def test_plot_weights_level_of_detail(self):
+        """Test that large maps are downsampled and annotated only when zoomed in."""
+        weights = np.arange(300 * 200).reshape(300, 200)
+        labels = (np.arange(300)[:, None] // 100) * np.ones(200, dtype=int)
+        view = mesh3d.plot_weights(weights, labels=labels, max_pixels=2000)
+        self.assertEqual(view.block, 6)
+        self.assertEqual(view.image.get_array().shape, (50, 34))
+        self.assertEqual(view.texts, [])
+        self.assertEqual(len(view.ax.collections[0].get_segments()), 2)
+        
+        view.ax.set_xlim(9.5, 19.5)
+        view.ax.set_ylim(29.5, 19.5)
+        self.assertEqual(view.block, 1)
+        self.assertEqual(len(view.texts), 100)
+        self.assertEqual(view.texts[0].get_text(), str(weights[20, 10]))
+        self.assertEqual(view.texts[0].get_position(), (10, 20))
+        plt.close('all')
+        
+        view = mesh3d.plot_weights(np.array([[1, 2], [3, 4]]))
+        self.assertEqual([text.get_text() for text in view.texts], ['1', '2', '3', '4'])
+        plt.close('all')
+
+    def test_plot_partition_2d(self):
+        """Test the label view: inactive cells are transparent and labels are not aggregated."""
+        labels = np.full((40, 60), -1)
+        labels[5:35, 10:50] = np.arange(40)[None, :] // 10
+        view = mesh3d.plot_partition_2d(labels, max_pixels=600, max_annotations=50)
+        self.assertEqual(view.block, 2)
+        shown = np.ma.filled(view.image.get_array(), np.nan)
+        self.assertTrue(np.all(np.isnan(shown[0])))
+        self.assertEqual(set(shown[~np.isnan(shown)]), {0, 1, 2, 3})
+        self.assertEqual(view.texts, [])
+        
+        view.ax.set_xlim(9.5, 14.5)
+        view.ax.set_ylim(9.5, 4.5)
+        self.assertEqual({text.get_text() for text in view.texts}, {'0'})
+        plt.close('all')
+
     def test_inertia_matrix_calculation(self):
         """Test compute_inertia_matrix_from_grid function"""
         weight_matrix = np.array([
@@ -532,5 +762,41 @@ class TestMesh3D(unittest.TestCase):
         expected_I = np.zeros((2, 2))
         assert_array_almost_equal(I, expected_I)
 
+    def test_inertia_matrix_3d(self):
+        """Teste da matriz de inércia 3D sobre as células ativas de uma malha."""
+        mesh = np.zeros((3, 3, 4), dtype=int)
+        mesh[1, 1, 0] = 1  # Célula (1, 1, 0) com peso 1
+        mesh[1, 1, 3] = 3  # Célula (1, 1, 3) com peso 3
+        
+        I, center = mesh3d.compute_inertia_matrix_3d(mesh)
+        
+        # Centro de massa: z = (0*1 + 3*3)/4 = 2.25
+        assert_array_almost_equal(center, (1, 1, 2.25))
+        
+        # Pontos alinhados em z: momento nulo em torno de z e 1*2.25² + 3*0.75² = 6.75 em torno de x e y
+        expected_I = np.diag([6.75, 6.75, 0])
+        assert_array_almost_equal(I, expected_I)
+        
+        # A matriz pode ser decomposta por calculate_principal_moments
+        moments, axes = mesh3d.calculate_principal_moments(I)
+        self.assertEqual(axes.shape, (3, 3))
+    
+    def test_inertia_matrix_3d_matches_points(self):
+        """Teste da matriz de inércia 3D contra a definição I = sum(w * (|r|² E - r r^T))."""
+        rng = np.random.default_rng(0)
+        mesh = rng.integers(0, 4, size=(5, 6, 3))
+        indices = np.flatnonzero(mesh.ravel() > 0)[::2]
+        
+        I, center = mesh3d.compute_inertia_matrix_3d(mesh, indices)
+        
+        coords = np.column_stack(np.unravel_index(indices, mesh.shape)).astype(float)
+        weights = mesh.ravel()[indices].astype(float)
+        expected_center = weights @ coords / weights.sum()
+        offsets = coords - expected_center
+        expected_I = sum(w * (r @ r * np.eye(3) - np.outer(r, r)) for w, r in zip(weights, offsets))
+        
+        assert_array_almost_equal(center, expected_center)
+        assert_array_almost_equal(I, expected_I)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+import multiprocessing
+from unittest.mock import patch
+from concurrent.futures import ProcessPoolExecutor
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import nucleos_compilados as nc
+import conectividade as conn
+import particionamento_por_bissecao as ppb
+import mesh3d as m3d
+import renderizacao_lote as rl
+
+class TestCompiledKernels(unittest.TestCase):
+    """
+    Testes unitários para os núcleos compilados: cada núcleo (em Python puro quando o Numba não
+    está instalado) deve reproduzir o caminho NumPy da rotina correspondente.
+    """
+    
+    def setUp(self):
+        self.rng = np.random.default_rng(3)
+        self.weights = self.rng.integers(0, 6, size=(14, 17)) * (self.rng.random((14, 17)) < 0.8)
+        self.indices = np.flatnonzero(self.weights > 0)
+        local, local_shape = ppb._indices_to_local(self.indices, self.weights.shape)
+        self.neighbors = ppb._neighbor_table(local, local_shape)
+    
+    def test_backend_switch(self):
+        """
+        Testa a escolha do backend, a restauração pelo contexto e os erros.
+        """
+        self.assertIn(nc.get_backend(), nc.BACKENDS)
+        previous = nc.get_backend()
+        with nc.backend('python'):
+            self.assertEqual(nc.get_backend(), 'python')
+            self.assertFalse(nc.use_compiled())
+            self.assertEqual(nc.active_backend(), 'python')
+        self.assertEqual(nc.get_backend(), previous)
+        
+        with self.assertRaises(ValueError):
+            nc.set_backend('cython')
+        if not nc.available():
+            with self.assertRaises(ImportError):
+                nc.set_backend('numba')
+            self.assertFalse(nc.use_compiled())
+    
+    def test_connectivity_kernels(self):
+        """
+        Testa a rotulação de grades e de células e a conectividade de prefixos.
+        """
+        for shape, connectivities in (((9, 11), (4, 8)), ((5, 6, 4), (6, 26))):
+            labels = self.rng.integers(-1, 3, size=shape)
+            for connectivity in connectivities:
+                with nc.backend('python'):
+                    expected, n_expected = conn.label_components(labels, connectivity)
+                padding = 3 - len(shape)
+                stencil = np.array([(0,) * padding + tuple(offset)
+                                    for offset in conn._stencil_offsets(len(shape), connectivity)] + [(0, 0, 1)])
+                components, n_components = nc.grid_components(labels.reshape((1,) * padding + shape), stencil)
+                np.testing.assert_array_equal(components.reshape(shape), expected)
+                self.assertEqual(n_components, n_expected)
+        
+        side = self.rng.integers(0, 2, size=len(self.indices)).astype(np.int8)
+        with nc.backend('python'):
+            expected_prefix = conn.prefix_connectivity(self.neighbors)
+            expected_labels = conn.label_cell_components(self.neighbors, side)
+        np.testing.assert_array_equal(nc.prefix_connectivity(self.neighbors), expected_prefix)
+        np.testing.assert_array_equal(nc.cell_components(self.neighbors, side), expected_labels)
+    
+    def test_cut_sweep_and_region_growing(self):
+        """
+        Testa a varredura dos cortes e o crescimento de região, incluindo empates de peso.
+        """
+        prefix_weights = np.cumsum(self.weights.ravel()[self.indices]).astype(float)
+        valid = self.rng.random(len(self.indices) - 1) < 0.3
+        imbalance = np.abs(prefix_weights[:-1] - prefix_weights[-1] / 3) / prefix_weights[-1]
+        order = np.argsort(imbalance, kind='stable')
+        first = int(np.argmax(valid[order]))
+        self.assertEqual(nc.select_cut(valid, prefix_weights, prefix_weights[-1] / 3, prefix_weights[-1]),
+                         (order[first] + 1, first + 1))
+        self.assertEqual(nc.select_cut(np.zeros(4, dtype=bool), prefix_weights[:5], 1.0, 2.0), (0, 4))
+        
+        sorted_indices = self.indices[self.rng.permutation(len(self.indices))]
+        flat_weights = self.weights.ravel().astype(float)
+        for n1, n2 in ((1, 1), (2, 3)):
+            with nc.backend('python'):
+                expected = ppb.region_growing_partition_indices(flat_weights, self.weights.shape,
+                                                                sorted_indices, n1, n2)
+            weights = flat_weights[sorted_indices]
+            values, ranks = np.unique(weights, return_inverse=True)
+            local, local_shape = ppb._indices_to_local(sorted_indices, self.weights.shape)
+            target = weights.sum() * n1 / (n1 + n2)
+            owner = nc.region_growing(weights, ranks, values, ppb._neighbor_table(local, local_shape),
+                                      np.array([target, weights.sum() - target]))
+            np.testing.assert_array_equal(sorted_indices[owner == 0], expected[0])
+            np.testing.assert_array_equal(sorted_indices[owner == 1], expected[1])
+    
+    def test_boundary_faces(self):
+        """
+        Testa a geração das faces visíveis e dos seus vértices.
+        """
+        classes = self.rng.integers(0, 3, size=(5, 4, 6))
+        drawn = self.rng.random(classes.shape) < 0.7
+        with nc.backend('python'):
+            expected_vertices, expected_cells = m3d.mesh_boundary_faces(classes, drawn)
+        vertices, cells = nc.boundary_faces(classes, drawn, m3d._CUBE_FACE_CORNERS)
+        np.testing.assert_array_equal(vertices, expected_vertices)
+        np.testing.assert_array_equal(cells, expected_cells)
+        self.assertEqual(vertices.dtype, expected_vertices.dtype)
+    
+    def test_backend_reaches_pool_workers(self):
+        """
+        Testa se o backend escolhido no processo principal chega aos processos de trabalho da
+        recursão paralela e da renderização em lote iniciados com 'spawn', que reimportam os
+        módulos com o backend padrão.
+        """
+        context = multiprocessing.get_context('spawn')
+        pools = []
+        
+        class SpawnPool(ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                kwargs['mp_context'] = context
+                pools.append((kwargs['initializer'], kwargs['initargs']))
+                super().__init__(*args, **kwargs)
+        
+        with tempfile.TemporaryDirectory() as temp_dir, nc.backend('python'):
+            with patch.object(ppb, 'ProcessPoolExecutor', SpawnPool):
+                labels = ppb.PartitionState(self.weights).partition(4, workers=2, min_parallel_cells=1)
+            frames = [{'weights': self.weights, 'labels': labels}] * 2
+            with patch.object(rl, 'ProcessPoolExecutor', SpawnPool):
+                rl.render_frames(frames, temp_dir, workers=2, chunk_size=1, dpi=20)
+            
+            self.assertEqual([initializer for initializer, _ in pools],
+                             [ppb._init_partition_worker, rl._init_render_worker])
+            for initializer, initargs in pools:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=initializer,
+                                         initargs=initargs) as pool:
+                    self.assertEqual(pool.submit(nc.get_backend).result(), 'python')
+    
+    @unittest.skipUnless(nc.available(), 'Numba não instalado')
+    def test_partition_same_on_both_backends(self):
+        """
+        Testa se o particionamento completo é idêntico com os dois backends.
+        """
+        for options in ({}, {'refine': 0.02}, {'multisection': True}):
+            with nc.backend('python'):
+                expected = ppb.PartitionState(self.weights).partition(6, **options)
+            with nc.backend('numba'):
+                labels = ppb.PartitionState(self.weights).partition(6, **options)
+            np.testing.assert_array_equal(labels, expected)
+
+if __name__ == '__main__':
+    unittest.main()
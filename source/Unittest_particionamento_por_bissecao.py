@@ -18,6 +18,9 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Importar o módulo - ajuste o nome conforme necessário
 try:
     import particionamento_por_bissecao as ppb
+    import mesh3d as m3d
+    import conectividade as conn
+    import instrumentacao as instr
 except ImportError:
     # Caso o arquivo tenha outro nome, você precisará ajustar a importação
     print("Erro ao importar o módulo. Verifique o nome do arquivo.")
@@ -160,6 +163,30 @@ class TestMeshPartitioning(unittest.TestCase):
         # Distância entre (0, 0) e (6, 8) deve ser √(36 + 64) = 10
         self.assertAlmostEqual(max_dist, 10.0)
 
+    def test_select_projection_axis(self):
+        """
+        Testa a função select_projection_axis.
+        
+        Verifica as amplitudes das projeções em cada eixo, a escolha do eixo de
+        menor dispersão e os valores de projeção escalar.
+        """
+        x_coords = np.array([0.0, 4.0, 2.0, 2.0])
+        y_coords = np.array([1.0, 1.0, 0.0, 2.0])
+        axes = np.array([[0.8, -0.6], [0.6, 0.8]])
+        
+        axis_index, values, extents = ppb.select_projection_axis(
+            x_coords, y_coords, (2.0, 1.0), axes
+        )
+        
+        # Amplitude = máximo - mínimo da projeção escalar em cada eixo
+        s0 = 0.8 * (x_coords - 2.0) + 0.6 * (y_coords - 1.0)
+        s1 = -0.6 * (x_coords - 2.0) + 0.8 * (y_coords - 1.0)
+        np.testing.assert_allclose(extents, [np.ptp(s0), np.ptp(s1)])
+        
+        # O eixo escolhido é o de menor dispersão
+        self.assertEqual(axis_index, 1)
+        np.testing.assert_allclose(values, s1)
+
     @patch('mesh3d.compute_inertia_matrix_from_points')
     @patch('mesh3d.calculate_principal_moments')
     def test_find_best_projection_and_division_balanced(self, mock_calc_principal, mock_compute_inertia):
@@ -204,6 +231,36 @@ class TestMeshPartitioning(unittest.TestCase):
         # Nota: este teste pode ser ajustado dependendo da precisão esperada
         self.assertLessEqual(normalized_imbalance, 0.3)
 
+    def test_find_best_projection_keeps_subsets_connected(self):
+        """
+        Testa se a bisseção escolhe um corte em que os dois subconjuntos são conectados.
+        
+        Usa um domínio em forma de U, no qual o corte mais balanceado ao longo da
+        projeção separaria os braços do U em componentes desconexos.
+        """
+        u_shape = {}
+        for i in range(6):
+            u_shape[(i, 0)] = 1
+            u_shape[(i, 4)] = 1
+        for j in range(1, 4):
+            u_shape[(5, j)] = 1
+        
+        subset1, subset2 = ppb.find_best_projection_and_division_balanced(u_shape, 1, 1)
+        
+        self.assertEqual(len(subset1) + len(subset2), len(u_shape))
+        for subset in (subset1, subset2):
+            self.assertTrue(subset)
+            # Busca em largura a partir de uma célula qualquer do subconjunto
+            start = next(iter(subset))
+            visited, stack = {start}, [start]
+            while stack:
+                i, j = stack.pop()
+                for neighbor in [(i+1, j), (i-1, j), (i, j+1), (i, j-1)]:
+                    if neighbor in subset and neighbor not in visited:
+                        visited.add(neighbor)
+                        stack.append(neighbor)
+            self.assertEqual(len(visited), len(subset))
+
     def test_convert_result_to_domain_assignment(self):
         """
         Testa a função convert_result_to_domain_assignment.
@@ -236,6 +293,531 @@ class TestMeshPartitioning(unittest.TestCase):
         self.assertEqual(domain_assignment[0, 2], '')
         self.assertEqual(domain_assignment[1, 0], '')
 
+    def test_region_growing_partition(self):
+        """
+        Testa a função region_growing_partition.
+        
+        Verifica se o crescimento de região atribui todos os pontos, sem sobreposição,
+        partindo das sementes nos extremos da lista ordenada.
+        """
+        sorted_coords = sorted(self.test_dict_small.keys())
+        subset1, subset2 = ppb.region_growing_partition(self.test_dict_small, 1, 1, sorted_coords)
+        
+        self.assertEqual(len(subset1) + len(subset2), len(self.test_dict_small))
+        self.assertEqual(len(set(subset1) & set(subset2)), 0)
+        self.assertIn(sorted_coords[0], subset1)
+        self.assertIn(sorted_coords[-1], subset2)
+
+    def test_region_growing_partition_indices_balance(self):
+        """
+        Testa o balanceamento de pesos do crescimento de região sobre índices planos.
+        
+        Em uma grade uniforme, cada região deve ficar a no máximo uma célula do seu peso alvo.
+        """
+        weights = np.ones((6, 6))
+        indices = np.arange(36)
+        
+        first, second = ppb.region_growing_partition_indices(weights.ravel(), weights.shape, indices, 1, 2)
+        
+        self.assertEqual(len(first) + len(second), 36)
+        self.assertEqual(len(np.intersect1d(first, second)), 0)
+        self.assertLessEqual(abs(weights.ravel()[first].sum() - 12), 1)
+        self.assertLessEqual(abs(weights.ravel()[second].sum() - 24), 1)
+
+    def test_partition_state_labels(self):
+        """
+        Testa a classe PartitionState sobre um mapa de pesos em array.
+        
+        Verifica o tipo dos rótulos, a cobertura da máscara e a tabela de prefixos.
+        """
+        weights = np.array([
+            [1, 2, 0, 3],
+            [4, 1, 1, 2],
+            [0, 2, 5, 1]
+        ])
+        state = ppb.PartitionState(weights, mask=weights > 0)
+        labels = state.partition(3)
+        
+        self.assertEqual(labels.dtype, np.int32)
+        self.assertEqual(labels.shape, weights.shape)
+        
+        # Células fora da máscara ficam com -1, as demais recebem um rótulo válido
+        self.assertTrue(np.all(labels[weights == 0] == -1))
+        self.assertTrue(np.all((labels[weights > 0] >= 0) & (labels[weights > 0] < state.n_parts)))
+        
+        # A tabela de prefixos associa cada prefixo binário a um rótulo distinto
+        self.assertEqual(len(state.prefix_table), 3)
+        self.assertEqual(sorted(state.prefix_table.values()), [0, 1, 2])
+        self.assertEqual(state.prefix_table, {'0': 0, '10': 1, '11': 2})
+
+    def test_partition_state_matches_dict_api(self):
+        """
+        Testa se PartitionState produz a mesma partição que a API de dicionários.
+        """
+        result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 4)
+        
+        state = ppb.PartitionState.from_dict(self.test_dict_medium)
+        state.partition(4)
+        
+        self.assertEqual(state.to_dict(), result)
+
+    def test_partition_state_parallel_matches_serial(self):
+        """
+        Testa se a recursão paralela produz exatamente os mesmos rótulos que a serial.
+        """
+        rng = np.random.default_rng(7)
+        weights = rng.integers(0, 9, size=(12, 15))
+        
+        serial = ppb.PartitionState(weights, mask=weights > 0)
+        serial.partition(6)
+        
+        parallel = ppb.PartitionState(weights, mask=weights > 0)
+        parallel.partition(6, workers=2, min_parallel_cells=1)
+        
+        np.testing.assert_array_equal(parallel.labels, serial.labels)
+        self.assertEqual(parallel.prefixes, serial.prefixes)
+        
+        # O refinamento FM também é aplicado dentro dos processos
+        serial.partition(6, refine=0.05)
+        parallel.partition(6, workers=2, min_parallel_cells=1, refine=0.05)
+        np.testing.assert_array_equal(parallel.labels, serial.labels)
+        self.assertEqual(parallel.cut_report, serial.cut_report)
+        
+        # A API de dicionários aceita o mesmo modo paralelo
+        result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 3, workers=2)
+        self.assertEqual(result, ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 3))
+
+    def test_partition_state_repartition(self):
+        """
+        Testa a reparticionamento incremental (warm start) de PartitionState.
+        
+        Com os mesmos pesos nenhum nó é recortado; com uma mudança local apenas os nós
+        desbalanceados são recortados e as folhas fora deles permanecem iguais.
+        """
+        weights = np.ones((16, 16))
+        state = ppb.PartitionState(weights)
+        previous = state.partition(8).copy()
+        previous_table = state.prefix_table
+        
+        state.repartition(weights)
+        self.assertEqual(state.recut_prefixes, [])
+        np.testing.assert_array_equal(state.labels, previous)
+        
+        changed = weights.copy()
+        changed[0:3, 0:3] = 4.0
+        labels = state.repartition(changed, tolerance=0.05)
+        
+        self.assertTrue(state.recut_prefixes)
+        self.assertEqual(state.n_parts, 8)
+        self.assertTrue(np.all(labels >= 0))
+        
+        # As folhas que não pertencem a nenhum nó recortado continuam idênticas
+        for prefix, label in state.prefix_table.items():
+            if not any(prefix.startswith(recut) for recut in state.recut_prefixes):
+                np.testing.assert_array_equal(labels == label, previous == previous_table[prefix])
+    
+    def test_repartition_non_convex(self):
+        """
+        Testa se cortes legitimamente desiguais de um domínio não convexo são mantidos.
+        
+        Com os mesmos pesos nada é recortado, em 2D e em 3D; uma mudança de peso que desloca
+        o corte da raiz leva ao recorte.
+        """
+        # Domínio em forma de U: o primeiro corte não consegue ficar dentro da tolerância
+        weights = np.zeros((40, 40))
+        weights[:, :10] = 1
+        weights[:, 30:] = 1
+        weights[30:, :] = 1
+        state = ppb.PartitionState(weights, mask=weights > 0)
+        labels = state.partition(5).copy()
+        self.assertGreater(abs(state.splits[''] - 2 / 5), 0.02)
+        
+        state.repartition(weights, tolerance=0.02)
+        self.assertEqual(state.recut_prefixes, [])
+        np.testing.assert_array_equal(state.labels, labels)
+        
+        changed = weights.copy()
+        changed[:15, :10] *= 3
+        state.repartition(changed, tolerance=0.02)
+        self.assertIn('', state.recut_prefixes)
+        self.assertTrue(state.quality()['valid'])
+        
+        mesh = m3d.create_3d_mesh()
+        state3d = ppb.PartitionState(mesh, mask=mesh > 0)
+        state3d.partition(4)
+        state3d.repartition(mesh, tolerance=0.02)
+        self.assertEqual(state3d.recut_prefixes, [])
+
+    def test_multilevel_division_indices(self):
+        """
+        Testa a bisseção multinível em um domínio anelar maior que a grade grossa.
+        
+        Os dois subconjuntos devem cobrir o domínio, ser conectados e ter peso próximo do alvo.
+        """
+        rng = np.random.default_rng(11)
+        weights = rng.integers(1, 9, size=(70, 90)).astype(float)
+        rows, cols = np.mgrid[:70, :90]
+        mask = ((rows - 35) ** 2 / 35 ** 2 + (cols - 45) ** 2 / 45 ** 2 < 1) & \
+               ((rows - 35) ** 2 + (cols - 30) ** 2 > 12 ** 2)
+        indices = np.flatnonzero(mask)
+        
+        first, second = ppb.find_best_multilevel_division_indices(
+            weights.ravel(), weights.shape, indices, 1, 2, coarse_cells=200
+        )
+        
+        np.testing.assert_array_equal(np.sort(np.concatenate([first, second])), indices)
+        total = weights.ravel()[indices].sum()
+        self.assertAlmostEqual(weights.ravel()[first].sum() / total, 1 / 3, delta=0.01)
+        for subset in (first, second):
+            local, local_shape = ppb._indices_to_local(subset, weights.shape)
+            labels = conn.label_cell_components(ppb._neighbor_table(local, local_shape))
+            self.assertTrue(np.all(labels == labels[0]))
+
+    def test_partition_state_multilevel_engine(self):
+        """
+        Testa a seleção do motor multinível em PartitionState e na API de dicionários.
+        """
+        weights = np.random.default_rng(5).integers(1, 9, size=(40, 40))
+        
+        with patch.object(ppb, 'MULTILEVEL_COARSE_CELLS', 100):
+            state = ppb.PartitionState(weights)
+            labels = state.partition(4, engine='multilevel')
+            self.assertEqual(state.engine, 'multilevel')
+            
+            part_weights = np.bincount(labels.ravel(), weights=weights.ravel())
+            self.assertLess(part_weights.max() / part_weights.mean() - 1, 0.02)
+            
+            # O reparticionamento reutiliza o motor da última partição
+            state.repartition(weights)
+            self.assertEqual(state.recut_prefixes, [])
+            
+            result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 3, engine='multilevel')
+            self.assertEqual(sum(len(subset) for subset in result.values()), len(self.test_dict_medium))
+        
+        with self.assertRaises(ValueError):
+            state.partition(4, engine='desconhecido')
+
+    def test_level_synchronous_division_indices(self):
+        """
+        Testa a recursão em largura contra a recursão serial.
+        
+        As folhas devem ter os mesmos prefixos, cobrir todas as células, ser conectadas e ter
+        balanceamento equivalente ao da recursão serial.
+        """
+        rng = np.random.default_rng(3)
+        weights = rng.integers(1, 9, size=(60, 45))
+        rows, cols = np.mgrid[:60, :45]
+        mask = (rows - 30) ** 2 / 30 ** 2 + (cols - 22) ** 2 / 22 ** 2 < 1
+        indices = np.flatnonzero(mask)
+        
+        tree = {}
+        leaves = ppb.level_synchronous_binary_subset_division_indices(
+            weights.ravel(), weights.shape, indices, 12, tree=tree
+        )
+        serial = ppb.recursive_binary_subset_division_indices(weights.ravel(), weights.shape, indices, 12)
+        
+        self.assertEqual([prefix for prefix, _ in leaves], [prefix for prefix, _ in serial])
+        self.assertEqual(len(tree), 11)
+        np.testing.assert_array_equal(np.sort(np.concatenate([subset for _, subset in leaves])), indices)
+        
+        labels = np.full(weights.shape, -1)
+        for label, (_, subset) in enumerate(leaves):
+            labels.ravel()[subset] = label
+        quality = ppb.evaluate_label_quality(labels, weights, mask)
+        self.assertTrue(quality['valid'])
+        self.assertLess(quality['imbalance'], 1.05)
+
+    def test_partition_state_batched(self):
+        """
+        Testa a opção `batched` de PartitionState e da API de dicionários.
+        """
+        weights = np.random.default_rng(8).integers(1, 9, size=(30, 30))
+        state = ppb.PartitionState(weights)
+        labels = state.partition(8, batched=True)
+        
+        self.assertEqual(state.n_parts, 8)
+        self.assertTrue(state.quality()['valid'])
+        
+        # A árvore da recursão em largura serve para o reparticionamento incremental
+        state.repartition(weights)
+        self.assertEqual(state.recut_prefixes, [])
+        np.testing.assert_array_equal(state.labels, labels)
+        
+        result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 4, batched=True)
+        self.assertEqual(sum(len(subset) for subset in result.values()), len(self.test_dict_medium))
+        
+        with self.assertRaises(ValueError):
+            state.partition(4, batched=True, refine=0.02)
+
+    def test_multisection_division_indices(self):
+        """
+        Testa a multissecção: uma ordenação para vários níveis, mesmos prefixos da recursão
+        binária, folhas conectadas e balanceadas.
+        """
+        rng = np.random.default_rng(12)
+        weights = rng.integers(1, 9, size=(80, 90))
+        rows, cols = np.mgrid[:80, :90]
+        mask = (rows - 40) ** 2 / 40 ** 2 + (cols - 45) ** 2 / 45 ** 2 < 1
+        indices = np.flatnonzero(mask)
+        
+        tree = {}
+        with instr.profile() as stats:
+            leaves = ppb.multisection_subset_division_indices(
+                weights.ravel(), weights.shape, indices, 24, tree=tree
+            )
+        serial = ppb.recursive_binary_subset_division_indices(weights.ravel(), weights.shape, indices, 24)
+        
+        self.assertEqual([prefix for prefix, _ in leaves], [prefix for prefix, _ in serial])
+        self.assertEqual(len(tree), 23)
+        np.testing.assert_array_equal(np.sort(np.concatenate([subset for _, subset in leaves])), indices)
+        # 24 -> 4 fatias de 6 -> 2 fatias de 3 -> 1 + 2 -> 1 + 1: 1 + 4 + 8 + 8 ordenações
+        self.assertEqual(stats.counters()['multisections'], 21)
+        self.assertEqual(stats.phase_totals()['sort']['calls'], 21)
+        # Os nós internos de uma mesma multissecção compartilham o eixo
+        self.assertIs(tree['0'], tree[''])
+        
+        labels = np.full(weights.shape, -1)
+        for label, (_, subset) in enumerate(leaves):
+            labels.ravel()[subset] = label
+        quality = ppb.evaluate_label_quality(labels, weights, mask)
+        self.assertTrue(quality['valid'])
+        self.assertLess(quality['imbalance'], 1.05)
+    
+    def test_multisection_fallback(self):
+        """
+        Testa a bisseção comum nos cortes da multissecção que desconectariam uma fatia.
+        """
+        # Domínio em forma de U: as fatias verticais centrais cortam os dois braços
+        weights = np.zeros((40, 40), dtype=int)
+        weights[:, :10] = 1
+        weights[:, 30:] = 1
+        weights[30:, :] = 1
+        mask = weights > 0
+        
+        state = ppb.PartitionState(weights, mask)
+        with instr.profile() as stats:
+            state.partition(9, multisection=2)
+        self.assertGreater(stats.counters()['multisection_fallback'], 0)
+        self.assertEqual(state.n_parts, 9)
+        self.assertTrue(state.quality()['valid'])
+    
+    def test_partition_state_multisection(self):
+        """
+        Testa a opção `multisection` de PartitionState, em 2D e 3D, e o reparticionamento.
+        """
+        weights = np.random.default_rng(8).integers(1, 9, size=(40, 50))
+        state = ppb.PartitionState(weights)
+        labels = state.partition(12, multisection=True).copy()
+        self.assertEqual(state.n_parts, 12)
+        self.assertTrue(state.quality()['valid'])
+        
+        # Reparticionamento com a mesma opção: nada a recortar com os mesmos pesos
+        state.repartition(weights)
+        self.assertEqual(state.recut_prefixes, [])
+        np.testing.assert_array_equal(state.labels, labels)
+        shifted = weights.copy()
+        shifted[:20, :25] *= 3
+        state.repartition(shifted)
+        self.assertIn('', state.recut_prefixes)
+        self.assertTrue(state.quality()['valid'])
+        
+        mesh = m3d.refine_mesh(m3d.create_3d_mesh(), {1: {3: [(2, 4, 2, 2, 1)]}})
+        state3d = ppb.PartitionState(mesh, mask=mesh > 0)
+        labels3d = state3d.partition(6, multisection=True)
+        self.assertEqual(state3d.n_parts, 6)
+        np.testing.assert_array_equal(conn.components_per_label(labels3d), np.ones(6))
+        
+        result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 5, multisection=True)
+        self.assertEqual(sum(len(subset) for subset in result.values()), len(self.test_dict_medium))
+        
+        with self.assertRaises(ValueError):
+            state.partition(4, multisection=True, batched=True)
+        with self.assertRaises(ValueError):
+            state.partition(4, multisection=True, engine='multilevel')
+
+    def test_fm_refine_bisection_indices(self):
+        """
+        Testa o refinamento FM de uma bisseção com corte irregular.
+        
+        O corte não pode aumentar, o balanceamento deve respeitar a tolerância e os dois
+        subconjuntos devem continuar conectados; o relatório deve conter o corte real.
+        """
+        weights = np.ones((20, 20))
+        rows, cols = np.mgrid[:20, :20]
+        # Corte em degraus: o primeiro subconjunto é um triângulo com a borda em escada
+        first_mask = cols + (rows % 2) * 2 < 10
+        first = np.flatnonzero(first_mask)
+        second = np.flatnonzero(~first_mask)
+        
+        refined_first, refined_second, report = ppb.fm_refine_bisection_indices(
+            weights.ravel(), weights.shape, first, second, 1, 1, tolerance=0.05
+        )
+        
+        def cut(subset):
+            grid = np.zeros((20, 20), dtype=bool)
+            grid.ravel()[subset] = True
+            return int(np.count_nonzero(grid[1:] != grid[:-1]) + np.count_nonzero(grid[:, 1:] != grid[:, :-1]))
+        
+        self.assertEqual(report['cut_before'], cut(first))
+        self.assertEqual(report['cut_after'], cut(refined_first))
+        self.assertLess(report['cut_after'], report['cut_before'])
+        self.assertLessEqual(abs(len(refined_first) - 200), 0.05 * 400)
+        np.testing.assert_array_equal(np.sort(np.concatenate([refined_first, refined_second])), np.arange(400))
+        for subset in (refined_first, refined_second):
+            local, local_shape = ppb._indices_to_local(subset, weights.shape)
+            labels = conn.label_cell_components(ppb._neighbor_table(local, local_shape))
+            self.assertTrue(np.all(labels == labels[0]))
+
+    def test_fm_refine_rebalances(self):
+        """
+        Testa se o refinamento FM reequilibra um corte inicial fora da tolerância.
+        
+        Partindo de 20% das células no primeiro lado, são necessárias mais passagens que
+        `max_passes`, cada uma a partir da fronteira deslocada pela anterior.
+        """
+        weights = np.ones((20, 30))
+        cols = np.mgrid[:20, :30][1]
+        first, second = np.flatnonzero(cols < 6), np.flatnonzero(cols >= 6)
+        
+        refined_first, refined_second, report = ppb.fm_refine_bisection_indices(
+            weights.ravel(), weights.shape, first, second, 1, 1, tolerance=0.02, max_passes=4
+        )
+        
+        self.assertLessEqual(abs(len(refined_first) - 300), 0.02 * 600)
+        self.assertGreater(report['passes'], 4)
+        self.assertEqual(report['cut_after'], 20)
+        for subset in (refined_first, refined_second):
+            local, local_shape = ppb._indices_to_local(subset, weights.shape)
+            labels = conn.label_cell_components(ppb._neighbor_table(local, local_shape))
+            self.assertTrue(np.all(labels == labels[0]))
+        self.assertTrue(report['balanced'])
+        self.assertLessEqual(report['deviation'], 0.02)
+    
+    def test_fm_refine_reports_unbalanced(self):
+        """
+        Testa se o relatório do FM indica um corte que não pôde ser reequilibrado.
+        
+        O primeiro lado é uma única célula pesada: movê-la esvaziaria o lado e nenhuma célula
+        leve cabe nele sem piorar o desvio, de modo que a folga é apenas um alvo.
+        """
+        weights = np.ones((1, 11))
+        weights[0, 0] = 100
+        
+        refined_first, refined_second, report = ppb.fm_refine_bisection_indices(
+            weights.ravel(), weights.shape, [0], np.arange(1, 11), 1, 1, tolerance=0.05
+        )
+        
+        np.testing.assert_array_equal(refined_first, [0])
+        self.assertFalse(report['balanced'])
+        self.assertAlmostEqual(report['deviation'], 45 / 110)
+        
+        # Na árvore, o mesmo indicador aponta os nós fora da folga
+        state = ppb.PartitionState(weights)
+        state.partition(2, refine=0.05)
+        self.assertEqual([prefix for prefix, node in state.cut_report.items() if not node['balanced']], [''])
+    
+    def test_refine_imbalance_bound(self):
+        """
+        Testa se o desbalanceamento final com refinamento respeita a tolerância em vários níveis.
+        
+        A folga de cada nó é reduzida por `_level_tolerance`; partindo de cortes próximos da
+        folga, o desbalanceamento composto das folhas fica dentro de `1 + refine`, sem aumentar
+        o corte, e nenhum nó é marcado como fora da folga.
+        """
+        self.assertAlmostEqual(ppb._level_tolerance(0.03, 1, 1, 3), (1.03 ** 0.25 - 1) / 2)
+        for seed in range(3):
+            weights = np.random.default_rng(seed).integers(1, 9, size=(90, 120))
+            for n_subsets in (8, 12, 16):
+                unrefined = ppb.PartitionState(weights)
+                unrefined.partition(n_subsets)
+                state = ppb.PartitionState(weights)
+                state.partition(n_subsets, refine=0.03)
+                
+                quality = state.quality()
+                self.assertTrue(quality['valid'])
+                self.assertLessEqual(quality['imbalance'], 1.03)
+                self.assertLessEqual(quality['edge_cut'], unrefined.quality()['edge_cut'])
+                self.assertTrue(all(report['balanced'] for report in state.cut_report.values()))
+    
+    def test_partition_state_refine(self):
+        """
+        Testa a opção de refinamento FM de PartitionState e da API de dicionários.
+        """
+        weights = np.random.default_rng(2).integers(1, 9, size=(24, 30))
+        
+        state = ppb.PartitionState(weights)
+        state.partition(6, refine=0.02)
+        
+        self.assertEqual(set(state.cut_report), set(state.tree))
+        for report in state.cut_report.values():
+            self.assertLessEqual(report['cut_after'], report['cut_before'])
+        
+        result = ppb.recursive_binary_subset_division_balanced(self.test_dict_medium, 3, refine=0.05)
+        self.assertEqual(sum(len(subset) for subset in result.values()), len(self.test_dict_medium))
+
+    def test_find_best_projection_3d(self):
+        """
+        Testa a bisseção 3D com conectividade de 6 vizinhos.
+        
+        Usa uma malha em forma de U no plano (i, k), na qual o corte mais balanceado ao longo
+        da projeção separaria os braços do U.
+        """
+        mesh = np.zeros((6, 2, 5), dtype=int)
+        mesh[:, :, 0] = 1
+        mesh[:, :, 4] = 1
+        mesh[5, :, 1:4] = 1
+        indices = np.flatnonzero(mesh.ravel())
+        
+        first, second = ppb.find_best_projection_and_division_indices_3d(mesh.ravel(), mesh.shape, indices, 1, 1)
+        
+        np.testing.assert_array_equal(np.sort(np.concatenate([first, second])), indices)
+        for subset in (first, second):
+            self.assertTrue(len(subset))
+            grid = np.full(mesh.shape, -1)
+            grid.ravel()[subset] = 0
+            self.assertEqual(conn.label_components(grid)[1], 1)
+
+    def test_partition_state_3d(self):
+        """
+        Testa o particionamento 3D de uma malha refinada em PartitionState.
+        """
+        mesh = m3d.refine_mesh(m3d.create_3d_mesh(), {1: {3: [(2, 4, 2, 2, 1)]}})
+        state = ppb.PartitionState(mesh, mask=mesh > 0)
+        labels = state.partition(4)
+        
+        self.assertEqual(labels.shape, mesh.shape)
+        self.assertTrue(np.all(labels[mesh > 0] >= 0))
+        self.assertTrue(np.all(labels[mesh == 0] == -1))
+        self.assertEqual(state.n_parts, 4)
+        for label in range(4):
+            self.assertEqual(conn.label_components(np.where(labels == label, 0, -1))[1], 1)
+        
+        part_weights = np.bincount(labels[mesh > 0], weights=mesh[mesh > 0])
+        self.assertLess(part_weights.max() / part_weights.mean(), 1.25)
+        
+        # As chaves do dicionário de resultado são coordenadas (i, j, k)
+        result = state.to_dict()
+        self.assertEqual(sum(len(subset) for subset in result.values()), np.count_nonzero(mesh))
+        self.assertEqual(len(next(iter(result['00']))), 3)
+        
+        with self.assertRaises(ValueError):
+            state.partition(4, engine='multilevel')
+
+    def test_convert_result_to_label_array(self):
+        """
+        Testa a função convert_result_to_label_array.
+        """
+        result = {
+            '1': {(1, 1): 3, (1, 2): 4},
+            '0': {(0, 0): 5, (0, 1): 2}
+        }
+        
+        labels, prefix_table = ppb.convert_result_to_label_array(result, 2, 3)
+        
+        self.assertEqual(labels.dtype, np.int32)
+        self.assertEqual(prefix_table, {'0': 0, '1': 1})
+        np.testing.assert_array_equal(labels, [[0, 0, -1], [-1, 1, 1]])
+
     def test_evaluate_partition_quality(self):
         """
         Testa a função evaluate_partition_quality.
@@ -271,6 +853,80 @@ class TestMeshPartitioning(unittest.TestCase):
         # Correção: A variância de [15, 35] com média 25 é (15-25)² + (35-25)² / 2 = 100
         self.assertAlmostEqual(quality['weight_variance'], 100)
 
+    def test_evaluate_label_quality(self):
+        """
+        Testa as métricas e as verificações de evaluate_label_quality em uma grade conhecida.
+        """
+        labels = np.array([
+            [0, 0, 1, 1],
+            [0, 0, 1, 1],
+            [2, 2, 0, -1],
+        ], dtype=np.int32)
+        weights = np.arange(12, dtype=float).reshape(3, 4)
+        mask = np.ones((3, 4), dtype=bool)
+        
+        quality = ppb.evaluate_label_quality(labels, weights, mask)
+        
+        np.testing.assert_array_equal(quality['subset_weights'], [0 + 1 + 4 + 5 + 10, 2 + 3 + 6 + 7, 8 + 9])
+        np.testing.assert_array_equal(quality['subset_sizes'], [5, 4, 2])
+        self.assertEqual(quality['edge_cut'], 6)
+        np.testing.assert_array_equal(quality['boundary_cells'], [4, 2, 2])
+        np.testing.assert_array_equal(quality['components'], [2, 1, 1])
+        np.testing.assert_array_equal(quality['disconnected_parts'], [0])
+        self.assertEqual(quality['unassigned_cells'], 1)
+        self.assertEqual(quality['cells_outside_mask'], 0)
+        self.assertAlmostEqual(quality['imbalance'], 20 / (66 / 3))
+        self.assertFalse(quality['valid'])
+        
+        # Um rótulo esperado sem células é reportado como vazio
+        quality = ppb.evaluate_label_quality(labels, weights, n_parts=4)
+        np.testing.assert_array_equal(quality['empty_parts'], [3])
+
+    def test_partition_state_quality(self):
+        """
+        Testa se a partição de PartitionState passa nas verificações de qualidade.
+        """
+        weights = np.random.default_rng(4).integers(0, 9, size=(30, 40))
+        state = ppb.PartitionState(weights, mask=weights > 0)
+        state.partition(5)
+        
+        quality = state.quality()
+        
+        self.assertEqual(quality['unassigned_cells'], 0)
+        self.assertEqual(quality['cells_outside_mask'], 0)
+        self.assertEqual(len(quality['subset_sizes']), 5)
+        self.assertEqual(quality['subset_sizes'].sum(), np.count_nonzero(weights > 0))
+        self.assertAlmostEqual(quality['subset_weights'].sum(), weights.sum())
+    
+    def test_quality_3d(self):
+        """
+        Testa as métricas de qualidade em uma grade 3D conhecida e em uma malha 3D particionada.
+        """
+        # Duas camadas: a de baixo dividida em colunas, a de cima com um único rótulo
+        labels = np.array([
+            [[0, 1], [0, 1]],
+            [[2, 2], [2, -1]],
+        ], dtype=np.int32)
+        weights = np.ones((2, 2, 2))
+        quality = ppb.evaluate_label_quality(labels, weights)
+        
+        # 2 pares na camada de baixo (eixo 2) e 3 pares entre as camadas (eixo 0)
+        self.assertEqual(quality['edge_cut'], 5)
+        np.testing.assert_array_equal(quality['boundary_cells'], [2, 2, 3])
+        np.testing.assert_array_equal(quality['components'], [1, 1, 1])
+        self.assertTrue(quality['valid'])
+        
+        mesh = m3d.create_3d_mesh()
+        state = ppb.PartitionState(mesh, mask=mesh > 0)
+        state.partition(4)
+        quality = state.quality()
+        self.assertTrue(quality['valid'])
+        self.assertEqual(quality['subset_sizes'].sum(), np.count_nonzero(mesh > 0))
+        self.assertGreater(quality['edge_cut'], 0)
+        
+        with self.assertRaises(ValueError):
+            ppb.evaluate_label_quality(np.zeros(4), np.zeros(4))
+
     def test_recursive_binary_subset_division_balanced(self):
         """
         Testa a função recursive_binary_subset_division_balanced.
@@ -0,0 +1,102 @@
+import unittest
+import numpy as np
+import sys
+import os
+import shutil
+import tempfile
+from PIL import Image
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import renderizacao_lote as rl
+
+def synthetic_frame(step):
+    """
+    Quadro sintético de um passo: mapa de pesos elíptico e faixas de rótulos que se deslocam.
+    """
+    rows, cols = np.mgrid[:60, :80]
+    inside = ((rows - 30) / 28) ** 2 + ((cols - 40) / 36) ** 2 < 1
+    weights = inside * (1 + (rows + cols + step) % 5)
+    labels = np.where(inside, (rows + step) // 15, -1)
+    return {'weights': weights, 'labels': labels}
+
+class TestBatchRendering(unittest.TestCase):
+    """
+    Testes unitários para a renderização em lote de séries temporais.
+    """
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_renderer_reuses_figure(self):
+        """
+        Testa se os quadros seguintes reutilizam a figura e os artistas do primeiro.
+        """
+        renderer = rl.FrameRenderer(clim=(0, 5), max_pixels=1200)
+        renderer.render(synthetic_frame(0), 0, os.path.join(self.temp_dir, 'a.png'))
+        figure, image, boundaries = renderer.figure, renderer.image, renderer.boundaries
+        n_axes = len(figure.axes)
+        
+        renderer.render(synthetic_frame(7), 7, os.path.join(self.temp_dir, 'b.png'))
+        self.assertIs(renderer.figure, figure)
+        self.assertIs(renderer.image, image)
+        self.assertIs(renderer.boundaries, boundaries)
+        self.assertEqual(len(figure.axes), n_axes)
+        self.assertEqual(renderer.title.get_text(), 'Passo 7')
+        
+        # 4800 células reduzidas em blocos 2 x 2 para caber em 1200 elementos
+        self.assertEqual(image.get_array().shape, (30, 40))
+        self.assertEqual(image.get_clim(), (0, 5))
+        self.assertGreater(len(boundaries.get_segments()), 0)
+        with Image.open(os.path.join(self.temp_dir, 'b.png')) as png:
+            self.assertEqual(png.size, (700, 600))
+    
+    def test_mesh_views(self):
+        """
+        Testa o quadro com as duas vistas 3D da malha, atualizadas a cada passo.
+        """
+        mesh = np.zeros((6, 6, 3), dtype=int)
+        mesh[1:5, 1:5, :] = 1
+        mesh[2:4, 2:4, 1] = 3
+        renderer = rl.FrameRenderer(figsize=(12, 4), dpi=50)
+        for step in range(2):
+            frame = dict(synthetic_frame(step), mesh=mesh if step == 0 else np.ones((4, 4, 2), dtype=int))
+            renderer.render(frame, step, os.path.join(self.temp_dir, f'{step}.png'))
+        
+        self.assertEqual(len(renderer.mesh_views), 2)
+        for ax, collection, _, _ in renderer.mesh_views:
+            self.assertEqual(len(ax.collections), 1)
+            # Caixa sólida 4 x 4 x 2: apenas as 64 faces da superfície
+            self.assertEqual(len(collection.get_facecolors()), 64)
+    
+    def test_serial_and_pool_with_animation(self):
+        """
+        Testa a renderização serial de uma sequência e em processos a partir de uma função,
+        com a montagem da animação.
+        """
+        frames = [synthetic_frame(step) for step in range(5)]
+        serial_dir = os.path.join(self.temp_dir, 'serial')
+        paths = rl.render_frames(frames, serial_dir, workers=1, steps=[4, 0, 2], dpi=40)
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ['passo_00004.png', 'passo_00000.png', 'passo_00002.png'])
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        
+        pool_dir = os.path.join(self.temp_dir, 'pool')
+        animation = os.path.join(self.temp_dir, 'serie.gif')
+        paths = rl.render_frames(synthetic_frame, pool_dir, steps=range(6), workers=2, chunk_size=2,
+                                 dpi=40, animation=animation, fps=5)
+        self.assertEqual(paths, [os.path.join(pool_dir, f'passo_{step:05d}.png') for step in range(6)])
+        with Image.open(animation) as gif:
+            self.assertEqual(gif.n_frames, 6)
+        
+        with self.assertRaises(ValueError):
+            rl.render_frames(synthetic_frame, pool_dir)
+        with self.assertRaises(ValueError):
+            rl.assemble_animation([], animation)
+
+if __name__ == '__main__':
+    unittest.main()
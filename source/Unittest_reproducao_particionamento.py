@@ -0,0 +1,127 @@
+import unittest
+import numpy as np
+import sys
+import os
+import io
+import csv
+import shutil
+import tempfile
+import contextlib
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import reproducao_particionamento as rp
+
+def moving_hotspot(n_steps, shape=(30, 36)):
+    """
+    Série sintética: pesos 1 em um disco com um foco de peso 6 que atravessa o domínio.
+    """
+    rows, cols = np.mgrid[:shape[0], :shape[1]]
+    inside = ((rows - 14.5) / 14) ** 2 + ((cols - 17.5) / 17) ** 2 < 1
+    series = []
+    for step in range(n_steps):
+        center = 5 + step * 26 / max(1, n_steps - 1)
+        hotspot = (rows - 15) ** 2 + (cols - center) ** 2 < 25
+        series.append(np.where(inside, 1 + 5 * hotspot, 0).astype(float))
+    return np.array(series)
+
+class TestReplay(unittest.TestCase):
+    """
+    Testes unitários para a reprodução de séries de mapas de pesos.
+    """
+    
+    def setUp(self):
+        self.series = moving_hotspot(6)
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_parse_policy(self):
+        """
+        Testa a criação das políticas a partir de texto.
+        """
+        self.assertEqual(rp.parse_policy('always').name, 'every:1')
+        self.assertEqual(rp.parse_policy('every:5').n, 5)
+        policy = rp.parse_policy('imbalance:1.1:repartition')
+        self.assertEqual((policy.threshold, policy.method, policy.name), (1.1, 'repartition', 'imbalance:1.1:repartition'))
+        for spec in ('sometimes', 'every', 'every:0', 'imbalance:1.1:merge'):
+            with self.assertRaises(ValueError):
+                rp.parse_policy(spec)
+        
+        # ReplayPolicy é abstrata: subclasses sem `_name` ou `due` não podem ser instanciadas
+        class Unnamed(rp.ReplayPolicy):
+            def due(self, steps_since, imbalance):
+                return True
+        
+        for policy_class in (rp.ReplayPolicy, Unnamed):
+            with self.assertRaises(TypeError):
+                policy_class()
+    
+    def test_policies(self):
+        """
+        Testa as ações e métricas registradas por política.
+        """
+        results = rp.replay(self.series, 4, ['always', 'every:3', 'imbalance:1.08', 'imbalance:1.08:repartition'])
+        self.assertEqual(list(results), ['every:1', 'every:3', 'imbalance:1.08', 'imbalance:1.08:repartition'])
+        
+        always = results['every:1']
+        self.assertEqual([record['action'] for record in always], ['partition'] * 6)
+        self.assertIsNone(always[0]['imbalance_before'])
+        self.assertEqual(always[0]['migrated_cells'], 0)
+        self.assertGreater(sum(record['migrated_cells'] for record in always), 0)
+        self.assertTrue(all(record['valid'] for record in always))
+        
+        every = results['every:3']
+        self.assertEqual([record['action'] for record in every],
+                         ['partition', 'keep', 'keep', 'partition', 'keep', 'keep'])
+        for record in every:
+            if record['action'] == 'keep':
+                self.assertEqual((record['time'], record['migrated_cells']), (0.0, 0))
+                self.assertEqual(record['imbalance'], record['imbalance_before'])
+        
+        for name, method in (('imbalance:1.08', 'partition'), ('imbalance:1.08:repartition', 'repartition')):
+            for record in results[name][1:]:
+                expected = method if record['imbalance_before'] > 1.08 else 'keep'
+                self.assertEqual(record['action'], expected)
+        
+        summary = rp.summarize(every)
+        self.assertEqual((summary['steps'], summary['partitions']), (6, 2))
+        self.assertEqual(summary['migrated_cells'], sum(record['migrated_cells'] for record in every))
+        self.assertIn('every:3', rp.format_summary(results))
+    
+    def test_sources_and_tables(self):
+        """
+        Testa a leitura de um diretório e de uma pilha `.npy` e a gravação das tabelas.
+        """
+        directory = os.path.join(self.temp_dir, 'passos')
+        os.makedirs(directory)
+        for step, weights in enumerate(self.series):
+            np.save(os.path.join(directory, f'pesos_{step:03d}.npy'), weights)
+        stack = os.path.join(self.temp_dir, 'pilha.npy')
+        np.save(stack, self.series)
+        
+        expected = rp.replay(list(self.series), 4, ['every:2'])['every:2']
+        for source in (directory, stack):
+            records = rp.replay(source, 4, ['every:2'])['every:2']
+            for key in ('action', 'imbalance', 'edge_cut', 'migrated_cells'):
+                self.assertEqual([record[key] for record in records], [record[key] for record in expected])
+        
+        summary, steps = os.path.join(self.temp_dir, 'resumo.csv'), os.path.join(self.temp_dir, 'passos.csv')
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(rp.main([stack, '-k', '4', '--policy', 'every:2', '--policy', 'imbalance:1.1',
+                                      '--quiet', '-o', summary, '--steps', steps]), 0)
+        self.assertIn('imbalance:1.1', output.getvalue())
+        with open(summary) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual([row['policy'] for row in rows], ['every:2', 'imbalance:1.1'])
+        self.assertEqual(rows[0]['partitions'], '3')
+        with open(steps) as file:
+            self.assertEqual(len(list(csv.DictReader(file))), 12)
+        
+        with self.assertRaises(ValueError):
+            rp.replay(self.series, 4, ['every:2', 'every:2'])
+
+if __name__ == '__main__':
+    unittest.main()
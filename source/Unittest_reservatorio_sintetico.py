@@ -0,0 +1,95 @@
+import unittest
+import numpy as np
+import sys
+import os
+import shutil
+import tempfile
+
+# Adicionando diretório atual ao path para importar o módulo
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import mesh3d as m3d
+import reservatorio_sintetico as rs
+
+class TestSyntheticReservoir(unittest.TestCase):
+    """
+    Testes unitários para o gerador de reservatórios sintéticos.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.reservoir = rs.synthetic_reservoir(40, 50, 6, seed=3)
+    
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+    
+    def test_reproducible(self):
+        """
+        Testa se a mesma semente reproduz o reservatório e se outra semente o altera.
+        """
+        again = rs.synthetic_reservoir(40, 50, 6, seed=3)
+        for name in rs.RESERVOIR_ARRAYS:
+            np.testing.assert_array_equal(again[name], self.reservoir[name])
+        other = rs.synthetic_reservoir(40, 50, 6, seed=4)
+        self.assertFalse(np.array_equal(other['mesh'], self.reservoir['mesh']))
+    
+    def test_structure(self):
+        """
+        Testa a malha, os canais, o refinamento e o mapa de pesos gerados.
+        """
+        mesh, refined = self.reservoir['mesh'], self.reservoir['refined']
+        active = mesh > 0
+        self.assertEqual(mesh.shape, (40, 50, 6))
+        self.assertTrue(0.2 < active.mean() < 0.8)
+        
+        # Os intervalos reproduzem a malha e os canais estão nas células ativas
+        np.testing.assert_array_equal(m3d.create_3d_mesh(40, 50, 6, self.reservoir['intervals']), active)
+        self.assertTrue(self.reservoir['channels'].any())
+        self.assertFalse((self.reservoir['channels'] & ~active).any())
+        
+        # Refinamento apenas nas células ativas, com regiões disjuntas
+        np.testing.assert_array_equal(refined > 0, active)
+        self.assertGreater((refined > 1).sum(), 0)
+        np.testing.assert_array_equal(refined, m3d.refine_mesh(mesh, self.reservoir['refinement']))
+        np.testing.assert_array_equal(self.reservoir['weights'], refined.sum(axis=2))
+        for i, j in self.reservoir['wells']:
+            self.assertTrue(active[i, j].any())
+    
+    def test_aim_fields(self):
+        """
+        Testa as frações implícitas e os mapas de pesos de cada passo, em memória e em arquivo.
+        """
+        fractions = rs.aim_implicit_fractions(self.reservoir, 6, seed=1)
+        self.assertEqual(fractions.shape, (6, 40, 50))
+        self.assertTrue(((fractions >= 0) & (fractions <= 1)).all())
+        self.assertFalse((fractions[:, self.reservoir['weights'] == 0] > 0).any())
+        self.assertFalse(np.array_equal(fractions[0], fractions[-1]))
+        
+        path = os.path.join(self.temp_dir, 'pesos.npy')
+        weights = rs.aim_weight_maps(self.reservoir, 6, seed=1, implicit_cost=3.0, out=path)
+        loaded = np.load(path, mmap_mode='r')
+        self.assertEqual(loaded.shape, (6, 40, 50))
+        np.testing.assert_array_equal(loaded, weights)
+        
+        # Peso da coluna entre o da malha refinada e três vezes esse valor
+        base = self.reservoir['weights']
+        self.assertTrue(((loaded >= base) & (loaded <= 3 * base)).all())
+        np.testing.assert_allclose(rs.aim_weight_maps(self.reservoir, 6, seed=1, implicit_cost=1.0),
+                                   np.broadcast_to(base, (6, 40, 50)))
+    
+    def test_save_and_load(self):
+        """
+        Testa a gravação dos arrays em `.npy` e a leitura mapeada.
+        """
+        paths = rs.save_reservoir(self.reservoir, os.path.join(self.temp_dir, 'reservatorio'))
+        self.assertEqual(set(paths), set(rs.RESERVOIR_ARRAYS))
+        loaded = rs.load_reservoir(os.path.join(self.temp_dir, 'reservatorio'))
+        self.assertIsInstance(loaded['mesh'], np.memmap)
+        for name in rs.RESERVOIR_ARRAYS:
+            np.testing.assert_array_equal(loaded[name], self.reservoir[name])
+
+if __name__ == '__main__':
+    unittest.main()
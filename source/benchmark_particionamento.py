@@ -0,0 +1,449 @@
+"""
+Suíte de benchmarks das rotinas de malha e de particionamento.
+
+Mede as rotinas de `mesh3d.py` e de `particionamento_por_bissecao.py` em malhas de 10^2 a 10^6
+células e de 2 a 1024 subdomínios, grava os tempos em JSON com os metadados da máquina e compara
+duas execuções, apontando as regressões acima de um limiar. Os benchmarks `reservoir_*` usam
+reservatórios sintéticos com canais, falhas e refinamento agrupado (`reservatorio_sintetico.py`).
+
+Uso
+---
+    python benchmark_particionamento.py run -o base.json
+    python benchmark_particionamento.py run -o novo.json --engine multilevel --sizes 10000 1000000
+    python benchmark_particionamento.py compare base.json novo.json --threshold 0.10
+    python benchmark_particionamento.py run -o python.json --backend python   # A/B com --backend numba
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import datetime
+import subprocess
+import numpy as np
+import mesh3d as m3d
+import particionamento_por_bissecao as ppb
+import nucleos_compilados as nc
+import reservatorio_sintetico as rs
+
+# Versão do formato do arquivo de resultados
+SCHEMA_VERSION = 1
+
+DEFAULT_SIZES = (10**2, 10**3, 10**4, 10**5, 10**6)
+DEFAULT_SUBSETS = (2, 4, 16, 64, 256, 1024)
+
+def _mesh_shape(cells):
+    """Dimensões (nx, ny, nz) de uma malha com aproximadamente `cells` células (nz ~ raiz cúbica)."""
+    nz = max(1, round(cells ** (1 / 3) / 4))
+    side = max(1, round(math.sqrt(cells / nz)))
+    return side, side, nz
+
+def _grid_shape(cells):
+    """Dimensões (m, p) de um mapa 2D com aproximadamente `cells` colunas."""
+    side = max(1, round(math.sqrt(cells)))
+    return side, side
+
+def synthetic_intervals(nx, ny, nz, seed=0):
+    """
+    Intervalos ativos de uma malha sintética com contorno elíptico por camada.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array estruturado com os campos de `mesh3d.ACTIVE_INTERVAL_DTYPE`.
+    """
+    rng = np.random.default_rng(seed)
+    layers, rows = np.divmod(np.arange(nx * nz), nx)
+    half_width = ny / 2 * np.sqrt(np.clip(1 - ((rows + 0.5) / nx * 2 - 1) ** 2, 0, 1))
+    jitter = rng.integers(0, max(1, ny // 20), len(rows))
+    table = np.zeros(len(rows), dtype=m3d.ACTIVE_INTERVAL_DTYPE)
+    table['k'], table['i'] = layers, rows
+    table['j_start'] = np.floor(ny / 2 - half_width).astype(np.int64) + jitter
+    table['j_end'] = np.ceil(ny / 2 + half_width).astype(np.int64)
+    return table[table['j_start'] < table['j_end']]
+
+def synthetic_refinement(nx, ny, nz, seed=0):
+    """
+    Regiões de refinamento sintéticas: metade central das colunas de uma linha em cada quatro.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array estruturado com os campos de `mesh3d.REFINEMENT_INTERVAL_DTYPE`.
+    """
+    rng = np.random.default_rng(seed)
+    layers, rows = np.divmod(np.arange(0, nx * nz, 4), nx)
+    table = np.zeros(len(rows), dtype=m3d.REFINEMENT_INTERVAL_DTYPE)
+    table['k'], table['i'] = layers, rows
+    table['j_start'], table['j_end'] = ny // 4, max(ny // 4, 3 * ny // 4 - 1)
+    table['factor_i'] = rng.integers(1, 4, len(rows))
+    table['factor_j'] = rng.integers(1, 4, len(rows))
+    table['factor_k'] = 1
+    return table
+
+def synthetic_weights(cells, seed=0):
+    """
+    Mapa de pesos 2D com contorno elíptico e pesos inteiros de 1 a 8 (0 fora do contorno).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array (m, p) de pesos `int64`.
+    """
+    m, p = _grid_shape(cells)
+    rng = np.random.default_rng(seed)
+    x, y = np.meshgrid((np.arange(m) + 0.5) / m * 2 - 1, (np.arange(p) + 0.5) / p * 2 - 1, indexing='ij')
+    inside = x ** 2 + y ** 2 <= 1
+    return np.where(inside, rng.integers(1, 9, (m, p)), 0).astype(np.int64)
+
+def reservoir_workload(cells, seed=0):
+    """
+    Reservatório sintético com canais, falhas, furos e refinamento agrupado (ver
+    `reservatorio_sintetico.synthetic_reservoir`), com aproximadamente `cells` células.
+    
+    Returns
+    -------
+    dict
+        Saída de `synthetic_reservoir`.
+    """
+    return rs.synthetic_reservoir(*_mesh_shape(cells), seed=seed)
+
+def _weights_to_dict(weights):
+    """Dicionário {(i, j): peso} das colunas ativas, no formato da API de dicionários."""
+    rows, columns = np.nonzero(weights)
+    return dict(zip(zip(rows.tolist(), columns.tolist()), weights[rows, columns].tolist()))
+
+# Cada benchmark recebe (cells, n_subsets, seed, options), prepara as entradas fora da medição
+# e devolve a função medida; `uses_subsets` indica se o tempo depende do número de subdomínios.
+
+def _bench_create_3d_mesh(cells, n_subsets, seed, options):
+    shape = _mesh_shape(cells)
+    table = synthetic_intervals(*shape, seed)
+    return lambda: m3d.create_3d_mesh(*shape, table)
+
+def _bench_refine_mesh(cells, n_subsets, seed, options):
+    shape = _mesh_shape(cells)
+    mesh = m3d.create_3d_mesh(*shape, synthetic_intervals(*shape, seed))
+    regions = synthetic_refinement(*shape, seed)
+    return lambda: m3d.refine_mesh(mesh, regions)
+
+def _bench_compute_weight_array(cells, n_subsets, seed, options):
+    shape = _mesh_shape(cells)
+    mesh = m3d.refine_mesh(m3d.create_3d_mesh(*shape, synthetic_intervals(*shape, seed)),
+                           synthetic_refinement(*shape, seed))
+    return lambda: m3d.compute_weight_array(mesh)
+
+def _bench_inertia_2d(cells, n_subsets, seed, options):
+    weights = synthetic_weights(cells, seed)
+    return lambda: m3d.calculate_principal_moments(m3d.compute_inertia_matrix_from_grid(weights)[0])
+
+def _bench_inertia_3d(cells, n_subsets, seed, options):
+    shape = _mesh_shape(cells)
+    mesh = m3d.create_3d_mesh(*shape, synthetic_intervals(*shape, seed))
+    return lambda: m3d.calculate_principal_moments(m3d.compute_inertia_matrix_3d(mesh)[0])
+
+def _bench_find_best_projection(cells, n_subsets, seed, options):
+    input_dict = _weights_to_dict(synthetic_weights(cells, seed))
+    return lambda: ppb.find_best_projection_and_division_balanced(input_dict, 1, 1)
+
+def _bench_region_growing(cells, n_subsets, seed, options):
+    input_dict = _weights_to_dict(synthetic_weights(cells, seed))
+    sorted_coords = sorted(input_dict, key=lambda coord: coord[0] + coord[1])
+    return lambda: ppb.region_growing_partition(input_dict, 1, 1, sorted_coords)
+
+def _bench_recursive_division(cells, n_subsets, seed, options):
+    input_dict = _weights_to_dict(synthetic_weights(cells, seed))
+    return lambda: ppb.recursive_binary_subset_division_balanced(input_dict, n_subsets, **options)
+
+def _bench_reservoir_refine_mesh(cells, n_subsets, seed, options):
+    reservoir = reservoir_workload(cells, seed)
+    return lambda: m3d.refine_mesh(reservoir['mesh'], reservoir['refinement'])
+
+def _bench_reservoir_division(cells, n_subsets, seed, options):
+    input_dict = _weights_to_dict(reservoir_workload(cells, seed)['weights'])
+    return lambda: ppb.recursive_binary_subset_division_balanced(input_dict, n_subsets, **options)
+
+BENCHMARKS = {
+    'create_3d_mesh': (_bench_create_3d_mesh, False),
+    'refine_mesh': (_bench_refine_mesh, False),
+    'compute_weight_array': (_bench_compute_weight_array, False),
+    'inertia_2d': (_bench_inertia_2d, False),
+    'inertia_3d': (_bench_inertia_3d, False),
+    'find_best_projection_and_division_balanced': (_bench_find_best_projection, False),
+    'region_growing_partition': (_bench_region_growing, False),
+    'recursive_binary_subset_division_balanced': (_bench_recursive_division, True),
+    'reservoir_refine_mesh': (_bench_reservoir_refine_mesh, False),
+    'reservoir_division': (_bench_reservoir_division, True),
+}
+
+def machine_metadata():
+    """
+    Metadados da máquina e do código em que os benchmarks foram executados.
+    
+    Returns
+    -------
+    dict
+        Sistema, processador, número de CPUs, versões de Python, NumPy e Numba, backend dos núcleos
+        compilados ('numba' ou 'python'), commit (se disponível) e data.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'numba': nc.numba.__version__ if nc.available() else None,
+        'backend': nc.active_backend(),
+        'hostname': platform.node(),
+        'commit': commit,
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+    }
+
+def time_call(function, repeats=3, max_seconds=None):
+    """
+    Mede o tempo de parede de `function` em várias repetições.
+    
+    Parameters
+    ----------
+    function : callable
+        Função sem argumentos a medir.
+    repeats : int
+        Número máximo de repetições.
+    max_seconds : float, optional
+        Interrompe as repetições quando o tempo acumulado passa deste valor (ao menos uma é feita).
+    
+    Returns
+    -------
+    list
+        Tempos, em segundos, de cada repetição.
+    """
+    times = []
+    for _ in range(max(1, repeats)):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        if max_seconds is not None and sum(times) > max_seconds:
+            break
+    return times
+
+def run_benchmarks(names=None, sizes=DEFAULT_SIZES, subsets=DEFAULT_SUBSETS, repeats=3, seed=0,
+                   max_seconds=60.0, options=None, log=None):
+    """
+    Executa os benchmarks em todas as combinações de tamanho e número de subdomínios.
+    
+    Os tamanhos são percorridos em ordem crescente; quando um caso passa de `max_seconds`, os
+    tamanhos maiores do mesmo benchmark (e número de subdomínios) são pulados e registrados como tal.
+    
+    Parameters
+    ----------
+    names : list of str, optional
+        Benchmarks a executar (chaves de `BENCHMARKS`). Se None, executa todos.
+    sizes : sequence of int
+        Números aproximados de células de cada malha.
+    subsets : sequence of int
+        Números de subdomínios dos benchmarks que dependem dele; valores maiores que um quarto
+        das colunas ativas são ignorados.
+    repeats : int
+        Repetições de cada caso.
+    seed : int
+        Semente dos dados sintéticos.
+    max_seconds : float, optional
+        Limite de tempo de um caso antes de pular os tamanhos maiores. None desativa o limite.
+    options : dict, optional
+        Opções repassadas a `recursive_binary_subset_division_balanced` (por exemplo `engine`).
+    log : callable, optional
+        Função chamada com uma linha de texto após cada caso.
+    
+    Returns
+    -------
+    dict
+        {'schema', 'metadata', 'options', 'results'} onde cada resultado tem 'benchmark', 'cells',
+        'n_subsets', 'times', 'min', 'median' e 'status' ('ok' ou 'skipped').
+    """
+    names = list(BENCHMARKS) if names is None else list(names)
+    unknown = sorted(set(names) - set(BENCHMARKS))
+    if unknown:
+        raise ValueError(f"Benchmarks desconhecidos: {unknown}. Disponíveis: {sorted(BENCHMARKS)}")
+    options = dict(options or {})
+    
+    results = []
+    for name in names:
+        setup, uses_subsets = BENCHMARKS[name]
+        for n_subsets in (sorted(subsets) if uses_subsets else [None]):
+            too_slow = False
+            for cells in sorted(sizes):
+                active = int(np.count_nonzero(synthetic_weights(cells, seed))) if uses_subsets else cells
+                if uses_subsets and n_subsets * 4 > active:
+                    continue
+                entry = {'benchmark': name, 'cells': int(cells), 'n_subsets': n_subsets}
+                if too_slow:
+                    entry.update(times=[], min=None, median=None, status='skipped')
+                else:
+                    function = setup(cells, n_subsets, seed, options)
+                    times = time_call(function, repeats, max_seconds)
+                    entry.update(times=times, min=min(times), median=float(np.median(times)), status='ok')
+                    too_slow = max_seconds is not None and min(times) > max_seconds
+                results.append(entry)
+                if log is not None:
+                    log(_format_entry(entry))
+    
+    return {'schema': SCHEMA_VERSION, 'metadata': machine_metadata(), 'options': options, 'results': results}
+
+def _format_entry(entry):
+    label = entry['benchmark'] + ('' if entry['n_subsets'] is None else f" k={entry['n_subsets']}")
+    timing = 'pulado' if entry['status'] == 'skipped' else f"{entry['median'] * 1e3:10.2f} ms"
+    return f"{label:<55} {entry['cells']:>9} células {timing}"
+
+def scaling_exponents(report):
+    """
+    Expoente de escala de cada curva: inclinação de log(tempo) contra log(células).
+    
+    Returns
+    -------
+    dict
+        {(benchmark, n_subsets): expoente} das curvas com pelo menos dois tamanhos medidos.
+    """
+    curves = {}
+    for entry in report['results']:
+        if entry['status'] == 'ok' and entry['min'] > 0:
+            curves.setdefault((entry['benchmark'], entry['n_subsets']), []).append((entry['cells'], entry['min']))
+    return {curve: float(np.polyfit(np.log([cells for cells, _ in points]), np.log([t for _, t in points]), 1)[0])
+            for curve, points in curves.items() if len({cells for cells, _ in points}) > 1}
+
+def save_report(report, path):
+    """Grava o relatório de `run_benchmarks` em JSON."""
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+def load_report(path):
+    """Lê um relatório gravado por `save_report`."""
+    with open(path) as file:
+        report = json.load(file)
+    if report.get('schema') != SCHEMA_VERSION:
+        raise ValueError(f"Versão do relatório não suportada em {path}: {report.get('schema')}")
+    return report
+
+def compare_reports(baseline, current, threshold=0.10, min_seconds=1e-3, statistic='min'):
+    """
+    Compara dois relatórios caso a caso.
+    
+    Um caso é uma regressão quando o tempo atual passa do de referência por mais de `threshold`
+    (fração) e a diferença absoluta passa de `min_seconds` (para ignorar o ruído dos casos rápidos).
+    
+    Parameters
+    ----------
+    baseline, current : dict
+        Relatórios de `run_benchmarks` (ou lidos com `load_report`).
+    threshold : float
+        Aumento relativo tolerado. Valor padrão é 0.10 (10%).
+    min_seconds : float
+        Diferença absoluta mínima para apontar uma regressão.
+    statistic : str
+        Estatística comparada: 'min' (padrão) ou 'median'.
+    
+    Returns
+    -------
+    dict
+        'rows' com (benchmark, células, k, referência, atual, razão, situação) de cada caso medido nos
+        dois relatórios, 'regressions' com as linhas em regressão e 'metadata_differences' com os
+        campos de metadados da máquina que diferem.
+    """
+    def index(report):
+        return {(entry['benchmark'], entry['cells'], entry['n_subsets']): entry
+                for entry in report['results'] if entry['status'] == 'ok'}
+    
+    baseline_entries = index(baseline)
+    current_entries = index(current)
+    rows = []
+    for key in sorted(baseline_entries.keys() & current_entries.keys(), key=lambda key: (key[0], key[2] or 0, key[1])):
+        before = baseline_entries[key][statistic]
+        after = current_entries[key][statistic]
+        ratio = after / before if before > 0 else math.inf
+        if ratio > 1 + threshold and after - before > min_seconds:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold) and before - after > min_seconds:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append(key + (before, after, ratio, status))
+    
+    compared_fields = ('machine', 'processor', 'cpu_count', 'python', 'numpy', 'numba', 'backend', 'hostname')
+    metadata_differences = {field: (baseline['metadata'].get(field), current['metadata'].get(field))
+                            for field in compared_fields
+                            if baseline['metadata'].get(field) != current['metadata'].get(field)}
+    return {'rows': rows, 'regressions': [row for row in rows if row[-1] == 'regression'],
+            'metadata_differences': metadata_differences}
+
+def _print_comparison(comparison, threshold):
+    for field, (before, after) in comparison['metadata_differences'].items():
+        print(f"Aviso: metadados diferentes ({field}): {before} -> {after}")
+    for name, cells, n_subsets, before, after, ratio, status in comparison['rows']:
+        label = name + ('' if n_subsets is None else f" k={n_subsets}")
+        marker = {'regression': 'REGRESSÃO', 'improvement': 'melhora', 'ok': ''}[status]
+        print(f"{label:<55} {cells:>9} {before * 1e3:10.2f} ms -> {after * 1e3:10.2f} ms  x{ratio:5.2f} {marker}")
+    print(f"\n{len(comparison['regressions'])} regressão(ões) acima de {threshold:.0%} "
+          f"em {len(comparison['rows'])} casos comparados.")
+
+def main(argv=None):
+    """
+    Linha de comando: `run` executa e grava os benchmarks; `compare` compara dois relatórios e
+    termina com código 1 se houver regressões.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    run = commands.add_parser('run', help='executa os benchmarks e grava o JSON')
+    run.add_argument('-o', '--output', required=True, help='arquivo JSON de saída')
+    run.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks a executar (padrão: todos)')
+    run.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help='números de células')
+    run.add_argument('--subsets', nargs='+', type=int, default=list(DEFAULT_SUBSETS), help='números de subdomínios')
+    run.add_argument('--repeats', type=int, default=3)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--max-seconds', type=float, default=60.0,
+                     help='pula os tamanhos maiores de um caso que demore mais que isto')
+    run.add_argument('--engine', default='inertial', help='motor de bisseção da divisão recursiva')
+    run.add_argument('--batched', action='store_true', help='divisão recursiva por níveis')
+    run.add_argument('--workers', type=int, default=None, help='processos da divisão recursiva')
+    run.add_argument('--backend', choices=nc.BACKENDS, default=None,
+                     help='caminho dos laços pesados (padrão: PARTICIONAMENTO_BACKEND ou auto)')
+    
+    compare = commands.add_parser('compare', help='compara dois relatórios JSON')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10, help='aumento relativo tolerado (0.10 = 10%%)')
+    compare.add_argument('--min-seconds', type=float, default=1e-3, help='diferença absoluta mínima')
+    compare.add_argument('--statistic', choices=('min', 'median'), default='min')
+    
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        if args.backend is not None:
+            nc.set_backend(args.backend)
+        options = {'engine': args.engine}
+        if args.batched:
+            options['batched'] = True
+        if args.workers is not None:
+            options['workers'] = args.workers
+        report = run_benchmarks(args.benchmarks, args.sizes, args.subsets, args.repeats, args.seed,
+                                args.max_seconds, options, log=print)
+        save_report(report, args.output)
+        exponents = scaling_exponents(report)
+        for name, n_subsets in sorted(exponents, key=lambda curve: (curve[0], curve[1] or 0)):
+            label = name + ('' if n_subsets is None else f" k={n_subsets}")
+            print(f"Escala {label}: tempo ~ células^{exponents[name, n_subsets]:.2f}")
+        return 0
+    
+    comparison = compare_reports(load_report(args.baseline), load_report(args.current), args.threshold,
+                                 args.min_seconds, args.statistic)
+    _print_comparison(comparison, args.threshold)
+    return 1 if comparison['regressions'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+import os
+import inspect
+import hashlib
+import tempfile
+from collections import OrderedDict
+import numpy as np
+import particionamento_por_bissecao as ppb
+
+# Campos do relatório do refinamento FM e seus tipos, na ordem em que são gravados em disco
+_REPORT_FIELDS = (('cut_before', int), ('cut_after', int), ('moves', int), ('passes', int),
+                  ('deviation', float), ('balanced', bool))
+
+# Opções de particionamento que não alteram o resultado e, portanto, não entram na chave
+_RESULT_NEUTRAL_OPTIONS = ('workers', 'parallel_depth', 'min_parallel_cells')
+
+# Valores padrão das opções de particionamento: passá-los explicitamente não muda a chave
+_PARTITION_DEFAULTS = {name: parameter.default
+                       for name, parameter in inspect.signature(ppb.PartitionState.partition).parameters.items()
+                       if parameter.default is not inspect.Parameter.empty}
+
+class PartitionCache:
+    """
+    Cache de dois níveis para resultados de particionamento.
+    
+    As partições são identificadas por um hash do conteúdo do mapa de pesos (valores, tipo,
+    forma, máscara e ordem das células) e do número de subdomínios. O primeiro nível é um
+    LRU em memória; o segundo, opcional, guarda arquivos `.npz` em disco com limite de
+    tamanho total, descartando os arquivos acessados há mais tempo.
+    
+    Parameters
+    ----------
+    max_entries : int, optional
+        Número máximo de partições no nível em memória. Valor padrão é 64.
+    cache_dir : str, optional
+        Diretório do nível em disco. Se None, apenas o nível em memória é usado.
+    max_disk_bytes : int, optional
+        Tamanho máximo, em bytes, dos arquivos do nível em disco. Valor padrão é 1 GiB.
+    
+    Attributes
+    ----------
+    memory_hits, disk_hits, misses : int
+        Número de consultas atendidas pela memória, pelo disco e não atendidas.
+    memory_evictions, disk_evictions : int
+        Número de partições descartadas de cada nível.
+    
+    Examples
+    --------
+    >>> cache = PartitionCache(cache_dir='/tmp/particoes')
+    >>> state = cache.partition(weights, 16, mask=weights > 0)
+    >>> cache.stats()['misses']
+    1
+    """
+    
+    def __init__(self, max_entries=64, cache_dir=None, max_disk_bytes=1 << 30):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def key(state, n_subsets, **options):
+        """
+        Calcula a chave de cache de um estado de particionamento.
+        
+        Parameters
+        ----------
+        state : ppb.PartitionState
+            Estado com o mapa de pesos e a máscara.
+        n_subsets : int
+            Número de subdomínios.
+        **options
+            Opções de `PartitionState.partition`; as que não alteram o resultado são ignoradas.
+        
+        Returns
+        -------
+        str
+            Hash hexadecimal do conteúdo.
+        """
+        weights = np.ascontiguousarray(state.weights)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((weights.dtype.str, weights.shape, state.origin, int(n_subsets))).encode())
+        digest.update(weights.data)
+        digest.update(np.packbits(state.mask).data)
+        if state._order is not None:
+            digest.update(np.ascontiguousarray(state._order, dtype=np.int64).data)
+        
+        relevant = sorted((name, value) for name, value in options.items()
+                          if name not in _RESULT_NEUTRAL_OPTIONS
+                          and not (name in _PARTITION_DEFAULTS and value == _PARTITION_DEFAULTS[name]))
+        digest.update(repr(relevant).encode())
+        return digest.hexdigest()
+    
+    def get(self, key):
+        """
+        Busca uma partição pela chave, primeiro em memória e depois em disco.
+        
+        Returns
+        -------
+        dict or None
+            Dicionário com 'labels', 'prefixes', 'tree', 'cut_report' e 'n_subsets', ou None se ausente.
+        """
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+        
+        entry = self._load(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._remember(key, entry)
+            return entry
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key, state):
+        """
+        Guarda a partição de um estado nos dois níveis.
+        
+        Parameters
+        ----------
+        key : str
+            Chave calculada por `PartitionCache.key`.
+        state : ppb.PartitionState
+            Estado já particionado.
+        """
+        entry = {
+            'labels': state.labels.copy(),
+            'prefixes': list(state.prefixes),
+            'tree': {prefix: (None if axis is None else np.array(axis)) for prefix, axis in state.tree.items()},
+            'cut_report': {prefix: dict(report) for prefix, report in state.cut_report.items()},
+            'n_subsets': state.n_subsets,
+        }
+        self._remember(key, entry)
+        self._store(key, entry)
+    
+    def partition_state(self, state, n_subsets=2, **options):
+        """
+        Particiona um estado, servindo o resultado do cache quando disponível.
+        
+        Parameters
+        ----------
+        state : ppb.PartitionState
+            Estado a particionar (é preenchido no lugar).
+        n_subsets : int
+            Número de subdomínios.
+        **options
+            Opções repassadas a `PartitionState.partition`.
+        
+        Returns
+        -------
+        numpy.ndarray
+            Array `int32` de rótulos do estado.
+        """
+        key = self.key(state, n_subsets, **options)
+        entry = self.get(key)
+        if entry is None:
+            state.partition(n_subsets, **options)
+            self.put(key, state)
+            return state.labels
+        
+        state.labels[...] = entry['labels']
+        state.prefixes = list(entry['prefixes'])
+        state.tree = dict(entry['tree'])
+        state.cut_report = {prefix: dict(report) for prefix, report in entry['cut_report'].items()}
+        state.n_subsets = entry['n_subsets']
+        state.engine = options.get('engine', _PARTITION_DEFAULTS['engine'])
+        state.refine = options.get('refine', _PARTITION_DEFAULTS['refine'])
+        state.multisection = options.get('multisection', _PARTITION_DEFAULTS['multisection'])
+        state.recut_prefixes = []
+        state._record_splits()
+        return state.labels
+    
+    def partition(self, weights, n_subsets=2, mask=None, **options):
+        """
+        Cria um `PartitionState` para o mapa de pesos e o particiona através do cache.
+        
+        Parameters
+        ----------
+        weights : numpy.ndarray
+            Mapa de pesos 2D ou malha 3D.
+        n_subsets : int
+            Número de subdomínios.
+        mask : numpy.ndarray, optional
+            Máscara booleana das células a particionar.
+        **options
+            Opções repassadas a `PartitionState.partition`.
+        
+        Returns
+        -------
+        ppb.PartitionState
+            Estado particionado.
+        """
+        state = ppb.PartitionState(weights, mask)
+        self.partition_state(state, n_subsets, **options)
+        return state
+    
+    def stats(self):
+        """
+        Contadores de uso do cache.
+        
+        Returns
+        -------
+        dict
+            Acertos, faltas, descartes, ocupação de cada nível e taxa de acerto.
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'memory_evictions': self.memory_evictions,
+            'disk_evictions': self.disk_evictions,
+            'memory_entries': len(self._memory),
+            'disk_bytes': sum(size for _, size, _ in self._disk_files()),
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+    
+    def clear(self):
+        """Esvazia os dois níveis (os contadores são mantidos)."""
+        self._memory.clear()
+        for path, _, _ in self._disk_files():
+            os.remove(path)
+    
+    def _remember(self, key, entry):
+        """Insere no LRU em memória, descartando as entradas mais antigas além do limite."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+    
+    def _disk_files(self):
+        """Lista (caminho, tamanho, instante do último acesso) dos arquivos do nível em disco."""
+        if self.cache_dir is None:
+            return []
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                path = os.path.join(self.cache_dir, name)
+                info = os.stat(path)
+                files.append((path, info.st_size, info.st_mtime_ns))
+        return files
+    
+    def _load(self, key):
+        """Lê uma entrada do disco, marcando o arquivo como acessado."""
+        if self.cache_dir is None or not os.path.exists(self._path(key)):
+            return None
+        
+        path = self._path(key)
+        with np.load(path) as data:
+            # Relatórios gravados com outro conjunto de campos contam como ausência
+            if data['report_values'].shape[1] != len(_REPORT_FIELDS):
+                return None
+            tree_prefixes = data['tree_prefixes'].tolist()
+            tree_axes = data['tree_axes']
+            entry = {
+                'labels': data['labels'],
+                'prefixes': data['prefixes'].tolist(),
+                'tree': {prefix: (None if np.isnan(axis).any() else axis)
+                         for prefix, axis in zip(tree_prefixes, tree_axes)},
+                'cut_report': {prefix: {field: kind(value) for (field, kind), value in zip(_REPORT_FIELDS, values)}
+                               for prefix, values in zip(data['report_prefixes'].tolist(),
+                                                         data['report_values'].tolist())},
+                'n_subsets': int(data['n_subsets']),
+            }
+        os.utime(path)
+        return entry
+    
+    def _store(self, key, entry):
+        """Grava uma entrada em disco (de forma atômica) e aplica o limite de tamanho."""
+        if self.cache_dir is None:
+            return
+        
+        # Eixos com uma componente por dimensão do mapa (2 em 2D, 3 em malhas 3D)
+        ndim = entry['labels'].ndim
+        tree_prefixes = list(entry['tree'])
+        tree_axes = np.array([entry['tree'][prefix] if entry['tree'][prefix] is not None else (np.nan,) * ndim
+                              for prefix in tree_prefixes], dtype=float).reshape(-1, ndim)
+        report_prefixes = list(entry['cut_report'])
+        report_values = np.array([[entry['cut_report'][prefix][field] for field, _ in _REPORT_FIELDS]
+                                  for prefix in report_prefixes], dtype=float).reshape(-1, len(_REPORT_FIELDS))
+        
+        handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        with os.fdopen(handle, 'wb') as file:
+            np.savez(file, labels=entry['labels'],
+                     prefixes=np.array(entry['prefixes'], dtype=str),
+                     tree_prefixes=np.array(tree_prefixes, dtype=str),
+                     tree_axes=tree_axes,
+                     report_prefixes=np.array(report_prefixes, dtype=str),
+                     report_values=report_values,
+                     n_subsets=entry['n_subsets'])
+        os.replace(temporary, self._path(key))
+        
+        # Descarta os arquivos acessados há mais tempo até respeitar o limite
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_disk_bytes or path == self._path(key):
+                break
+            os.remove(path)
+            total -= size
+            self.disk_evictions += 1
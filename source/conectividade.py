@@ -0,0 +1,353 @@
+import itertools
+import numpy as np
+import instrumentacao as instr
+import nucleos_compilados as nc
+
+# Vizinhanças aceitas por dimensão da grade: Von Neumann (faces) e Moore (faces, arestas e vértices)
+_CONNECTIVITIES = {2: (4, 8), 3: (6, 26)}
+
+def _stencil_offsets(ndim, connectivity):
+    """
+    Deslocamentos da metade "positiva" do estêncil, exceto o vizinho seguinte no último eixo.
+    
+    Cada par de células vizinhas aparece uma única vez: um deslocamento é mantido se a sua
+    primeira componente não nula é positiva. O vizinho (0, ..., 0, 1) é tratado pelas
+    sequências ao longo do último eixo em `label_components`.
+    
+    Parameters
+    ----------
+    ndim : int
+        Dimensão da grade (2 ou 3).
+    connectivity : int
+        4 ou 8 em 2D; 6 ou 26 em 3D.
+    
+    Returns
+    -------
+    list
+        Lista de tuplas de deslocamentos.
+    """
+    if ndim not in _CONNECTIVITIES or connectivity not in _CONNECTIVITIES[ndim]:
+        raise ValueError(f"Conectividade {connectivity!r} inválida para grades {ndim}D. "
+                         f"Opções: {_CONNECTIVITIES.get(ndim, ())}")
+    
+    if connectivity == _CONNECTIVITIES[ndim][0]:
+        return [tuple(int(axis == other) for other in range(ndim)) for axis in range(ndim - 1)]
+    
+    offsets = []
+    for offset in itertools.product((-1, 0, 1), repeat=ndim):
+        leading = next((value for value in offset if value), 0)
+        if leading > 0 and offset != (0,) * (ndim - 1) + (1,):
+            offsets.append(offset)
+    return offsets
+
+def _hook_roots(parent, sources, targets):
+    """
+    Une as árvores ligadas pelos pares (sources, targets) por enganchamento pelo menor rótulo.
+    
+    A cada rodada, a raiz de maior rótulo de cada par entre árvores diferentes passa a apontar
+    para a de menor rótulo, e os caminhos são comprimidos até que cada elemento aponte para a
+    sua raiz.
+    
+    Parameters
+    ----------
+    parent : numpy.ndarray
+        Array de pais inicial (normalmente `np.arange(n)`).
+    sources, targets : numpy.ndarray
+        Pares de elementos conectados.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Raiz de cada elemento.
+    """
+    while len(sources):
+        source_roots, target_roots = parent[sources], parent[targets]
+        np.minimum.at(parent, np.maximum(source_roots, target_roots), np.minimum(source_roots, target_roots))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        keep = parent[sources] != parent[targets]
+        sources, targets = sources[keep], targets[keep]
+    return parent
+
+@instr.timed('connectivity')
+def label_components(labels, connectivity=None):
+    """
+    Rotula os componentes conectados de cada rótulo (ou de uma máscara) de uma grade 2D ou 3D.
+    
+    As células são agrupadas em sequências de mesmo rótulo ao longo do último eixo (as linhas,
+    em 2D); as sequências vizinhas segundo o estêncil com o mesmo rótulo são então unidas por
+    enganchamento vetorizado. O custo é O(n) com operações vetorizadas e a união trabalha
+    apenas sobre as sequências. Com o backend compilado (ver `nucleos_compilados`), a união é
+    feita célula a célula por `nucleos_compilados.grid_components`.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array 2D ou 3D de rótulos inteiros, em que valores negativos indicam células vazias, ou
+        máscara booleana (as células False são vazias).
+    connectivity : int, optional
+        Vizinhança considerada: 4 (padrão) ou 8 em 2D; 6 (padrão) ou 26 em 3D.
+    
+    Returns
+    -------
+    tuple
+        (components, n_components) onde `components` é um array com a forma de `labels` e o
+        índice do componente de cada célula (-1 nas células vazias), numerado de 0 em ordem C.
+    
+    Examples
+    --------
+    >>> mask = np.array([[1, 0, 1],
+    ...                  [0, 1, 0]], dtype=bool)
+    >>> label_components(mask)[1], label_components(mask, connectivity=8)[1]
+    (3, 1)
+    """
+    labels = np.asarray(labels)
+    if labels.dtype == bool:
+        labels = np.where(labels, 0, -1)
+    if connectivity is None:
+        connectivity = _CONNECTIVITIES.get(labels.ndim, (None,))[0]
+    offsets = _stencil_offsets(labels.ndim, connectivity)
+    if nc.use_compiled():
+        # Grades 2D como uma camada (1, m, p)
+        padding = 3 - labels.ndim
+        stencil = np.array([(0,) * padding + tuple(offset) for offset in offsets] + [(0, 0, 1)], dtype=np.int64)
+        components, n_components = nc.grid_components(labels.reshape((1,) * padding + labels.shape), stencil)
+        return components.reshape(labels.shape), int(n_components)
+    flat = labels.reshape(-1)
+    
+    # Início de cada sequência de mesmo rótulo ao longo do último eixo
+    starts = np.ones(labels.shape, dtype=bool)
+    starts[..., 1:] = labels[..., 1:] != labels[..., :-1]
+    run_of = np.cumsum(starts.reshape(-1)) - 1
+    run_labels = flat[starts.reshape(-1)]
+    runs = run_of.reshape(labels.shape)
+    
+    # Ligações entre sequências; apenas o primeiro par de cada par de sequências ao longo do último eixo é mantido
+    sources, targets = [], []
+    for offset in offsets:
+        lower = tuple(slice(None, -1) if step > 0 else slice(1, None) if step < 0 else slice(None)
+                      for step in offset)
+        upper = tuple(slice(1, None) if step > 0 else slice(None, -1) if step < 0 else slice(None)
+                      for step in offset)
+        
+        linked = (labels[upper] == labels[lower]) & (labels[upper] >= 0)
+        first_runs, second_runs = runs[lower], runs[upper]
+        first = linked.copy()
+        first[..., 1:] &= ~(linked[..., :-1] & (first_runs[..., 1:] == first_runs[..., :-1]) &
+                            (second_runs[..., 1:] == second_runs[..., :-1]))
+        sources.append(first_runs[first])
+        targets.append(second_runs[first])
+    
+    roots = _hook_roots(np.arange(len(run_labels)),
+                        np.concatenate(sources) if sources else np.zeros(0, dtype=np.int64),
+                        np.concatenate(targets) if targets else np.zeros(0, dtype=np.int64))
+    
+    # Numeração compacta dos componentes das sequências não vazias
+    is_root = (roots == np.arange(len(roots))) & (run_labels >= 0)
+    numbering = np.cumsum(is_root) - 1
+    run_components = np.where(run_labels >= 0, numbering[roots], -1)
+    return run_components[run_of].reshape(labels.shape), int(is_root.sum())
+
+def components_per_label(labels, connectivity=None, n_labels=None):
+    """
+    Conta os componentes conectados de cada rótulo de uma grade 2D ou 3D.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array 2D ou 3D de rótulos inteiros não negativos; valores negativos indicam células vazias.
+    connectivity : int, optional
+        Vizinhança considerada (ver `label_components`).
+    n_labels : int, optional
+        Tamanho mínimo do resultado. Se None, usa o maior rótulo mais um.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array em que a entrada `l` é o número de componentes do rótulo `l` (0 se ausente).
+    
+    Examples
+    --------
+    >>> labels = np.array([[0, 1, 0],
+    ...                    [0, 1, 1]])
+    >>> components_per_label(labels)
+    array([2, 1])
+    """
+    labels = np.asarray(labels)
+    flat = labels.reshape(-1)
+    components, n_components = label_components(labels, connectivity)
+    
+    # Rótulo de cada componente: o da sua primeira célula
+    assigned = np.flatnonzero(flat >= 0)
+    component_ids = components.reshape(-1)[assigned]
+    first_cells = np.zeros(n_components, dtype=np.int64)
+    first_cells[component_ids[::-1]] = assigned[::-1]
+    
+    minlength = 0 if n_labels is None else n_labels
+    return np.bincount(flat[first_cells].astype(np.int64), minlength=minlength)
+
+def is_connected(mask, connectivity=None):
+    """
+    Verifica se as células de uma máscara formam um único componente conectado.
+    
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Máscara booleana 2D ou 3D.
+    connectivity : int, optional
+        Vizinhança considerada (ver `label_components`).
+    
+    Returns
+    -------
+    bool
+        True se a máscara tem no máximo um componente (uma máscara vazia é considerada conectada).
+    """
+    return label_components(np.asarray(mask, dtype=bool), connectivity)[1] <= 1
+
+@instr.timed('connectivity')
+def label_cell_components(neighbors, same_side=None):
+    """
+    Rotula os componentes conectados de um conjunto de células dado por uma tabela de vizinhos.
+    
+    Primeiro, cada sequência de células vizinhas ao longo do último eixo (horizontal em 2D)
+    é reduzida à sua primeira célula. Em seguida, as sequências ligadas por vizinhos nos
+    demais eixos são unidas por enganchamento vetorizado. Com o backend compilado, usa
+    `nucleos_compilados.cell_components`, com os mesmos rótulos.
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 2 * d) das células, com as colunas (i+1, i-1, j+1, j-1[, k+1, k-1])
+        e -1 para vizinhos ausentes.
+    same_side : numpy.ndarray, optional
+        Array de tamanho n com o lado de cada célula. Se fornecido, apenas vizinhos do
+        mesmo lado são considerados conectados.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Rótulo de cada célula: a posição de uma célula representante do seu componente.
+    """
+    if nc.use_compiled():
+        side = np.zeros(len(neighbors), dtype=np.int8) if same_side is None else np.asarray(same_side)
+        return nc.cell_components(np.asarray(neighbors, dtype=np.int64), side)
+    n = len(neighbors)
+    positions = np.arange(n)
+    
+    def linked(column):
+        """Máscara das células cujo vizinho na coluna dada existe e está do mesmo lado."""
+        has = neighbors[:, column] >= 0
+        if same_side is not None:
+            has &= same_side[np.maximum(neighbors[:, column], 0)] == same_side
+        return has
+    
+    # Sequências ao longo do último eixo: cada célula aponta para a primeira célula da sua sequência
+    last = neighbors.shape[1] - 1
+    left = linked(last)
+    if np.array_equal(neighbors[left, last], positions[left] - 1):
+        # Células em ordem de linha: cada sequência ocupa posições consecutivas
+        starts = np.flatnonzero(~left)
+        run_root = starts[np.cumsum(~left) - 1]
+    else:
+        run_root = np.where(left, neighbors[:, last], positions)
+        while True:
+            next_root = run_root[run_root]
+            if np.array_equal(next_root, run_root):
+                break
+            run_root = next_root
+    
+    # Grafo reduzido: uma entrada por sequência, ligações pelos vizinhos nos demais eixos ((i+1, j) em 2D)
+    roots = np.flatnonzero(run_root == positions)
+    run_of = np.empty(n, dtype=np.int64)
+    run_of[roots] = np.arange(len(roots))
+    run_of = run_of[run_root]
+    sources, targets = [], []
+    for column in range(0, last - 1, 2):
+        has = linked(column)
+        sources.append(run_of[has])
+        targets.append(run_of[neighbors[has, column]])
+    sources = np.concatenate(sources)
+    targets = np.concatenate(targets)
+    
+    parent = _hook_roots(np.arange(len(roots)), sources, targets)
+    return roots[parent[run_of]]
+
+@instr.timed('connectivity')
+def prefix_connectivity(neighbors):
+    """
+    Calcula a conectividade de todos os prefixos de uma lista de posições com operações vetorizadas.
+    
+    Uma aresta entre as posições u < v passa a existir no prefixo [0, v + 1). Pela ordem de
+    Kruskal com chave (v, coluna), as arestas que unem componentes são as da floresta geradora
+    mínima, obtida aqui pelo algoritmo de Borůvka vetorizado (O(log n) rodadas de operações
+    sobre arrays). O número de componentes do prefixo [0, c) é c menos o número de arestas da
+    floresta com v < c. Com o backend compilado, as arestas são unidas em ordem por
+    `nucleos_compilados.prefix_connectivity`.
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 2 * d) das posições (-1 para vizinhos ausentes).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array booleano de tamanho n + 1 onde a entrada `c` é True se as posições [0, c)
+        formam um único componente conectado (o prefixo vazio é considerado conectado).
+    """
+    neighbors = np.asarray(neighbors, dtype=np.int64)
+    if nc.use_compiled() and neighbors.ndim == 2:
+        return nc.prefix_connectivity(neighbors)
+    n = len(neighbors)
+    n_columns = neighbors.shape[1] if neighbors.ndim == 2 else 0
+    
+    # Arestas (u, v) com u < v, identificadas pela chave v * n_columns + coluna (única e na ordem de Kruskal)
+    later, column = np.nonzero((neighbors >= 0) & (neighbors < np.arange(n)[:, None]))
+    earlier = neighbors[later, column]
+    keys = later * n_columns + column
+    
+    tree_edges = []
+    parent = np.arange(n)
+    while len(keys):
+        source_roots, target_roots = parent[earlier], parent[later]
+        keep = source_roots != target_roots
+        earlier, later, keys = earlier[keep], later[keep], keys[keep]
+        source_roots, target_roots = source_roots[keep], target_roots[keep]
+        if not len(keys):
+            break
+        
+        # Aresta de menor chave que sai de cada componente (as chaves estão em ordem crescente, de
+        # modo que, na atribuição em ordem inversa, a primeira ocorrência de cada componente prevalece)
+        best = np.full(n, np.iinfo(np.int64).max)
+        best[source_roots[::-1]] = keys[::-1]
+        best_targets = np.full(n, np.iinfo(np.int64).max)
+        best_targets[target_roots[::-1]] = keys[::-1]
+        np.minimum(best, best_targets, out=best)
+        chosen = best[source_roots] == keys
+        chosen_targets = best[target_roots] == keys
+        tree_edges.append(later[chosen | chosen_targets])
+        
+        # Cada componente aponta para o outro extremo da sua aresta; nos pares mútuos, o menor é a raiz
+        hook = parent.copy()
+        hook[source_roots[chosen]] = target_roots[chosen]
+        hook[target_roots[chosen_targets]] = source_roots[chosen_targets]
+        mutual = hook[hook] == np.arange(n)
+        hook[mutual & (np.arange(n) < hook)] = np.flatnonzero(mutual & (np.arange(n) < hook))
+        while True:
+            grandparent = hook[hook]
+            if np.array_equal(grandparent, hook):
+                break
+            hook = grandparent
+        parent = hook[parent]
+    
+    # Componentes do prefixo [0, c): c - número de arestas da floresta com v < c
+    merges = np.zeros(n + 1, dtype=np.int64)
+    if tree_edges:
+        merges += np.bincount(np.concatenate(tree_edges) + 1, minlength=n + 1)
+    components = np.arange(n + 1) - np.cumsum(merges)
+    connected = components == 1
+    connected[0] = True
+    return connected
@@ -0,0 +1,270 @@
+"""
+Instrumentação opcional do particionamento: tempo de parede e número de chamadas de cada fase
+por nó da recursão, contadores de eventos e exportação do rastro no formato do Chrome.
+
+Desativada por padrão. As rotinas instrumentadas chamam `phase`, `node`, `count` ou são decoradas
+com `timed`; sem um `profile` ativo essas chamadas apenas verificam uma variável global.
+"""
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+
+# Estatísticas em coleta (None quando a instrumentação está desativada)
+_recorder = None
+
+# Contexto vazio devolvido por `phase` e `node` quando a instrumentação está desativada
+_NULL_CONTEXT = contextlib.nullcontext()
+
+class _Span:
+    """Intervalo de tempo aberto de uma fase ou de um nó, empilhado por thread."""
+    
+    __slots__ = ('stats', 'kind', 'name', 'record', 'start', 'nested_nodes', 'nested_phases')
+    
+    def __init__(self, stats, kind, name, record):
+        self.stats = stats
+        self.kind = kind
+        self.name = name
+        self.record = record
+        self.nested_nodes = 0.0
+        self.nested_phases = 0.0
+    
+    def __enter__(self):
+        stack = self.stats._stack()
+        if self.record is None:
+            self.record = self.stats._current_node(stack)
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        stack = self.stats._stack()
+        stack.pop()
+        if stack:
+            if self.kind == 'phase':
+                stack[-1].nested_phases += duration
+            else:
+                stack[-1].nested_nodes += duration
+        self.stats._close(self, duration)
+        return False
+
+class PartitionStats:
+    """
+    Estatísticas coletadas por `profile`.
+    
+    Cada nó da recursão (ou nível, na recursão em largura) tem um registro com o nome (prefixo
+    binário), o número de células, o tempo total (incluindo os filhos), o tempo próprio (sem os
+    nós filhos), o tempo e o número de chamadas de cada fase e os contadores. O trabalho fora de qualquer nó
+    (por exemplo, `create_3d_mesh`) é registrado em `outside`. Os tempos das fases são exclusivos:
+    o tempo de uma fase aninhada em outra não é contado na externa.
+    
+    Attributes
+    ----------
+    nodes : list of dict
+        Registros dos nós, na ordem em que foram concluídos.
+    outside : dict
+        Registro do trabalho fora de qualquer nó.
+    elapsed : float
+        Tempo de parede total do bloco `profile` (disponível após o seu fim).
+    
+    Examples
+    --------
+    >>> with profile() as stats:
+    ...     state = ppb.PartitionState(weights).partition(64)
+    >>> stats.phase_totals()['cut_sweep']['calls']
+    63
+    >>> stats.save_chrome_trace('particao.json')   # abrir em chrome://tracing ou ui.perfetto.dev
+    """
+    
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.elapsed = None
+        self.nodes = []
+        self.outside = self._new_record('', 0, 'outside')
+        self._events = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _new_record(name, cells, category):
+        return {'name': name, 'category': category, 'cells': int(cells), 'start': None, 'duration': 0.0,
+                'self_time': 0.0, 'phases': {}, 'counters': {}}
+    
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def _current_node(self, stack=None):
+        """Registro do nó aberto mais interno da thread atual (ou `outside`)."""
+        for span in reversed(self._stack() if stack is None else stack):
+            if span.kind == 'node':
+                return span.record
+        return self.outside
+    
+    def _close(self, span, duration):
+        start = span.start - self.origin
+        record = span.record
+        with self._lock:
+            if span.kind == 'phase':
+                phase = record['phases'].setdefault(span.name, {'time': 0.0, 'calls': 0})
+                phase['time'] += duration - span.nested_phases - span.nested_nodes
+                phase['calls'] += 1
+                args = None
+            else:
+                record['start'] = start
+                record['duration'] = duration
+                record['self_time'] = duration - span.nested_nodes
+                self.nodes.append(record)
+                args = {'cells': record['cells'], **record['counters']}
+            self._events.append((span.name if span.kind == 'phase' else _node_label(record), span.kind,
+                                 start, duration, threading.get_ident(), args))
+    
+    def _count(self, name, amount):
+        record = self._current_node()
+        with self._lock:
+            record['counters'][name] = record['counters'].get(name, 0) + amount
+    
+    def node(self, name):
+        """Registros dos nós com o nome (prefixo binário) dado, na ordem de conclusão."""
+        return [record for record in self.nodes if record['name'] == name]
+    
+    def phase_totals(self):
+        """
+        Tempo próprio e número de chamadas de cada fase, somados sobre todos os nós.
+        
+        Returns
+        -------
+        dict
+            {fase: {'time': segundos, 'calls': chamadas}}.
+        """
+        totals = {}
+        for record in self.nodes + [self.outside]:
+            for name, phase in record['phases'].items():
+                total = totals.setdefault(name, {'time': 0.0, 'calls': 0})
+                total['time'] += phase['time']
+                total['calls'] += phase['calls']
+        return totals
+    
+    def counters(self):
+        """Contadores somados sobre todos os nós (por exemplo 'fallback', 'cuts_evaluated', 'cells')."""
+        totals = {}
+        for record in self.nodes + [self.outside]:
+            for name, value in record['counters'].items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+    
+    def summary(self):
+        """Tabela em texto com as fases ordenadas pelo tempo e os contadores."""
+        lines = [f"{'fase':<24} {'tempo (ms)':>12} {'chamadas':>10}"]
+        for name, phase in sorted(self.phase_totals().items(), key=lambda item: -item[1]['time']):
+            lines.append(f"{name:<24} {phase['time'] * 1e3:12.2f} {phase['calls']:>10}")
+        lines.append('')
+        lines.extend(f"{name:<24} {value:>12}" for name, value in sorted(self.counters().items()))
+        lines.append(f"{'nós':<24} {len(self.nodes):>12}")
+        if self.elapsed is not None:
+            lines.append(f"{'tempo total (ms)':<24} {self.elapsed * 1e3:12.2f}")
+        return '\n'.join(lines)
+    
+    def to_chrome_trace(self):
+        """
+        Rastro no formato Trace Event do Chrome: um evento completo ('X') por nó e por fase.
+        
+        Os eventos dos nós contêm os das fases e dos nós filhos, de modo que o visualizador mostra
+        a árvore da recursão.
+        
+        Returns
+        -------
+        dict
+            Objeto JSON com 'traceEvents' (tempos em microssegundos) e 'otherData'.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        trace_events = []
+        for name, category, start, duration, tid, args in events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6,
+                     'pid': pid, 'tid': tid}
+            if args is not None:
+                event['args'] = args
+            trace_events.append(event)
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms',
+                'otherData': {'counters': self.counters(), 'nodes': len(self.nodes)}}
+    
+    def save_chrome_trace(self, path):
+        """Grava `to_chrome_trace` em um arquivo JSON (chrome://tracing, ui.perfetto.dev)."""
+        with open(path, 'w') as file:
+            json.dump(self.to_chrome_trace(), file)
+
+def _node_label(record):
+    if record['category'] == 'node':
+        return 'nó ' + (record['name'] or 'raiz')
+    return f"{record['category']} {record['name']}"
+
+@contextlib.contextmanager
+def profile():
+    """
+    Ativa a instrumentação no bloco e fornece as estatísticas coletadas.
+    
+    Apenas o processo atual é instrumentado: na recursão paralela (`workers > 1`), o trabalho
+    enviado aos processos de trabalho não é registrado.
+    
+    Yields
+    ------
+    PartitionStats
+        Estatísticas do bloco (o tempo total é preenchido na saída).
+    """
+    global _recorder
+    previous = _recorder
+    stats = PartitionStats()
+    _recorder = stats
+    try:
+        yield stats
+    finally:
+        _recorder = previous
+        stats.elapsed = time.perf_counter() - stats.origin
+
+def enabled():
+    """Indica se há uma coleta de estatísticas ativa."""
+    return _recorder is not None
+
+def phase(name):
+    """Contexto que mede uma fase no nó atual (sem efeito se a instrumentação estiver desativada)."""
+    stats = _recorder
+    if stats is None:
+        return _NULL_CONTEXT
+    return _Span(stats, 'phase', name, None)
+
+def node(name, cells=0, category='node'):
+    """
+    Contexto de um nó da recursão (ou de um nível, com `category='nível'`).
+    
+    As fases e contadores registrados dentro do contexto, fora de nós filhos, são atribuídos a ele.
+    """
+    stats = _recorder
+    if stats is None:
+        return _NULL_CONTEXT
+    return _Span(stats, 'node', name, stats._new_record(name, cells, category))
+
+def count(name, amount=1):
+    """Incrementa um contador do nó atual (sem efeito se a instrumentação estiver desativada)."""
+    stats = _recorder
+    if stats is not None:
+        stats._count(name, amount)
+
+def timed(name):
+    """Decorador que mede cada chamada da função como a fase `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stats = _recorder
+            if stats is None:
+                return function(*args, **kwargs)
+            with _Span(stats, 'phase', name, None):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,12 +1,141 @@
 # 3dMesh.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
-from matplotlib.colors import Normalize
+from matplotlib.collections import LineCollection
+from matplotlib.colors import Normalize, ListedColormap
 from matplotlib import colormaps
+import instrumentacao as instr
+import nucleos_compilados as nc
 
 
-def create_3d_mesh(nx=8, ny=8, nz=3, active_intervals=None):
+# Intervalos ativos padrão de create_3d_mesh e IntervalMesh.from_intervals
+_DEFAULT_ACTIVE_INTERVALS = {
+    0: {2: [(3, 4)], 3: [(2, 5)], 4: [(2, 5)], 5: [(3, 4)]},
+    1: {1: [(2, 5)], 2: [(1, 6)], 3: [(1, 6)], 4: [(1, 6)], 5: [(1, 6)], 6: [(2, 5)]},
+    2: {0: [(2, 5)], 1: [(1, 6)], 2: [(0, 7)], 3: [(0, 7)], 4: [(0, 7)], 5: [(0, 7)], 6: [(1, 6)], 7: [(2, 5)]}
+}
+
+# Tabelas de intervalos como arrays estruturados: intervalos ativos (j_end exclusivo) e de refinamento (j_end inclusivo)
+ACTIVE_INTERVAL_DTYPE = np.dtype([('k', np.int64), ('i', np.int64), ('j_start', np.int64), ('j_end', np.int64)])
+REFINEMENT_INTERVAL_DTYPE = np.dtype([('k', np.int64), ('i', np.int64), ('j_start', np.int64), ('j_end', np.int64),
+                                      ('factor_i', np.int64), ('factor_j', np.int64), ('factor_k', np.int64)])
+
+def active_intervals_to_array(active_intervals):
+    """
+    Converte o dicionário de intervalos ativos em um array estruturado.
+    
+    Parameters
+    ----------
+    active_intervals : dict or numpy.ndarray
+        Dicionário {k: {i: [(j_start, j_end), ...]}} (ver `create_3d_mesh`) ou array
+        estruturado com os campos de `ACTIVE_INTERVAL_DTYPE` (devolvido sem cópia).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array estruturado com os campos 'k', 'i', 'j_start' e 'j_end'.
+    """
+    if isinstance(active_intervals, np.ndarray):
+        return active_intervals
+    return np.array([(k, i, j_start, j_end)
+                     for k, layers in active_intervals.items()
+                     for i, intervals in layers.items()
+                     for j_start, j_end in intervals], dtype=ACTIVE_INTERVAL_DTYPE)
+
+def refinement_regions_to_array(refinement_regions):
+    """
+    Converte o dicionário de regiões de refinamento em um array estruturado.
+    
+    Parameters
+    ----------
+    refinement_regions : dict or numpy.ndarray
+        Dicionário {k: {i: [(j_start, j_end, factor_i, factor_j, factor_k), ...]}} (ver
+        `refine_mesh`) ou array estruturado com os campos de `REFINEMENT_INTERVAL_DTYPE`.
+    
+    Returns
+    -------
+    tuple
+        (table, warnings) onde `table` é o array estruturado dos intervalos com 5 elementos e
+        `warnings` é um array de strings com um aviso por intervalo em formato inválido.
+    """
+    if isinstance(refinement_regions, np.ndarray):
+        return refinement_regions, np.array([], dtype=str)
+    
+    rows = []
+    warnings = []
+    for k, layers in refinement_regions.items():
+        for i, intervals in layers.items():
+            for interval in intervals:
+                if len(interval) == 5:
+                    rows.append((k, i) + tuple(interval))
+                else:
+                    warnings.append(f"Intervalo inválido ignorado: {interval}. "
+                                    f"Formato esperado: (j_start, j_end, factor_i, factor_j, factor_k)")
+    return np.array(rows, dtype=REFINEMENT_INTERVAL_DTYPE), np.array(warnings, dtype=str)
+
+def _valid_refinements(table, shape):
+    """
+    Separa os intervalos de refinamento dentro dos limites da malha.
+    
+    Returns
+    -------
+    tuple
+        (table, warnings) com os intervalos válidos e um aviso por intervalo fora dos limites.
+    """
+    nx, ny, nz = shape
+    valid = ((table['i'] >= 0) & (table['i'] < nx) & (table['k'] >= 0) & (table['k'] < nz) &
+             (table['j_start'] >= 0) & (table['j_start'] <= table['j_end']) & (table['j_end'] < ny))
+    warnings = [f"Intervalo fora dos limites da malha ignorado: camada {k}, linha {i}, colunas {j_start}-{j_end}"
+                for k, i, j_start, j_end in table[~valid][['k', 'i', 'j_start', 'j_end']].tolist()]
+    return table[valid], np.array(warnings, dtype=str)
+
+def _report_warnings(result, warnings, return_warnings):
+    """Retorna (resultado, avisos) ou apenas o resultado, resumindo os avisos em uma única mensagem."""
+    if return_warnings:
+        return result, warnings
+    if len(warnings):
+        print(f"Aviso: {len(warnings)} intervalo(s) ignorado(s); use return_warnings=True para a lista. "
+              f"Primeiro: {warnings[0]}")
+    return result
+
+def _expand_runs(starts, lengths):
+    """
+    Expande sequências (início, comprimento) em células.
+    
+    Returns
+    -------
+    tuple
+        (run, positions) com a sequência de cada célula e a sua posição (início + deslocamento).
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    run = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(len(run)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return run, np.asarray(starts, dtype=np.int64)[run] + offsets
+
+def _interval_coverage(shape, rows, layers, starts, stops, values, dtype=np.int64):
+    """
+    Soma `values` sobre as células de cada intervalo [start, stop) ao longo de Y.
+    
+    Os limites de todos os intervalos são dispersos em um único array de diferenças, que é
+    acumulado ao longo de Y; o custo não depende do comprimento dos intervalos.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array (nx, ny, nz) com a soma dos valores dos intervalos que cobrem cada célula.
+    """
+    nx, ny, nz = shape
+    difference = np.zeros((nx, ny + 1, nz), dtype=dtype)
+    np.add.at(difference, (rows, starts, layers), values)
+    np.subtract.at(difference, (rows, stops, layers), values)
+    return np.cumsum(difference[:, :ny], axis=1, out=difference[:, :ny])
+
+@instr.timed('create_3d_mesh')
+def create_3d_mesh(nx=8, ny=8, nz=3, active_intervals=None, dtype=int):
     """
     Cria uma malha 3D logicamente retangular, definindo células ativas por intervalos variáveis por linha e camada.
     
@@ -21,13 +150,16 @@ def create_3d_mesh(nx=8, ny=8, nz=3, active_intervals=None):
         Número de células na direção Y. Valor padrão é 8.
     nz : int, optional
         Número de células na direção Z. Valor padrão é 3.
-    active_intervals : dict, optional
+    active_intervals : dict or numpy.ndarray, optional
         Dicionário definindo os intervalos de células ativas. A estrutura do dicionário é:
         {k: {i: [(j_start, j_end), ...], ...}, ...} onde:
         - k é o índice da camada (direção Z)
         - i é o índice da linha (direção X)
         - (j_start, j_end) são tuplas definindo o intervalo de colunas ativas (direção Y)
+        Também aceita um array estruturado com os campos de `ACTIVE_INTERVAL_DTYPE`.
         Se None, utiliza um padrão predefinido.
+    dtype : numpy.dtype, optional
+        Tipo do array da malha. Valor padrão é `int`.
         
     Returns
     -------
@@ -51,27 +183,23 @@ def create_3d_mesh(nx=8, ny=8, nz=3, active_intervals=None):
     """
     # Configuração padrão dos intervalos ativos se não forem fornecidos
     if active_intervals is None:
-        active_intervals = {
-            0: {2: [(3, 4)], 3: [(2, 5)], 4: [(2, 5)], 5: [(3, 4)]},
-            1: {1: [(2, 5)], 2: [(1, 6)], 3: [(1, 6)], 4: [(1, 6)], 5: [(1, 6)], 6: [(2, 5)]},
-            2: {0: [(2, 5)], 1: [(1, 6)], 2: [(0, 7)], 3: [(0, 7)], 4: [(0, 7)], 5: [(0, 7)], 6: [(1, 6)], 7: [(2, 5)]}
-        }
+        active_intervals = _DEFAULT_ACTIVE_INTERVALS
     
-    mesh = np.zeros((nx, ny, nz), dtype=int)  # Inicializa todas as células como vazias
+    table = active_intervals_to_array(active_intervals)
     
-    for k, layers in active_intervals.items():
-        for i, intervals in layers.items():
-            for j_start, j_end in intervals:
-                # Verifica se os índices estão dentro dos limites da malha
-                if i < nx and k < nz :  #Removed j_end < ny
-                    # Ajusta o intervalo final se necessário
-                    j_end_adjusted = min(j_end, ny)
-                    mesh[i, j_start:j_end_adjusted, k] = 1  # Ativa apenas as células dentro dos intervalos
-       
-    return mesh
+    # Intervalos dentro dos limites da malha, com o final ajustado a ny
+    inside = ((table['i'] >= 0) & (table['i'] < nx) & (table['k'] >= 0) & (table['k'] < nz) &
+              (table['j_start'] >= 0) & (table['j_start'] < np.minimum(table['j_end'], ny)))
+    table = table[inside]
+    
+    # Ativa todas as células dos intervalos de uma só vez (células cobertas por ao menos um intervalo)
+    coverage = _interval_coverage((nx, ny, nz), table['i'], table['k'], table['j_start'],
+                                  np.minimum(table['j_end'], ny), 1, dtype=np.int32)
+    return (coverage > 0).astype(dtype)
 
 
-def refine_mesh(mesh, refinement_regions):
+@instr.timed('refine_mesh')
+def refine_mesh(mesh, refinement_regions, return_warnings=False):
     """
     Refina a malha tridimensional conforme as regiões definidas por intervalos variáveis.
     
@@ -83,7 +211,7 @@ def refine_mesh(mesh, refinement_regions):
     mesh : numpy.ndarray
         Array tridimensional representando a malha 3D, onde valores positivos
         indicam células ativas.
-    refinement_regions : dict
+    refinement_regions : dict or numpy.ndarray
         Dicionário definindo as regiões de refinamento. A estrutura do dicionário é:
         {k: {i: [(j_start, j_end, factor_i, factor_j, factor_k), ...], ...}, ...} onde:
         - k é o índice da camada (direção Z)
@@ -91,11 +219,17 @@ def refine_mesh(mesh, refinement_regions):
         - (j_start, j_end, factor_i, factor_j, factor_k) são tuplas definindo:
           * j_start, j_end: intervalo de colunas a serem refinadas (direção Y)
           * factor_i, factor_j, factor_k: fatores de refinamento nas direções X, Y e Z
+        Também aceita um array estruturado com os campos de `REFINEMENT_INTERVAL_DTYPE`.
+    return_warnings : bool, optional
+        Se True, retorna também o array de avisos. Se False (padrão), os avisos, se houver,
+        são resumidos em uma única mensagem.
     
     Returns
     -------
-    numpy.ndarray
-        Malha refinada com a mesma forma do array de entrada.
+    numpy.ndarray or tuple
+        Malha refinada com a mesma forma do array de entrada, ou (malha, avisos) se
+        `return_warnings` for True, onde `avisos` é um array de strings com um aviso por
+        intervalo ignorado (formato inválido ou fora dos limites da malha).
     
     Examples
     --------
@@ -108,37 +242,307 @@ def refine_mesh(mesh, refinement_regions):
     ... }
     >>> refined_mesh = refine_mesh(mesh, regions)
     """
-    refined_mesh = np.zeros_like(mesh)  # Inicializa com células inativas
+    mesh = np.asarray(mesh)
+    nx, ny, nz = mesh.shape
+    table, warnings = refinement_regions_to_array(refinement_regions)
+    table, outside = _valid_refinements(table, mesh.shape)
+    warnings = np.concatenate([warnings, outside])
+    
+    # Mantém as células ativas originais com valor 1
+    refined_mesh = (mesh > 0).astype(mesh.dtype)
+    
+    # Multiplica todas as células dos intervalos pelos fatores em uma única dispersão dos limites
+    # dos intervalos (células inativas continuam com valor 0)
+    factors = table['factor_i'] * table['factor_j'] * table['factor_k']
+    covered = _interval_coverage(mesh.shape, table['i'], table['k'], table['j_start'], table['j_end'] + 1,
+                                 1, dtype=np.int32)
+    if covered.max(initial=0) <= 1:
+        # Intervalos disjuntos: a soma dos fatores em cada célula é o próprio fator
+        cell_factors = _interval_coverage(mesh.shape, table['i'], table['k'], table['j_start'],
+                                          table['j_end'] + 1, factors)
+        np.multiply(refined_mesh, cell_factors, out=refined_mesh, where=covered > 0, casting='unsafe')
+    else:
+        # Intervalos sobrepostos acumulam o produto dos fatores, célula a célula
+        run, columns = _expand_runs(table['j_start'], table['j_end'] - table['j_start'] + 1)
+        np.multiply.at(refined_mesh.reshape(-1), (table['i'][run] * ny + columns) * nz + table['k'][run],
+                       factors[run].astype(refined_mesh.dtype))
+    
+    return _report_warnings(refined_mesh, warnings, return_warnings)
+
+def _compact_unsigned(values, minimum=np.uint8):
+    """Converte inteiros não negativos para o menor tipo sem sinal que os representa (no mínimo `minimum`)."""
+    values = np.asarray(values)
+    largest = int(values.max()) if values.size else 0
+    return values.astype(np.promote_types(np.min_scalar_type(largest), minimum), copy=False)
+
+class IntervalMesh:
+    """
+    Malha 3D codificada por sequências (runs) de células ativas ao longo de Y.
     
-    # Primeiro, mantém as células ativas originais
-    for i in range(mesh.shape[0]):
-        for j in range(mesh.shape[1]):
-            for k in range(mesh.shape[2]):
-                if mesh[i, j, k] > 0:
-                    refined_mesh[i, j, k] = 1  # Mantém as células ativas
+    Em vez do array denso (nx, ny, nz), cada sequência de células ativas consecutivas de uma
+    linha X e camada Z com o mesmo fator de refinamento é guardada como (i, k, j_start, j_stop,
+    valor), com `j_stop` exclusivo. Os arrays usam os menores tipos inteiros sem sinal que
+    representam a malha (por exemplo, `uint16` para índices até 65535 e `uint8` para fatores de
+    refinamento até 255), de modo que a memória cresce com o número de sequências, e não com
+    nx * ny * nz. Pesos, número de células ativas e peso total são calculados diretamente
+    das sequências; o array denso só é criado por `to_dense`.
     
-    # Aplica o refinamento por intervalos variáveis
-    for k, layers in refinement_regions.items():
-        for i, intervals in layers.items():
-            for interval in intervals:
-                # Verifica se é um intervalo válido com 5 elementos (j_start, j_end, factor_i, factor_j, factor_k)
-                if len(interval) == 5:
-                    j_start, j_end, factor_i, factor_j, factor_k = interval
-                    
-                    # Verifica se os índices estão dentro dos limites da malha
-                    if (0 <= i < mesh.shape[0] and 
-                        0 <= k < mesh.shape[2] and 
-                        0 <= j_start <= j_end < mesh.shape[1]):
-                        
-                        # Aplica o refinamento apenas para células ativas dentro do intervalo
-                        for j in range(j_start, j_end + 1):
-                            if refined_mesh[i, j, k] > 0:
-                                refined_mesh[i, j, k] *= factor_i * factor_j * factor_k
-                else:
-                    print(f"Aviso: Intervalo inválido ignorado: {interval}. Formato esperado: (j_start, j_end, factor_i, factor_j, factor_k)")
+    Parameters
+    ----------
+    shape : tuple
+        Forma (nx, ny, nz) da malha.
+    rows, layers, starts, stops, values : array-like
+        Linha X, camada Z, coluna inicial, coluna final (exclusiva) e valor de cada sequência.
+        As sequências não podem se sobrepor.
+    
+    Attributes
+    ----------
+    shape : tuple
+        Forma (nx, ny, nz) da malha.
+    rows, layers, starts, stops, values : numpy.ndarray
+        Arrays das sequências, ordenados por (linha, camada, coluna inicial).
+    
+    Examples
+    --------
+    >>> mesh = IntervalMesh.from_intervals(3000, 3000, 200, active_intervals)
+    >>> refined = mesh.refine(regions)
+    >>> refined.active_cells, refined.nbytes
+    >>> weights = refined.weight_array()          # igual a compute_weight_array(refined.to_dense())
+    """
+    
+    def __init__(self, shape, rows, layers, starts, stops, values):
+        self.shape = tuple(int(size) for size in shape)
+        if len(self.shape) != 3:
+            raise ValueError("A forma da malha deve ser (nx, ny, nz)")
+        nx, ny, nz = self.shape
+        
+        rows, layers, starts, stops, values = (np.asarray(array, dtype=np.int64).reshape(-1)
+                                               for array in (rows, layers, starts, stops, values))
+        keep = stops > starts
+        rows, layers, starts, stops, values = (array[keep] for array in (rows, layers, starts, stops, values))
+        order = np.lexsort((starts, layers, rows))
+        
+        self.rows = rows[order].astype(np.min_scalar_type(max(nx - 1, 0)))
+        self.layers = layers[order].astype(np.min_scalar_type(max(nz - 1, 0)))
+        self.starts = starts[order].astype(np.min_scalar_type(ny))
+        self.stops = stops[order].astype(np.min_scalar_type(ny))
+        self.values = _compact_unsigned(values[order])
+    
+    @classmethod
+    def from_intervals(cls, nx=8, ny=8, nz=3, active_intervals=None):
+        """
+        Cria a malha a partir dos intervalos ativos, como `create_3d_mesh`, sem o array denso.
+        
+        Parameters
+        ----------
+        nx, ny, nz : int, optional
+            Dimensões da malha. Valores padrão são 8, 8 e 3.
+        active_intervals : dict or numpy.ndarray, optional
+            Dicionário {k: {i: [(j_start, j_end), ...]}} com `j_end` exclusivo, ou array
+            estruturado (ver `create_3d_mesh`). Se None, utiliza o mesmo padrão predefinido
+            de `create_3d_mesh`.
+        
+        Returns
+        -------
+        IntervalMesh
+            Malha com valor 1 em todas as células ativas.
+        """
+        if active_intervals is None:
+            active_intervals = _DEFAULT_ACTIVE_INTERVALS
+        
+        table = active_intervals_to_array(active_intervals)
+        table = table[(table['i'] >= 0) & (table['i'] < nx) & (table['k'] >= 0) & (table['k'] < nz) &
+                      (table['j_start'] >= 0)]
+        rows, layers, starts, stops = _merge_runs(nz, ny, table['i'], table['k'], table['j_start'],
+                                                  np.minimum(table['j_end'], ny))
+        return cls((nx, ny, nz), rows, layers, starts, stops, np.ones(len(rows), dtype=np.int64))
+    
+    @classmethod
+    def from_dense(cls, mesh):
+        """
+        Codifica um array denso (nx, ny, nz) em sequências de células ativas de mesmo valor.
+        
+        Parameters
+        ----------
+        mesh : numpy.ndarray
+            Malha densa, por exemplo a saída de `create_3d_mesh` ou de `refine_mesh`; células
+            com valor positivo são ativas.
+        
+        Returns
+        -------
+        IntervalMesh
+            Malha codificada, com `to_dense()` igual a `mesh` nas células ativas.
+        """
+        mesh = np.asarray(mesh)
+        nx, ny, nz = mesh.shape
+        lines = np.ascontiguousarray(mesh.transpose(0, 2, 1)).reshape(nx * nz, ny)
+        
+        # Início e fim (inclusive) de cada sequência de mesmo valor positivo ao longo de Y
+        begins = np.ones(lines.shape, dtype=bool)
+        begins[:, 1:] = lines[:, 1:] != lines[:, :-1]
+        ends = np.ones(lines.shape, dtype=bool)
+        ends[:, :-1] = begins[:, 1:]
+        active = lines > 0
+        line_ids, starts = np.nonzero(begins & active)
+        stops = np.nonzero(ends & active)[1] + 1
+        
+        return cls(mesh.shape, line_ids // nz, line_ids % nz, starts, stops, lines[line_ids, starts])
     
-    return refined_mesh
+    def refine(self, refinement_regions, return_warnings=False):
+        """
+        Refina a malha pelas regiões definidas por intervalos, como `refine_mesh`.
+        
+        Os valores das células ativas voltam a 1 e as células ativas dentro de cada intervalo
+        são multiplicadas pelo produto dos fatores de refinamento. As sequências são cortadas
+        nos limites dos intervalos de refinamento, sem passar pelo array denso.
+        
+        Parameters
+        ----------
+        refinement_regions : dict or numpy.ndarray
+            Dicionário {k: {i: [(j_start, j_end, factor_i, factor_j, factor_k), ...]}} com
+            `j_end` inclusivo, ou array estruturado (ver `refine_mesh`).
+        return_warnings : bool, optional
+            Se True, retorna também o array de avisos (ver `refine_mesh`).
+        
+        Returns
+        -------
+        IntervalMesh or tuple
+            Nova malha refinada, ou (malha, avisos) se `return_warnings` for True.
+        """
+        nx, ny, nz = self.shape
+        width = ny + 1
+        
+        table, warnings = refinement_regions_to_array(refinement_regions)
+        table, outside = _valid_refinements(table, self.shape)
+        warnings = np.concatenate([warnings, outside])
+        refinement_lines = table['i'] * nz + table['k']
+        refinement_begin = refinement_lines * width + table['j_start']
+        refinement_end = refinement_lines * width + table['j_end'] + 1
+        
+        # As células ativas voltam ao valor 1; sequências vizinhas passam a formar uma só
+        rows, layers, starts, stops = _merge_runs(nz, ny, self.rows, self.layers, self.starts, self.stops)
+        lines = rows * nz + layers
+        run_begin = lines * width + starts
+        run_end = lines * width + stops
+        
+        # Corte das sequências nos limites dos intervalos de refinamento que caem dentro delas
+        cuts = np.unique(np.concatenate([refinement_begin, refinement_end]))
+        cuts = np.append(cuts, np.iinfo(np.int64).max)  # Sentinela: nunca cai dentro de uma sequência
+        first_cut = np.searchsorted(cuts, run_begin, side='right')
+        inside = np.searchsorted(cuts, run_end, side='left') - first_cut
+        piece_run = np.repeat(np.arange(len(run_begin)), inside + 1)
+        position = np.arange(len(piece_run)) - np.repeat(np.cumsum(inside + 1) - (inside + 1), inside + 1)
+        cut_index = first_cut[piece_run] + position
+        piece_begin = np.where(position == 0, run_begin[piece_run], cuts[np.maximum(cut_index - 1, 0)])
+        piece_end = np.where(position == inside[piece_run], run_end[piece_run], cuts[np.minimum(cut_index, len(cuts) - 1)])
+        
+        # Cada intervalo cobre um bloco contíguo de pedaços, ordenados pelo início; os fatores de
+        # todos os blocos são aplicados em uma única dispersão
+        first_piece = np.searchsorted(piece_begin, refinement_begin)
+        block, pieces = _expand_runs(first_piece, np.searchsorted(piece_begin, refinement_end) - first_piece)
+        values = np.ones(len(piece_begin), dtype=np.int64)
+        np.multiply.at(values, pieces, (table['factor_i'] * table['factor_j'] * table['factor_k'])[block])
+        
+        # Fatores nulos desativam as células
+        active = values > 0
+        lines, starts = np.divmod(piece_begin[active], width)
+        refined = IntervalMesh(self.shape, lines // nz, lines % nz, starts, piece_end[active] - lines * width,
+                               values[active])
+        return _report_warnings(refined, warnings, return_warnings)
+    
+    @property
+    def n_runs(self):
+        """Número de sequências."""
+        return len(self.values)
+    
+    @property
+    def active_cells(self):
+        """Número de células ativas."""
+        return int((self.stops.astype(np.int64) - self.starts).sum())
+    
+    @property
+    def total_weight(self):
+        """Soma dos valores de todas as células ativas."""
+        return int(((self.stops.astype(np.int64) - self.starts) * self.values).sum())
+    
+    @property
+    def nbytes(self):
+        """Memória, em bytes, ocupada pelos arrays das sequências."""
+        return sum(array.nbytes for array in (self.rows, self.layers, self.starts, self.stops, self.values))
+    
+    def weight_array(self, dtype=np.int64):
+        """
+        Calcula o array de pesos da projeção em Z diretamente das sequências.
+        
+        Cada sequência soma o seu valor às colunas [j_start, j_stop) da sua linha, por meio de
+        um array de diferenças acumulado ao longo de Y.
+        
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Tipo do mapa de pesos. Valor padrão é `int64`.
+        
+        Returns
+        -------
+        numpy.ndarray
+            Array (nx, ny) igual a `compute_weight_array(self.to_dense())`.
+        """
+        nx, ny, nz = self.shape
+        differences = np.zeros((nx, ny + 1), dtype=np.int64)
+        values = self.values.astype(np.int64)
+        np.add.at(differences, (self.rows, self.starts), values)
+        np.add.at(differences, (self.rows, self.stops), -values)
+        return np.cumsum(differences[:, :-1], axis=1).astype(dtype)
+    
+    def to_dense(self, dtype=None):
+        """
+        Expande a malha para o array denso (nx, ny, nz).
+        
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            Tipo do array. Se None, usa o tipo de `values`.
+        
+        Returns
+        -------
+        numpy.ndarray
+            Malha densa, como as saídas de `create_3d_mesh` e `refine_mesh`.
+        """
+        mesh = np.zeros(self.shape, dtype=self.values.dtype if dtype is None else dtype)
+        run, columns = _expand_runs(self.starts, self.stops.astype(np.int64) - self.starts)
+        mesh[self.rows[run], columns, self.layers[run]] = self.values[run]
+        return mesh
+
+def _merge_runs(nz, ny, rows, layers, starts, stops):
+    """
+    Une as sequências que se sobrepõem ou se tocam em uma mesma linha e camada.
+    
+    Returns
+    -------
+    tuple
+        (rows, layers, starts, stops) das sequências unidas, ordenadas por (linha, camada, início).
+    """
+    rows, layers, starts, stops = (np.asarray(array, dtype=np.int64) for array in (rows, layers, starts, stops))
+    keep = stops > starts
+    width = ny + 1
+    lines = (rows * nz + layers)[keep]
+    begin = lines * width + starts[keep]
+    end = lines * width + stops[keep]
+    order = np.argsort(begin, kind='stable')
+    begin, end = begin[order], end[order]
+    
+    # Uma nova sequência começa quando o início passa do maior fim anterior
+    reach = np.maximum.accumulate(end)
+    new = np.ones(len(begin), dtype=bool)
+    new[1:] = begin[1:] > reach[:-1]
+    groups = np.flatnonzero(new)
+    begin = begin[groups]
+    end = np.maximum.reduceat(end, groups) if len(groups) else end[:0]
+    
+    lines, starts = np.divmod(begin, width)
+    return lines // nz, lines % nz, starts, end - lines * width
 
+@instr.timed('weight_array')
 def compute_weight_array(mesh):
     """
     Calcula o array de pesos para a projeção 2D ao longo da direção Z.
@@ -147,8 +551,8 @@ def compute_weight_array(mesh):
     
     Parameters
     ----------
-    mesh : numpy.ndarray
-        Array tridimensional representando a malha 3D.
+    mesh : numpy.ndarray or IntervalMesh
+        Array tridimensional representando a malha 3D, ou malha codificada por sequências.
         
     Returns
     -------
@@ -163,9 +567,225 @@ def compute_weight_array(mesh):
     >>> print(weights.shape)
     (8, 8)
     """
+    if isinstance(mesh, IntervalMesh):
+        return mesh.weight_array()  # Soma direta das sequências, sem o array denso
+    
+    instr.count('mesh_cells', np.size(mesh))
     weight_array = np.sum(mesh, axis=2)  # Soma ao longo do eixo Z
     return weight_array
 
+def open_mesh(source, shape=None, mesh_dtype=None, offset=0):
+    """
+    Abre uma malha 3D sem carregá-la na memória.
+    
+    Parameters
+    ----------
+    source : str or numpy.ndarray
+        Caminho de um arquivo `.npy` (aberto com `mmap_mode='r'`), caminho de um arquivo binário
+        bruto (exige `shape` e `mesh_dtype`) ou um array já carregado ou mapeado.
+    shape : tuple, optional
+        Forma (nx, ny, nz) da malha em um arquivo bruto, em ordem C.
+    mesh_dtype : numpy.dtype, optional
+        Tipo dos valores em um arquivo bruto.
+    offset : int, optional
+        Número de bytes de cabeçalho antes dos dados em um arquivo bruto. Valor padrão é 0.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array tridimensional (um `numpy.memmap` para arquivos).
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        mesh = np.asarray(source)
+    elif str(source).endswith('.npy'):
+        mesh = np.load(source, mmap_mode='r')
+    else:
+        if shape is None or mesh_dtype is None:
+            raise ValueError("Arquivos brutos exigem 'shape' e 'mesh_dtype'")
+        mesh = np.memmap(source, dtype=mesh_dtype, mode='r', offset=offset, shape=tuple(shape))
+    
+    if mesh.ndim != 3:
+        raise ValueError("A malha deve ser um array tridimensional (nx, ny, nz)")
+    return mesh
+
+@instr.timed('weight_array')
+def compute_weight_array_streaming(source, dtype=None, slab_axis=None, slab_bytes=64 * 2**20, workers=None,
+                                   shape=None, mesh_dtype=None, offset=0):
+    """
+    Calcula o array de pesos da projeção em Z lendo a malha em fatias, com memória limitada.
+    
+    Versão de `compute_weight_array` para malhas que não cabem na memória: a malha é mapeada
+    a partir do arquivo (ver `open_mesh`) e percorrida em fatias de planos consecutivos ao longo
+    de X ou de Z, de no máximo `slab_bytes` bytes cada. Nas fatias em X, cada fatia produz
+    diretamente as linhas correspondentes do mapa de pesos; nas fatias em Z, as somas parciais
+    são acumuladas no mapa. A memória usada é a do mapa de pesos mais uma fatia por thread.
+    
+    Parameters
+    ----------
+    source : str or numpy.ndarray
+        Caminho de um arquivo `.npy` ou bruto, ou um array (ver `open_mesh`).
+    dtype : numpy.dtype, optional
+        Tipo do acumulador e do mapa de pesos. Se None, usa o mesmo tipo de `np.sum`
+        (por exemplo, `int64` para malhas inteiras).
+    slab_axis : int, optional
+        Eixo das fatias: 0 (planos X, contíguos em ordem C) ou 2 (planos Z, contíguos em ordem
+        Fortran). Se None, é escolhido pela ordem de memória da malha.
+    slab_bytes : int, optional
+        Tamanho máximo, em bytes, de uma fatia lida da malha. Valor padrão é 64 MiB.
+    workers : int, optional
+        Número de threads que processam fatias em paralelo. Se None ou 1, as fatias são
+        processadas em sequência.
+    shape, mesh_dtype, offset : optional
+        Descrição de um arquivo bruto (ver `open_mesh`).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array bidimensional (nx, ny) com os pesos, igual a `compute_weight_array(mesh)`.
+    
+    Examples
+    --------
+    >>> np.save('malha.npy', refine_mesh(create_3d_mesh(), regions))
+    >>> weights = compute_weight_array_streaming('malha.npy', dtype=np.int32, workers=4)
+    """
+    mesh = open_mesh(source, shape, mesh_dtype, offset)
+    nx, ny, nz = mesh.shape
+    if dtype is None:
+        dtype = np.sum(np.zeros(1, dtype=mesh.dtype)).dtype
+    if slab_axis is None:
+        slab_axis = 2 if mesh.flags.f_contiguous and not mesh.flags.c_contiguous else 0
+    if slab_axis not in (0, 2):
+        raise ValueError("As fatias devem ser tomadas ao longo de X (0) ou de Z (2)")
+    
+    # Número de planos por fatia dentro do limite de bytes
+    plane_bytes = mesh.itemsize * (ny * nz if slab_axis == 0 else nx * ny)
+    planes = max(1, int(slab_bytes // max(plane_bytes, 1)))
+    n_planes = mesh.shape[slab_axis]
+    slabs = [(start, min(start + planes, n_planes)) for start in range(0, n_planes, planes)]
+    
+    weight_array = np.zeros((nx, ny), dtype=dtype)
+    lock = threading.Lock()
+    instr.count('mesh_cells', mesh.size)
+    instr.count('slabs', len(slabs))
+    
+    def project(slab):
+        start, stop = slab
+        if slab_axis == 0:
+            # Fatias em X: linhas disjuntas do mapa de pesos
+            np.sum(mesh[start:stop], axis=2, dtype=dtype, out=weight_array[start:stop])
+        else:
+            partial = np.sum(mesh[:, :, start:stop], axis=2, dtype=dtype)
+            with lock:
+                np.add(weight_array, partial, out=weight_array)
+    
+    if workers is not None and workers > 1 and len(slabs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(project, slabs))
+    else:
+        for slab in slabs:
+            project(slab)
+    
+    return weight_array
+
+# Cantos de cada face de um cubo unitário, na ordem (-X, +X, -Y, +Y, -Z, +Z), em ordem de contorno
+_CUBE_FACE_CORNERS = np.array([
+    [[0, 0, 0], [0, 1, 0], [0, 1, 1], [0, 0, 1]],
+    [[1, 0, 0], [1, 1, 0], [1, 1, 1], [1, 0, 1]],
+    [[0, 0, 0], [1, 0, 0], [1, 0, 1], [0, 0, 1]],
+    [[0, 1, 0], [1, 1, 0], [1, 1, 1], [0, 1, 1]],
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+    [[0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]],
+])
+
+def mesh_boundary_faces(classes, drawn=None):
+    """
+    Calcula as faces visíveis das células de uma malha 3D, com operações sobre arrays.
+    
+    Uma face é mantida quando a célula vizinha do outro lado está fora da malha ou tem classe
+    diferente; faces compartilhadas por duas células da mesma classe (por exemplo, duas células
+    ativas com a mesma cor) são descartadas. Com o backend compilado (ver `nucleos_compilados`),
+    faces e vértices são gerados em um único laço por `nucleos_compilados.boundary_faces`.
+    
+    Parameters
+    ----------
+    classes : numpy.ndarray
+        Array (nx, ny, nz) com a classe de cada célula (por exemplo, ativa/inativa, fator de
+        refinamento ou rótulo de subdomínio).
+    drawn : numpy.ndarray, optional
+        Máscara booleana das células cujas faces são geradas. Se None, todas as células.
+    
+    Returns
+    -------
+    tuple
+        (vertices, cells) onde `vertices` é um array (n_faces, 4, 3) com os cantos de cada face
+        e `cells` contém o índice plano da célula dona de cada face.
+    
+    Examples
+    --------
+    >>> mesh = create_3d_mesh()
+    >>> vertices, cells = mesh_boundary_faces(mesh > 0, drawn=mesh > 0)
+    """
+    classes = np.asarray(classes)
+    drawn = np.ones(classes.shape, dtype=bool) if drawn is None else np.asarray(drawn, dtype=bool)
+    if nc.use_compiled():
+        return nc.boundary_faces(classes, drawn, _CUBE_FACE_CORNERS)
+    
+    vertices = []
+    cells = []
+    for axis in range(3):
+        for side, (here, there) in enumerate(((slice(1, None), slice(None, -1)),
+                                              (slice(None, -1), slice(1, None)))):
+            # Faces voltadas para o sentido negativo (side 0) ou positivo (side 1) do eixo
+            exposed = drawn.copy()
+            own = tuple(here if a == axis else slice(None) for a in range(3))
+            neighbor = tuple(there if a == axis else slice(None) for a in range(3))
+            exposed[own] &= classes[own] != classes[neighbor]
+            
+            flat = np.flatnonzero(exposed)
+            coords = np.column_stack(np.unravel_index(flat, classes.shape))
+            vertices.append(coords[:, None, :] + _CUBE_FACE_CORNERS[2 * axis + side])
+            cells.append(flat)
+    
+    return np.concatenate(vertices).astype(float), np.concatenate(cells)
+
+def plot_cell_faces(ax, classes, cell_colors, drawn=None, linewidths=0.1, edgecolors='k'):
+    """
+    Desenha as faces visíveis de uma malha 3D em uma única coleção, com uma cor por face.
+    
+    Parameters
+    ----------
+    ax : mpl_toolkits.mplot3d.axes3d.Axes3D
+        Eixo 3D onde as faces serão desenhadas.
+    classes : numpy.ndarray
+        Classe de cada célula (ver `mesh_boundary_faces`).
+    cell_colors : numpy.ndarray
+        Array (nx * ny * nz, 4) com a cor RGBA de cada célula, em ordem plana.
+    drawn : numpy.ndarray, optional
+        Máscara das células desenhadas. Se None, todas as células.
+    linewidths, edgecolors : optional
+        Espessura e cor das arestas.
+    
+    Returns
+    -------
+    Poly3DCollection
+        Coleção adicionada ao eixo.
+    """
+    vertices, cells = mesh_boundary_faces(classes, drawn)
+    collection = Poly3DCollection(vertices, facecolors=cell_colors[cells], linewidths=linewidths,
+                                  edgecolors=edgecolors)
+    ax.add_collection3d(collection)
+    
+    # Configurações do gráfico
+    nx, ny, nz = np.shape(classes)
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_zlabel('Z')
+    ax.set_xlim(0, nx)
+    ax.set_ylim(0, ny)
+    ax.set_zlim(0, nz)
+    ax.view_init(elev=20, azim=30)  # Ajusta a visualização 3D
+    return collection
+
 def plot_3d_mesh_with_weights_old(mesh):
     """
     Plota a malha 3D mostrando as células ativas com base nos pesos.
@@ -187,105 +807,195 @@ def plot_3d_mesh_with_weights_old(mesh):
     Notes
     -----
     Esta função usa a biblioteca Matplotlib para criar uma visualização 3D da malha.
-    As células são representadas como cubos com cores diferentes dependendo do seu estado.
+    Apenas as faces na fronteira entre células ativas e inativas (ou da malha) são desenhadas,
+    todas em uma única coleção (ver `plot_cell_faces`).
     """
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
     
     # Define cores para células ativas e inativas
-    active_color = (0, 0, 1, 0.5)  # Azul com transparência
-    inactive_color = (1, 0, 0, 0.01)  # Vermelho claro com transparência
+    active = np.asarray(mesh).reshape(-1) > 0
+    cell_colors = np.where(active[:, None], (0, 0, 1, 0.5), (1, 0, 0, 0.01))  # Azul / vermelho claro
+    plot_cell_faces(ax, np.asarray(mesh) > 0, cell_colors)
 
-    # Dimensões da malha
-    nx, ny, nz = mesh.shape
+# Agregações aceitas por `block_reduce`
+_BLOCK_REDUCTIONS = {'mean': np.nanmean, 'sum': np.nansum, 'max': np.nanmax, 'min': np.nanmin}
 
-    # Função para criar vértices de um cubo
-    def cubo_vertices(x, y, z):
-        """
-        Retorna os vértices de um cubo dadas as coordenadas de um dos seus vértices.
-        
-        Parameters
-        ----------
-        x : int
-            Coordenada X do vértice inicial.
-        y : int
-            Coordenada Y do vértice inicial.
-        z : int
-            Coordenada Z do vértice inicial.
-            
-        Returns
-        -------
-        list
-            Lista com as coordenadas dos 8 vértices do cubo.
-        """
-        # Return a list of the coordinates of the vertices of the cube
-        return [
-            [x, y, z],
-            [x + 1, y, z],
-            [x + 1, y + 1, z],
-            [x, y + 1, z],
-            [x, y, z + 1],
-            [x + 1, y, z + 1],
-            [x + 1, y + 1, z + 1],
-            [x, y + 1, z + 1]
-        ]
-
-    # Função para criar faces de um cubo a partir dos vértices
-    def cubo_faces(verts):
-        """
-        Retorna as faces de um cubo a partir dos seus vértices.
-        
-        Parameters
-        ----------
-        verts : list
-            Lista com as coordenadas dos 8 vértices do cubo.
-            
-        Returns
-        -------
-        list
-            Lista com as 6 faces do cubo, onde cada face é uma lista de 4 vértices.
-        """
-        # Return a list of faces, each face is a list of vertices
-        return [
-            # First face: top face
-            [verts[0], verts[1], verts[5], verts[4]],
-            # Second face: bottom face
-            [verts[7], verts[6], verts[2], verts[3]],
-            # Third face: front face
-            [verts[0], verts[3], verts[7], verts[4]],
-            # Fourth face: back face
-            [verts[1], verts[2], verts[6], verts[5]],
-            # Fifth face: left face
-            [verts[0], verts[1], verts[2], verts[3]],
-            # Sixth face: right face
-            [verts[4], verts[5], verts[6], verts[7]]
-        ]
-
-    # Percorre todas as células da malha
-    for i in range(nx):
-        for j in range(ny):
-            for k in range(nz):
-                # Obtém os vértices do cubo na posição (i, j, k)
-                verts = cubo_vertices(i, j, k)
-                faces = cubo_faces(verts)
-                # Define a cor com base no peso
-                color = active_color if mesh[i, j, k] > 0 else inactive_color
-                # Cria a coleção de polígonos para as faces do cubo
-                poly3d = Poly3DCollection(faces, facecolors=color, linewidths=0.1, edgecolors='k')
-                ax.add_collection3d(poly3d)
+def block_reduce(array, block, reduce='mean'):
+    """
+    Reduz um array 2D em blocos de `block` x `block` células.
+    
+    Parameters
+    ----------
+    array : numpy.ndarray
+        Array bidimensional (por exemplo, a matriz de pesos).
+    block : int
+        Lado do bloco, em células. Os blocos da última linha e coluna podem ser incompletos.
+    reduce : str, optional
+        'mean', 'sum', 'max' ou 'min' agregam os valores de cada bloco; 'sample' toma a primeira
+        célula do bloco (adequado a rótulos, que não podem ser agregados). Valor padrão é 'mean'.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array com ceil(nx / block) x ceil(ny / block) elementos.
+    
+    Examples
+    --------
+    >>> block_reduce(np.arange(16).reshape(4, 4), 2, reduce='sum')
+    array([[10, 18],
+           [42, 50]])
+    """
+    array = np.asarray(array)
+    if block <= 1:
+        return array
+    if reduce == 'sample':
+        return array[::block, ::block]
+    if reduce not in _BLOCK_REDUCTIONS:
+        raise ValueError(f"Agregação desconhecida: {reduce!r}")
+    
+    nx, ny = array.shape
+    bx, by = -(-nx // block), -(-ny // block)
+    if nx % block or ny % block:
+        # Completa os blocos incompletos com NaN, ignorado pelas agregações
+        padded = np.full((bx * block, by * block), np.nan)
+        padded[:nx, :ny] = array
+        array = padded
+    blocks = array.reshape(bx, block, by, block)
+    return _BLOCK_REDUCTIONS[reduce](blocks, axis=(1, 3))
 
-    # Configurações do gráfico
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.set_xlim(0, nx)
-    ax.set_ylim(0, ny)
-    ax.set_zlim(0, nz)
-    ax.view_init(elev=20, azim=30)  # Ajusta a visualização 3D
+def _runs_to_segments(edges, offset_axis):
+    """Agrupa arestas consecutivas de `edges` (linhas x posições) em segmentos retos."""
+    padded = np.zeros((edges.shape[0], edges.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = edges
+    steps = np.diff(padded, axis=1)
+    line, start = np.nonzero(steps == 1)
+    _, stop = np.nonzero(steps == -1)
+    fixed = line + 0.5
+    segments = np.empty((len(line), 2, 2))
+    segments[:, :, offset_axis] = fixed[:, None]
+    segments[:, 0, 1 - offset_axis] = start - 0.5
+    segments[:, 1, 1 - offset_axis] = stop - 0.5
+    return segments
 
+def partition_boundaries(labels):
+    """
+    Calcula as fronteiras entre subdomínios de um array 2D de rótulos.
+    
+    As arestas entre células vizinhas com rótulos diferentes são encontradas com operações
+    sobre arrays, e arestas consecutivas na mesma linha são unidas em um único segmento.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array (nx, ny) de rótulos; o contorno das células com rótulo negativo (fora da partição)
+        também é uma fronteira.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array (n_segmentos, 2, 2) com os extremos (x, y) de cada segmento, nas coordenadas de
+        `imshow` (x = coluna, y = linha, centros das células nos inteiros).
+    """
+    labels = np.asarray(labels)
+    # Arestas verticais entre as colunas j e j + 1, agrupadas ao longo das linhas
+    vertical = _runs_to_segments((labels[:, 1:] != labels[:, :-1]).T, 0)
+    # Arestas horizontais entre as linhas i e i + 1, agrupadas ao longo das colunas
+    horizontal = _runs_to_segments(labels[1:, :] != labels[:-1, :], 1)
+    return np.concatenate([vertical, horizontal])
 
+class LevelOfDetailMap:
+    """
+    Imagem 2D de uma matriz grande, com nível de detalhe ajustado à região visível.
+    
+    A região visível do eixo é reduzida em blocos (`block_reduce`) até no máximo `max_pixels`
+    elementos, e os valores são escritos sobre as células apenas quando há no máximo
+    `max_annotations` blocos visíveis. A imagem e os textos são refeitos quando os limites do eixo
+    mudam (zoom ou deslocamento na janela interativa, ou `set_xlim`/`set_ylim`).
+    
+    Attributes
+    ----------
+    ax : matplotlib.axes.Axes
+        Eixo do gráfico.
+    image : matplotlib.image.AxesImage
+        Imagem da região visível.
+    block : int
+        Lado do bloco usado na última atualização.
+    texts : list
+        Textos dos valores na última atualização.
+    """
+    
+    def __init__(self, ax, values, cmap, norm, reduce='mean', max_pixels=10**6, max_annotations=400,
+                 annotate=True):
+        self.ax = ax
+        self.values = values
+        self.cmap = cmap
+        self.norm = norm
+        self.reduce = reduce
+        self.max_pixels = max_pixels
+        self.max_annotations = max_annotations if annotate else 0
+        self.block = 1
+        self.texts = []
+        self._updating = False
+        
+        nx, ny = values.shape
+        self.image = ax.imshow(np.zeros((1, 1)), cmap=cmap, norm=norm, interpolation='nearest')
+        ax.set_xlim(-0.5, ny - 0.5)
+        ax.set_ylim(nx - 0.5, -0.5)
+        self.update()
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.callbacks.connect('ylim_changed', self.update)
+    
+    def visible_window(self):
+        """Linhas e colunas visíveis, (i0, i1, j0, j1) com fins exclusivos."""
+        nx, ny = self.values.shape
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        i0, i1 = max(0, int(np.floor(y0 + 0.5))), min(nx, int(np.ceil(y1 + 0.5)))
+        j0, j1 = max(0, int(np.floor(x0 + 0.5))), min(ny, int(np.ceil(x1 + 0.5)))
+        return i0, max(i1, i0 + 1), j0, max(j1, j0 + 1)
+    
+    def update(self, ax=None):
+        """Refaz a imagem e os textos da região visível."""
+        if self._updating:
+            return
+        self._updating = True
+        try:
+            i0, i1, j0, j1 = self.visible_window()
+            cells = (i1 - i0) * (j1 - j0)
+            self.block = max(1, int(np.ceil(np.sqrt(cells / self.max_pixels))))
+            data = block_reduce(self.values[i0:i1, j0:j1], self.block, self.reduce)
+            
+            bx, by = data.shape
+            self.image.set_data(data)
+            self.image.set_extent((j0 - 0.5, j0 + by * self.block - 0.5, i0 + bx * self.block - 0.5, i0 - 0.5))
+            if self.reduce == 'sum':
+                # A soma depende do tamanho do bloco: a escala de cores acompanha os valores exibidos
+                self.image.set_clim(np.nanmin(data), np.nanmax(data))
+            self._annotate(data, i0, j0)
+        finally:
+            self._updating = False
+    
+    def _annotate(self, data, i0, j0):
+        for text in self.texts:
+            text.remove()
+        self.texts = []
+        if data.size > self.max_annotations:
+            return
+        
+        # Cor do texto (preto ou branco) pelo brilho percebido da cor de fundo
+        colors = self.image.cmap(self.image.norm(data))
+        brightness = 0.299 * colors[..., 0] + 0.587 * colors[..., 1] + 0.114 * colors[..., 2]
+        centers = (self.block - 1) / 2
+        for (i, j), val in np.ndenumerate(data):
+            if np.isnan(val):
+                continue
+            label = f'{int(val)}' if float(val).is_integer() else f'{val:.3g}'
+            self.texts.append(self.ax.text(j0 + j * self.block + centers, i0 + i * self.block + centers, label,
+                                           ha='center', va='center',
+                                           color='white' if brightness[i, j] < 0.5 else 'black'))
 
-def plot_weights(weight_array):
+def plot_weights(weight_array, ax=None, labels=None, reduce='mean', max_pixels=10**6, max_annotations=400):
     """
     Plota a matriz de pesos como uma imagem 2D colorida com os valores sobrepostos.
     
@@ -293,44 +1003,151 @@ def plot_weights(weight_array):
     ----------
     weight_array : numpy.ndarray
         Array bidimensional com os pesos calculados.
+    ax : matplotlib.axes.Axes, optional
+        Eixo do gráfico. Se None, cria uma nova figura.
+    labels : numpy.ndarray, optional
+        Rótulos de uma partição da matriz; se dados, as fronteiras entre subdomínios são desenhadas.
+    reduce : str, optional
+        Agregação dos blocos quando a matriz visível excede `max_pixels` (ver `block_reduce`).
+        Valor padrão é 'mean'.
+    max_pixels : int, optional
+        Número máximo de elementos da imagem exibida. Valor padrão é 10**6.
+    max_annotations : int, optional
+        Os valores são escritos sobre as células (ou blocos) apenas quando há no máximo esse número
+        visível; 0 desativa os textos. Valor padrão é 400.
     
     Returns
     -------
-    None
-        A função cria e exibe um gráfico 2D, mas não retorna nenhum valor.
+    LevelOfDetailMap
+        Imagem com nível de detalhe; `view.ax` é o eixo do gráfico.
     
     Notes
     -----
     Esta função usa a biblioteca Matplotlib para criar uma visualização 2D da matriz de pesos.
     A cor de cada célula é determinada pelo valor do peso, e o valor numérico é mostrado
-    dentro de cada célula. A cor do texto é ajustada (preto ou branco) para garantir
-    a legibilidade de acordo com o brilho da cor de fundo.
+    dentro de cada célula quando a região visível é pequena (por exemplo, após um zoom). A cor
+    do texto é ajustada (preto ou branco) para garantir a legibilidade de acordo com o brilho
+    da cor de fundo. Matrizes grandes são exibidas em blocos de valores agregados, de modo que
+    mapas de 2000 x 2000 células são desenhados rapidamente.
     """
-    # Função para plotar a matriz de pesos
-    fig, ax = plt.subplots()
+    weight_array = np.asarray(weight_array)
+    if ax is None:
+        fig, ax = plt.subplots()
     cmap = colormaps['viridis']  # Escolha o mapa de cores desejado
     norm = Normalize(vmin=weight_array.min(), vmax=weight_array.max())
-
+    
     # Exibe a matriz de pesos
-    cax = ax.imshow(weight_array, cmap=cmap, norm=norm)
-
-    # Adiciona os valores sobre as células
-    for (i, j), val in np.ndenumerate(weight_array):
-        # Obtém a cor de fundo da célula
-        bg_color = cmap(norm(val))
-        # Calcula o brilho percebido da cor de fundo
-        brightness = 0.299 * bg_color[0] + 0.587 * bg_color[1] + 0.114 * bg_color[2]
-        # Define a cor do texto como branco ou preto, dependendo do brilho
-        text_color = 'white' if brightness < 0.5 else 'black'
-        ax.text(j, i, f'{val}', ha='center', va='center', color=text_color)
-
+    view = LevelOfDetailMap(ax, weight_array, cmap, norm, reduce=reduce, max_pixels=max_pixels,
+                            max_annotations=max_annotations)
+    if labels is not None:
+        plot_partition_boundaries(ax, labels)
+    
     # Adiciona uma barra de cores para referência
-    fig.colorbar(cax)
-
+    ax.figure.colorbar(view.image, ax=ax)
+    
     # Configurações adicionais
     ax.set_title('Matriz de Pesos')
     ax.set_xlabel('Índice da Coluna')
     ax.set_ylabel('Índice da Linha')
+    return view
+
+def plot_partition_boundaries(ax, labels, color='k', linewidth=0.8):
+    """
+    Desenha as fronteiras entre subdomínios (ver `partition_boundaries`) em uma única coleção.
+    
+    Returns
+    -------
+    LineCollection
+        Coleção adicionada ao eixo.
+    """
+    collection = LineCollection(partition_boundaries(labels), colors=color, linewidths=linewidth)
+    ax.add_collection(collection, autolim=False)
+    return collection
+
+def plot_partition_2d(labels, weights=None, ax=None, cmap='tab20', max_pixels=10**6, max_annotations=0):
+    """
+    Plota uma partição 2D: subdomínios coloridos (ou a matriz de pesos) e as fronteiras entre eles.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array (nx, ny) de rótulos, por exemplo `PartitionState.labels`; valores negativos indicam
+        células fora da partição, que ficam transparentes.
+    weights : numpy.ndarray, optional
+        Se dado, a matriz de pesos é exibida sob as fronteiras (ver `plot_weights`).
+    ax : matplotlib.axes.Axes, optional
+        Eixo do gráfico. Se None, cria uma nova figura.
+    cmap : str, optional
+        Mapa de cores dos rótulos. Valor padrão é 'tab20'.
+    max_pixels : int, optional
+        Número máximo de elementos da imagem exibida. Valor padrão é 10**6.
+    max_annotations : int, optional
+        Número máximo de rótulos escritos sobre as células visíveis. Valor padrão é 0 (sem textos).
+    
+    Returns
+    -------
+    LevelOfDetailMap
+        Imagem com nível de detalhe; `view.ax` é o eixo do gráfico.
+    
+    Examples
+    --------
+    >>> state = PartitionState(weights)
+    >>> view = plot_partition_2d(state.partition(64), weights)
+    """
+    labels = np.asarray(labels)
+    if weights is not None:
+        view = plot_weights(weights, ax=ax, labels=labels, max_pixels=max_pixels, max_annotations=max_annotations)
+        view.ax.set_title('Partição 2D')
+        return view
+    
+    if ax is None:
+        fig, ax = plt.subplots()
+    # Uma cor por rótulo, repetindo as cores do mapa; NaN (transparente) fora da partição
+    n_labels = max(int(labels.max()) + 1, 1)
+    base = colormaps[cmap]
+    colormap = ListedColormap(base(np.arange(n_labels) % base.N)).with_extremes(bad=(0, 0, 0, 0))
+    values = np.where(labels >= 0, labels, np.nan)
+    norm = Normalize(vmin=-0.5, vmax=n_labels - 0.5)
+    view = LevelOfDetailMap(ax, values, colormap, norm, reduce='sample', max_pixels=max_pixels,
+                            max_annotations=max_annotations)
+    plot_partition_boundaries(ax, labels)
+    ax.set_title('Partição 2D')
+    ax.set_xlabel('Índice da Coluna')
+    ax.set_ylabel('Índice da Linha')
+    return view
+
+def _mesh_cell_colors(mesh, show_refinement):
+    """
+    Classes e cores RGBA das células para `plot_mesh_in_axis`.
+    
+    Returns
+    -------
+    tuple
+        (classes, cell_colors, norm, cmap) onde `norm` e `cmap` são None se `show_refinement` for False.
+    """
+    mesh = np.asarray(mesh)
+    flat = mesh.reshape(-1)
+    
+    # Define cores para células inativas, ativas não refinadas e refinadas
+    cell_colors = np.empty((flat.size, 4))
+    cell_colors[:] = (1, 0, 0, 0.05)           # Vermelho quase invisível
+    cell_colors[flat == 1] = (0, 0, 1, 0.2)    # Azul com alta transparência
+    refined = flat > 1
+    
+    if show_refinement:
+        # Usa o colormap para células refinadas, com transparência menor (mais visíveis)
+        norm = Normalize(vmin=1, vmax=np.max(mesh))
+        cmap = colormaps['viridis']
+        cell_colors[refined] = cmap(norm(flat[refined]))
+        cell_colors[refined, 3] = 0.8
+        classes = np.where(mesh > 0, mesh, 0)
+    else:
+        # No modo não-refinamento, usa a cor azul padrão, mas mais opaca
+        norm = cmap = None
+        cell_colors[refined] = (0, 0, 1, 0.6)
+        classes = np.where(mesh > 0, np.minimum(mesh, 2), 0)
+    
+    return classes, cell_colors, norm, cmap
 
 def plot_3d_mesh_with_weights(mesh, show_refinement=False):
     """
@@ -356,118 +1173,12 @@ def plot_3d_mesh_with_weights(mesh, show_refinement=False):
     """
     fig = plt.figure(figsize=(10, 8))
     ax = fig.add_subplot(111, projection='3d')
-    
-    # Define cores para células inativas, ativas não refinadas e refinadas
-    inactive_color = (1, 0, 0, 0.05)  # Vermelho quase invisível
-    active_color = (0, 0, 1, 0.2)     # Azul com alta transparência
+    plot_mesh_in_axis(ax, mesh, show_refinement)
     
     if show_refinement:
-        # Normaliza os valores para coloração
-        max_value = np.max(mesh)
-        norm = Normalize(vmin=1, vmax=max_value)
-        cmap = colormaps['viridis']  # Use viridis colormap for refinement values
-        
-        title = 'Malha 3D com Células Refinadas'
+        ax.set_title('Malha 3D com Células Refinadas')
     else:
-        title = 'Malha 3D com Células Ativas/Inativas'
-
-    # Dimensões da malha
-    nx, ny, nz = mesh.shape
-
-    # Função para criar vértices de um cubo
-    def cubo_vertices(x, y, z):
-        """
-        Retorna os vértices de um cubo dadas as coordenadas de um dos seus vértices.
-        """
-        return [
-            [x, y, z],
-            [x + 1, y, z],
-            [x + 1, y + 1, z],
-            [x, y + 1, z],
-            [x, y, z + 1],
-            [x + 1, y, z + 1],
-            [x + 1, y + 1, z + 1],
-            [x, y + 1, z + 1]
-        ]
-
-    # Função para criar faces de um cubo a partir dos vértices
-    def cubo_faces(verts):
-        """
-        Retorna as faces de um cubo a partir dos seus vértices.
-        """
-        return [
-            # First face: top face
-            [verts[0], verts[1], verts[5], verts[4]],
-            # Second face: bottom face
-            [verts[7], verts[6], verts[2], verts[3]],
-            # Third face: front face
-            [verts[0], verts[3], verts[7], verts[4]],
-            # Fourth face: back face
-            [verts[1], verts[2], verts[6], verts[5]],
-            # Fifth face: left face
-            [verts[0], verts[1], verts[2], verts[3]],
-            # Sixth face: right face
-            [verts[4], verts[5], verts[6], verts[7]]
-        ]
-
-    # Lista para armazenar todas as células, ordenadas pelo valor de refinamento
-    all_cells = []
-    
-    # Percorre todas as células da malha e armazena para ordenação posterior
-    for i in range(nx):
-        for j in range(ny):
-            for k in range(nz):
-                cell_value = mesh[i, j, k]
-                verts = cubo_vertices(i, j, k)
-                faces = cubo_faces(verts)
-                
-                # Define a cor com base no valor da célula
-                if cell_value <= 0:
-                    color = inactive_color
-                    z_order = -1  # Células inativas têm prioridade mais baixa
-                elif cell_value == 1:
-                    color = active_color
-                    z_order = 0   # Células ativas não refinadas têm prioridade média
-                else:
-                    if show_refinement:
-                        # Usa o colormap para células refinadas com transparência ajustada
-                        color_rgba = list(cmap(norm(cell_value)))
-                        # Células refinadas têm transparência menor (mais visíveis)
-                        color_rgba[3] = 0.8  
-                        color = tuple(color_rgba)
-                        z_order = cell_value  # Células mais refinadas têm prioridade mais alta
-                    else:
-                        # No modo não-refinamento, usa a cor azul padrão, mas mais opaca
-                        color = (0, 0, 1, 0.6)
-                        z_order = 1
-                
-                all_cells.append((z_order, faces, color))
-    
-    # Ordena as células pela prioridade de desenho (z-order)
-    # Células com valores menores (inativas, depois não refinadas) são desenhadas primeiro
-    all_cells.sort(key=lambda x: x[0])
-    
-    # Adiciona as células ao gráfico na ordem correta
-    for _, faces, color in all_cells:
-        poly3d = Poly3DCollection(faces, facecolors=color, linewidths=0.1, edgecolors='k')
-        ax.add_collection3d(poly3d)
-
-    # Configurações do gráfico
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.set_xlim(0, nx)
-    ax.set_ylim(0, ny)
-    ax.set_zlim(0, nz)
-    ax.view_init(elev=20, azim=30)  # Ajusta a visualização 3D
-    ax.set_title(title)
-    
-    # Adiciona uma legenda colorida se estiver mostrando refinamento
-    if show_refinement:
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax, orientation='vertical', 
-                           label='Fator de Refinamento')
+        ax.set_title('Malha 3D com Células Ativas/Inativas')
 
 def plot_mesh_in_axis(ax, mesh, show_refinement):
     """
@@ -475,6 +1186,9 @@ def plot_mesh_in_axis(ax, mesh, show_refinement):
     Células não refinadas são quase transparentes, enquanto células
     refinadas são destacadas.
     
+    Todas as faces visíveis são montadas com operações sobre arrays e desenhadas em uma única
+    coleção; faces entre duas células com a mesma cor não são desenhadas (ver `plot_cell_faces`).
+    
     Parameters
     ----------
     ax : matplotlib.axes.Axes
@@ -484,92 +1198,8 @@ def plot_mesh_in_axis(ax, mesh, show_refinement):
     show_refinement : bool
         Se True, mostra as células refinadas com cores distintas.
     """
-    # Define cores para células inativas, ativas não refinadas
-    inactive_color = (1, 0, 0, 0.05)  # Vermelho quase invisível
-    active_color = (0, 0, 1, 0.2)     # Azul com alta transparência
-    
-    if show_refinement:
-        # Normaliza os valores para coloração
-        max_value = np.max(mesh)
-        norm = Normalize(vmin=1, vmax=max_value)
-        cmap = colormaps['viridis']  # Use viridis colormap for refinement values
-    
-    # Dimensões da malha
-    nx, ny, nz = mesh.shape
-    
-    # Função para criar vértices de um cubo
-    def cubo_vertices(x, y, z):
-        return [
-            [x, y, z],
-            [x + 1, y, z],
-            [x + 1, y + 1, z],
-            [x, y + 1, z],
-            [x, y, z + 1],
-            [x + 1, y, z + 1],
-            [x + 1, y + 1, z + 1],
-            [x, y + 1, z + 1]
-        ]
-    
-    # Função para criar faces de um cubo a partir dos vértices
-    def cubo_faces(verts):
-        return [
-            [verts[0], verts[1], verts[5], verts[4]],
-            [verts[7], verts[6], verts[2], verts[3]],
-            [verts[0], verts[3], verts[7], verts[4]],
-            [verts[1], verts[2], verts[6], verts[5]],
-            [verts[0], verts[1], verts[2], verts[3]],
-            [verts[4], verts[5], verts[6], verts[7]]
-        ]
-    
-    # Lista para armazenar todas as células, ordenadas pelo valor de refinamento
-    all_cells = []
-    
-    # Percorre todas as células da malha e armazena para ordenação posterior
-    for i in range(nx):
-        for j in range(ny):
-            for k in range(nz):
-                cell_value = mesh[i, j, k]
-                verts = cubo_vertices(i, j, k)
-                faces = cubo_faces(verts)
-                
-                # Define a cor com base no valor da célula
-                if cell_value <= 0:
-                    color = inactive_color
-                    z_order = -1  # Células inativas têm prioridade mais baixa
-                elif cell_value == 1:
-                    color = active_color
-                    z_order = 0   # Células ativas não refinadas têm prioridade média
-                else:
-                    if show_refinement:
-                        # Usa o colormap para células refinadas com transparência ajustada
-                        color_rgba = list(cmap(norm(cell_value)))
-                        # Células refinadas têm transparência menor (mais visíveis)
-                        color_rgba[3] = 0.8  
-                        color = tuple(color_rgba)
-                        z_order = cell_value  # Células mais refinadas têm prioridade mais alta
-                    else:
-                        # No modo não-refinamento, usa a cor azul padrão, mas mais opaca
-                        color = (0, 0, 1, 0.6)
-                        z_order = 1
-                
-                all_cells.append((z_order, faces, color))
-    
-    # Ordena as células pela prioridade de desenho (z-order)
-    all_cells.sort(key=lambda x: x[0])
-    
-    # Adiciona as células ao gráfico na ordem correta
-    for _, faces, color in all_cells:
-        poly3d = Poly3DCollection(faces, facecolors=color, linewidths=0.1, edgecolors='k')
-        ax.add_collection3d(poly3d)
-    
-    # Configurações do gráfico
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.set_xlim(0, nx)
-    ax.set_ylim(0, ny)
-    ax.set_zlim(0, nz)
-    ax.view_init(elev=20, azim=30)  # Ajusta a visualização 3D
+    classes, cell_colors, norm, cmap = _mesh_cell_colors(mesh, show_refinement)
+    plot_cell_faces(ax, classes, cell_colors)
     
     # Adiciona uma legenda colorida se estiver mostrando refinamento
     if show_refinement:
@@ -578,6 +1208,51 @@ def plot_mesh_in_axis(ax, mesh, show_refinement):
         plt.colorbar(sm, ax=ax, orientation='vertical', 
                      label='Fator de Refinamento')
 
+def plot_partition_3d(labels, ax=None, cmap='tab20', alpha=0.6, show_inactive=False):
+    """
+    Plota os subdomínios de uma partição 3D, um bloco colorido por rótulo.
+    
+    Apenas as faces na fronteira de cada subdomínio são desenhadas, em uma única coleção.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array (nx, ny, nz) de rótulos, por exemplo `PartitionState.labels` de uma malha 3D;
+        valores negativos indicam células fora da partição.
+    ax : mpl_toolkits.mplot3d.axes3d.Axes3D, optional
+        Eixo 3D. Se None, cria uma nova figura.
+    cmap : str, optional
+        Mapa de cores dos rótulos. Valor padrão é 'tab20'.
+    alpha : float, optional
+        Transparência das faces dos subdomínios. Valor padrão é 0.6.
+    show_inactive : bool, optional
+        Se True, desenha também o contorno das células fora da partição, quase invisível.
+    
+    Returns
+    -------
+    mpl_toolkits.mplot3d.axes3d.Axes3D
+        Eixo com o gráfico.
+    
+    Examples
+    --------
+    >>> state = PartitionState(mesh, mask=mesh > 0)
+    >>> ax = plot_partition_3d(state.partition(8))
+    """
+    labels = np.asarray(labels)
+    if ax is None:
+        ax = plt.figure(figsize=(10, 8)).add_subplot(111, projection='3d')
+    
+    flat = labels.reshape(-1)
+    colormap = colormaps[cmap]
+    cell_colors = colormap(np.maximum(flat, 0) % colormap.N)
+    cell_colors[:, 3] = alpha
+    cell_colors[flat < 0] = (1, 0, 0, 0.05)
+    
+    classes = np.where(labels >= 0, labels, -1)
+    plot_cell_faces(ax, classes, cell_colors, drawn=None if show_inactive else labels >= 0)
+    ax.set_title('Partição 3D')
+    return ax
+
 def plot_both_mesh_views(mesh):
     """
     Cria duas visualizações da malha 3D lado a lado:
@@ -612,6 +1287,7 @@ def plot_both_mesh_views(mesh):
     
     plt.tight_layout()
 
+@instr.timed('inertia')
 def compute_inertia_matrix_from_grid(weight_matrix):
     """
     Calcula a matriz de inércia e o centro de massa a partir de uma matriz de pesos.
@@ -650,6 +1326,7 @@ def compute_inertia_matrix_from_grid(weight_matrix):
 
     return I, (x_bar, y_bar)    
 
+@instr.timed('inertia')
 def compute_inertia_matrix_from_points(points):
     """
     Calcula a matriz de inércia e o centro de massa a partir de um conjunto de pontos 2D com pesos.
@@ -686,6 +1363,62 @@ def compute_inertia_matrix_from_points(points):
     
     return I, (x_bar, y_bar)
 
+@instr.timed('inertia')
+def compute_inertia_matrix_3d(mesh, indices=None):
+    """
+    Calcula a matriz de inércia 3x3 e o centro de massa das células ativas de uma malha 3D.
+    
+    Cada célula é tratada como um ponto (i, j, k) com peso igual ao seu valor na malha (1 para
+    células ativas, ou o fator de refinamento após `refine_mesh`). Os somatórios são feitos com
+    operações vetorizadas sobre índices planos, sem criar objetos por célula.
+    
+    Parameters
+    ----------
+    mesh : numpy.ndarray
+        Array tridimensional (nx, ny, nz) da malha, por exemplo a saída de `create_3d_mesh`
+        ou de `refine_mesh`.
+    indices : numpy.ndarray, optional
+        Índices planos (em `mesh.ravel()`) das células consideradas. Se None, usa as células
+        com valor positivo.
+    
+    Returns
+    -------
+    tuple
+        (I, center_of_mass) onde I é a matriz de inércia 3x3 (que pode ser passada a
+        `calculate_principal_moments`) e center_of_mass é a tupla (x_bar, y_bar, z_bar).
+    
+    Examples
+    --------
+    >>> mesh = create_3d_mesh(8, 8, 3)
+    >>> I, cm = compute_inertia_matrix_3d(mesh)
+    >>> moments, axes = calculate_principal_moments(I)
+    """
+    mesh = np.asarray(mesh)
+    flat_mesh = mesh.reshape(-1)
+    if indices is None:
+        indices = np.flatnonzero(flat_mesh > 0)
+    
+    weights = flat_mesh[indices].astype(float)
+    coords = np.unravel_index(indices, mesh.shape)
+    
+    # Calcula o centro de massa
+    total_weight = weights.sum()
+    if total_weight == 0:
+        center_of_mass = np.zeros(3)  # Valor padrão apropriado
+    else:
+        center_of_mass = np.array([weights @ axis_coords for axis_coords in coords]) / total_weight
+    
+    # Segundos momentos centrais: S[a, b] = sum(w * (a - a_bar) * (b - b_bar))
+    offsets = [axis_coords - center for axis_coords, center in zip(coords, center_of_mass)]
+    weighted = [weights * offset for offset in offsets]
+    second_moments = np.array([[weighted[a] @ offsets[b] for b in range(3)] for a in range(3)])
+    
+    # Matriz de inércia: I = tr(S) * E - S
+    I = np.trace(second_moments) * np.eye(3) - second_moments
+    
+    return I, tuple(center_of_mass.tolist())
+
+@instr.timed('inertia')
 def calculate_principal_moments(inertia_matrix):
     """
     Calcula os momentos principais de inércia e os eixos principais a partir de uma matriz de inércia.
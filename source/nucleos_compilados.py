@@ -0,0 +1,529 @@
+"""
+Núcleos compilados opcionais dos laços mais pesados do particionamento e da visualização.
+
+Os núcleos são escritos como laços simples sobre arrays e compilados com o Numba quando ele
+está instalado (`numba.njit(cache=True)`: o código de máquina é gravado em `__pycache__`, ou em
+`NUMBA_CACHE_DIR`, e reaproveitado nas execuções seguintes sem nova compilação). Sem o Numba, as
+funções deste módulo continuam sendo Python puro, mas as rotinas públicas
+(`conectividade.prefix_connectivity`, `particionamento_por_bissecao.region_growing_partition_indices`,
+`mesh3d.mesh_boundary_faces`, ...) usam os seus caminhos vetorizados com NumPy.
+
+O caminho usado é escolhido por `set_backend` (ou pela variável de ambiente
+`PARTICIONAMENTO_BACKEND`): 'auto' (padrão) usa os núcleos compilados quando o Numba está
+disponível, 'numba' exige o Numba e 'python' força os caminhos NumPy, para comparações A/B.
+Os dois caminhos produzem os mesmos resultados.
+"""
+import os
+import contextlib
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # o Numba é opcional
+    numba = None
+
+# Backends aceitos por `set_backend`
+BACKENDS = ('auto', 'numba', 'python')
+
+# Variável de ambiente com o backend inicial
+BACKEND_ENV = 'PARTICIONAMENTO_BACKEND'
+
+_backend = 'auto'
+
+def _jit(function):
+    """Compila a função com o Numba (com cache em disco) ou a devolve sem alterações."""
+    if numba is None:
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+def available():
+    """Indica se o Numba está instalado."""
+    return numba is not None
+
+def set_backend(name):
+    """
+    Escolhe o caminho das rotinas com núcleo compilado.
+    
+    Parameters
+    ----------
+    name : str
+        'auto' (núcleos compilados se o Numba estiver instalado), 'numba' (exige o Numba) ou
+        'python' (caminhos vetorizados com NumPy).
+    
+    Raises
+    ------
+    ValueError
+        Se o nome não for um dos backends aceitos.
+    ImportError
+        Se 'numba' for pedido sem o Numba instalado.
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Backend {name!r} inválido. Opções: {BACKENDS}")
+    if name == 'numba' and numba is None:
+        raise ImportError("O backend 'numba' exige o pacote numba instalado")
+    _backend = name
+
+def get_backend():
+    """Backend escolhido ('auto', 'numba' ou 'python')."""
+    return _backend
+
+def active_backend():
+    """Caminho efetivamente usado: 'numba' ou 'python'."""
+    return 'numba' if use_compiled() else 'python'
+
+def use_compiled():
+    """Indica se as rotinas devem chamar os núcleos compilados."""
+    return numba is not None and _backend != 'python'
+
+@contextlib.contextmanager
+def backend(name):
+    """
+    Contexto que usa o backend dado no bloco e restaura o anterior na saída.
+    
+    Examples
+    --------
+    >>> with backend('python'):
+    ...     reference = ppb.PartitionState(weights).partition(64)
+    """
+    previous = _backend
+    set_backend(name)
+    try:
+        yield
+    finally:
+        set_backend(previous)
+
+@_jit
+def _find(parent, x):
+    """Raiz de `x` na floresta de união-busca, com compressão de caminho por divisão ao meio."""
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+@_jit
+def _union_min(parent, a, b):
+    """Une as árvores de `a` e `b` com a raiz de menor índice; devolve True se eram diferentes."""
+    a = _find(parent, a)
+    b = _find(parent, b)
+    if a == b:
+        return False
+    if a < b:
+        parent[b] = a
+    else:
+        parent[a] = b
+    return True
+
+@_jit
+def grid_components(labels, offsets):
+    """
+    Componentes conectados de cada rótulo de uma grade 3D (ver `conectividade.label_components`).
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array 3D de rótulos inteiros (negativos são vazios); grades 2D entram com forma (1, m, p).
+    offsets : numpy.ndarray
+        Array (k, 3) com a metade positiva do estêncil, incluindo (0, 0, 1).
+    
+    Returns
+    -------
+    tuple
+        (components, n_components): componente de cada célula em ordem plana (-1 nas vazias),
+        numerados pela primeira célula em ordem C.
+    """
+    nx, ny, nz = labels.shape
+    n = nx * ny * nz
+    parent = np.arange(n)
+    for i in range(nx):
+        for j in range(ny):
+            for k in range(nz):
+                label = labels[i, j, k]
+                if label < 0:
+                    continue
+                here = (i * ny + j) * nz + k
+                for o in range(offsets.shape[0]):
+                    a = i + offsets[o, 0]
+                    b = j + offsets[o, 1]
+                    c = k + offsets[o, 2]
+                    if 0 <= a < nx and 0 <= b < ny and 0 <= c < nz and labels[a, b, c] == label:
+                        _union_min(parent, here, (a * ny + b) * nz + c)
+    
+    components = np.full(n, -1, dtype=np.int64)
+    n_components = 0
+    for i in range(nx):
+        for j in range(ny):
+            for k in range(nz):
+                if labels[i, j, k] < 0:
+                    continue
+                here = (i * ny + j) * nz + k
+                root = _find(parent, here)
+                if root == here:
+                    components[here] = n_components
+                    n_components += 1
+                else:
+                    components[here] = components[root]
+    return components, n_components
+
+@_jit
+def cell_components(neighbors, same_side):
+    """
+    Componentes conectados de células dadas por uma tabela de vizinhos (ver
+    `conectividade.label_cell_components`).
+    
+    O rótulo de cada componente é a menor posição entre as células sem vizinho ligado na última
+    coluna (o início das sequências ao longo do último eixo), como no caminho vetorizado.
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 2 * d), com -1 para vizinhos ausentes.
+    same_side : numpy.ndarray
+        Lado de cada célula; apenas vizinhos do mesmo lado são ligados.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Rótulo de cada célula.
+    """
+    n, n_columns = neighbors.shape
+    last = n_columns - 1
+    parent = np.arange(n)
+    for v in range(n):
+        for column in range(n_columns):
+            u = neighbors[v, column]
+            if u >= 0 and same_side[u] == same_side[v]:
+                _union_min(parent, u, v)
+    
+    representative = np.full(n, n, dtype=np.int64)
+    for v in range(n):
+        u = neighbors[v, last]
+        if u < 0 or same_side[u] != same_side[v]:
+            root = _find(parent, v)
+            if v < representative[root]:
+                representative[root] = v
+    
+    labels = np.empty(n, dtype=np.int64)
+    for v in range(n):
+        labels[v] = representative[_find(parent, v)]
+    return labels
+
+@_jit
+def prefix_connectivity(neighbors):
+    """
+    Conectividade de todos os prefixos de uma lista de posições (ver
+    `conectividade.prefix_connectivity`), por união-busca incremental em O(n α(n)).
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 2 * d) das posições (-1 para vizinhos ausentes).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array booleano de tamanho n + 1; a entrada `c` indica se as posições [0, c) são conectadas.
+    """
+    n, n_columns = neighbors.shape
+    parent = np.arange(n)
+    connected = np.zeros(n + 1, dtype=np.bool_)
+    connected[0] = True
+    components = 0
+    for v in range(n):
+        components += 1
+        for column in range(n_columns):
+            u = neighbors[v, column]
+            if 0 <= u < v and _union_min(parent, u, v):
+                components -= 1
+        connected[v + 1] = components == 1
+    return connected
+
+@_jit
+def select_cut(valid, prefix_weights, target_weight1, total_weight):
+    """
+    Varredura linear dos cortes (ver `particionamento_por_bissecao._select_connected_cut`).
+    
+    Escolhe, entre os cortes válidos, o de menor desequilíbrio (empates pelo menor índice) e conta
+    quantos cortes a ordenação estável por desequilíbrio avaliaria até chegar a ele.
+    
+    Parameters
+    ----------
+    valid : numpy.ndarray
+        Array booleano de tamanho n - 1: o corte c = i + 1 tem os dois lados conectados.
+    prefix_weights : numpy.ndarray
+        Soma acumulada dos pesos na ordem da projeção.
+    target_weight1, total_weight : float
+        Peso alvo do primeiro subconjunto e peso total.
+    
+    Returns
+    -------
+    tuple
+        (cut, evaluated) com o índice de corte (0 se nenhum é válido) e o número de cortes avaliados.
+    """
+    n_cuts = valid.shape[0]
+    imbalance = np.empty(n_cuts)
+    best = -1
+    for i in range(n_cuts):
+        value = abs(prefix_weights[i] - target_weight1)
+        if total_weight > 0:
+            value = value / total_weight
+        imbalance[i] = value
+        if valid[i] and (best < 0 or value < imbalance[best]):
+            best = i
+    if best < 0:
+        return 0, n_cuts
+    
+    evaluated = 1
+    for i in range(n_cuts):
+        if imbalance[i] < imbalance[best] or (imbalance[i] == imbalance[best] and i < best):
+            evaluated += 1
+    return best + 1, evaluated
+
+@_jit
+def _fenwick_update(tree, region, rank, delta):
+    i = rank + 1
+    while i < tree.shape[1]:
+        tree[region, i] += delta
+        i += i & -i
+
+@_jit
+def _fenwick_prefix(tree, region, rank):
+    count = 0
+    i = rank + 1
+    while i > 0:
+        count += tree[region, i]
+        i -= i & -i
+    return count
+
+@_jit
+def _fenwick_kth(tree, region, k, top_bit):
+    position = 0
+    bit = top_bit
+    while bit:
+        candidate = position + bit
+        if candidate < tree.shape[1] and tree[region, candidate] < k:
+            position = candidate
+            k -= tree[region, candidate]
+        bit >>= 1
+    return position
+
+@_jit
+def _heap_push(heap, start, size, value):
+    """Insere `value` no heap mínimo heap[start:start + size] (que passa a ter size + 1 itens)."""
+    i = size
+    while i > 0:
+        up = (i - 1) // 2
+        if heap[start + up] <= value:
+            break
+        heap[start + i] = heap[start + up]
+        i = up
+    heap[start + i] = value
+
+@_jit
+def _heap_pop(heap, start, size):
+    """Remove o mínimo do heap heap[start:start + size] (que passa a ter size - 1 itens)."""
+    size -= 1
+    value = heap[start + size]
+    i = 0
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and heap[start + child + 1] < heap[start + child]:
+            child += 1
+        if value <= heap[start + child]:
+            break
+        heap[start + i] = heap[start + child]
+        i = child
+    if size > 0:
+        heap[start + i] = value
+
+@_jit
+def _first_position(heaps, heap_start, heap_size, region, rank, owner):
+    """Menor posição ainda não atribuída no posto, descartando as já atribuídas."""
+    start = heap_start[rank]
+    while owner[heaps[region, start]] >= 0:
+        _heap_pop(heaps[region], start, heap_size[region, rank])
+        heap_size[region, rank] -= 1
+    return heaps[region, start]
+
+@_jit
+def region_growing(weights, ranks, values, neighbors, targets):
+    """
+    Crescimento de duas regiões a partir das extremidades da ordem da projeção (ver
+    `particionamento_por_bissecao.region_growing_partition_indices`).
+    
+    As fronteiras seguem a mesma organização de `_WeightFrontier`: uma árvore de Fenwick por
+    região conta as células de cada posto de peso e um heap por posto, guardado em um trecho fixo
+    de um array (cada célula entra no máximo uma vez na fronteira de cada região), devolve a
+    menor posição.
+    
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        Peso (float) de cada posição.
+    ranks : numpy.ndarray
+        Posto do peso de cada posição em `values`.
+    values : numpy.ndarray
+        Pesos distintos em ordem crescente.
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 2 * d) das posições.
+    targets : numpy.ndarray
+        Pesos alvo das duas regiões.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array `int8` com a região (0 ou 1) de cada posição.
+    """
+    n = weights.shape[0]
+    n_ranks = values.shape[0]
+    top_bit = 1
+    while top_bit * 2 <= n_ranks:
+        top_bit *= 2
+    
+    # Trecho de cada posto nos heaps: o posto r ocupa [heap_start[r], heap_start[r] + contagem)
+    heap_start = np.zeros(n_ranks + 1, dtype=np.int64)
+    for position in range(n):
+        heap_start[ranks[position] + 1] += 1
+    for rank in range(n_ranks):
+        heap_start[rank + 1] += heap_start[rank]
+    heaps = np.empty((2, n), dtype=np.int64)
+    heap_size = np.zeros((2, n_ranks), dtype=np.int64)
+    tree = np.zeros((2, n_ranks + 1), dtype=np.int64)
+    frontier_size = np.zeros(2, dtype=np.int64)
+    in_frontier = np.zeros((2, n), dtype=np.bool_)
+    
+    owner = np.full(n, -1, dtype=np.int8)
+    region_weights = np.zeros(2)
+    
+    for step in range(n):
+        if step == 0:
+            best, region = 0, 0
+        elif step == 1:
+            best, region = n - 1, 1
+        else:
+            if frontier_size[0] == 0 and frontier_size[1] == 0:
+                break
+            deficit0 = (targets[0] - region_weights[0]) / targets[0] if targets[0] > 0 else 0.0
+            deficit1 = (targets[1] - region_weights[1]) / targets[1] if targets[1] > 0 else 0.0
+            if frontier_size[0] and (not frontier_size[1] or deficit0 > deficit1):
+                region = 0
+            else:
+                region = 1
+            
+            # Postos não vazios mais próximos do peso que falta à região
+            remaining = targets[region] - region_weights[region]
+            low, high = 0, n_ranks
+            while low < high:
+                middle = (low + high) // 2
+                if remaining < values[middle]:
+                    high = middle
+                else:
+                    low = middle + 1
+            limit_rank = low - 1
+            count = _fenwick_prefix(tree, region, limit_rank) if limit_rank >= 0 else 0
+            below = _fenwick_kth(tree, region, count, top_bit) if count > 0 else -1
+            above = _fenwick_kth(tree, region, count + 1, top_bit) if count < frontier_size[region] else -1
+            
+            if above < 0:
+                best = _first_position(heaps, heap_start, heap_size, region, below, owner)
+            elif below < 0:
+                best = _first_position(heaps, heap_start, heap_size, region, above, owner)
+            else:
+                gap_below = remaining - values[below]
+                gap_above = values[above] - remaining
+                if gap_below < gap_above:
+                    best = _first_position(heaps, heap_start, heap_size, region, below, owner)
+                elif gap_above < gap_below:
+                    best = _first_position(heaps, heap_start, heap_size, region, above, owner)
+                else:
+                    best = min(_first_position(heaps, heap_start, heap_size, region, below, owner),
+                               _first_position(heaps, heap_start, heap_size, region, above, owner))
+        
+        # Atribuição: atualiza o peso da região e as fronteiras
+        owner[best] = region
+        region_weights[region] += weights[best]
+        for r in range(2):
+            if in_frontier[r, best]:
+                in_frontier[r, best] = False
+                _fenwick_update(tree, r, ranks[best], -1)
+                frontier_size[r] -= 1
+        for column in range(neighbors.shape[1]):
+            neighbor = neighbors[best, column]
+            if neighbor >= 0 and owner[neighbor] < 0 and not in_frontier[region, neighbor]:
+                in_frontier[region, neighbor] = True
+                rank = ranks[neighbor]
+                _heap_push(heaps[region], heap_start[rank], heap_size[region, rank], neighbor)
+                heap_size[region, rank] += 1
+                _fenwick_update(tree, region, rank, 1)
+                frontier_size[region] += 1
+    
+    # Posições inalcançáveis: atribuídas apenas pelo déficit de peso
+    for position in range(n):
+        if owner[position] < 0:
+            weight = weights[position]
+            if abs(region_weights[0] + weight - targets[0]) < abs(region_weights[0] - targets[0]):
+                owner[position] = 0
+                region_weights[0] += weight
+            else:
+                owner[position] = 1
+    return owner
+
+@_jit
+def boundary_faces(classes, drawn, corners):
+    """
+    Faces visíveis das células de uma malha 3D e os seus vértices (ver `mesh3d.mesh_boundary_faces`).
+    
+    Parameters
+    ----------
+    classes : numpy.ndarray
+        Array (nx, ny, nz) com a classe de cada célula.
+    drawn : numpy.ndarray
+        Máscara booleana das células cujas faces são geradas.
+    corners : numpy.ndarray
+        Array (6, 4, 3) com os cantos de cada face de um cubo unitário.
+    
+    Returns
+    -------
+    tuple
+        (vertices, cells), na mesma ordem do caminho vetorizado: por face (eixo e sentido) e,
+        dentro de cada uma, em ordem plana das células.
+    """
+    nx, ny, nz = classes.shape
+    sizes = (nx, ny, nz)
+    exposed = np.zeros((6, nx, ny, nz), dtype=np.bool_)
+    n_faces = 0
+    for i in range(nx):
+        for j in range(ny):
+            for k in range(nz):
+                if not drawn[i, j, k]:
+                    continue
+                here = (i, j, k)
+                for face in range(6):
+                    axis = face // 2
+                    step = 1 if face % 2 else -1
+                    a = i + step if axis == 0 else i
+                    b = j + step if axis == 1 else j
+                    c = k + step if axis == 2 else k
+                    if not 0 <= here[axis] + step < sizes[axis] or classes[a, b, c] != classes[i, j, k]:
+                        exposed[face, i, j, k] = True
+                        n_faces += 1
+    
+    vertices = np.empty((n_faces, 4, 3))
+    cells = np.empty(n_faces, dtype=np.int64)
+    f = 0
+    for face in range(6):
+        for i in range(nx):
+            for j in range(ny):
+                for k in range(nz):
+                    if exposed[face, i, j, k]:
+                        for corner in range(4):
+                            vertices[f, corner, 0] = i + corners[face, corner, 0]
+                            vertices[f, corner, 1] = j + corners[face, corner, 1]
+                            vertices[f, corner, 2] = k + corners[face, corner, 2]
+                        cells[f] = (i * ny + j) * nz + k
+                        f += 1
+    return vertices, cells
+
+set_backend(os.environ.get(BACKEND_ENV, 'auto'))
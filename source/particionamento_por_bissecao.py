@@ -1,8 +1,15 @@
+import os
 import math
 import random
 import itertools
+import bisect
+import heapq
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import numpy as np
 import mesh3d as m3d
+import conectividade as conn
+import instrumentacao as instr
+import nucleos_compilados as nc
 
 def generate_input_synthetic_dictionary(m, p):
     """
@@ -126,374 +133,2348 @@ def calculate_max_distance(projections):
     
     return max_distance
 
+def select_projection_axis(x_coords, y_coords, center_of_mass, principal_axes):
+    """
+    Seleciona o eixo principal de projeção e calcula os valores de projeção dos pontos.
+    
+    Os pontos projetados sobre um eixo que passa pelo centro de massa são colineares, de modo
+    que a maior distância entre eles é simplesmente a amplitude (máximo - mínimo) da projeção
+    escalar. As duas projeções são obtidas em um único produto matricial, sem montar as
+    coordenadas projetadas, e o eixo escolhido é o de menor dispersão.
+    
+    Parameters
+    ----------
+    x_coords : numpy.ndarray
+        Coordenadas x dos pontos.
+    y_coords : numpy.ndarray
+        Coordenadas y dos pontos.
+    center_of_mass : tuple
+        Tupla (x_center, y_center) com as coordenadas do centro de massa.
+    principal_axes : numpy.ndarray
+        Matriz 2x2 cujas colunas são os eixos principais normalizados.
+    
+    Returns
+    -------
+    tuple
+        (axis_index, projection_values, extents) onde `axis_index` é o índice da coluna
+        escolhida em `principal_axes`, `projection_values` é a projeção escalar de cada ponto
+        sobre esse eixo (chave de ordenação) e `extents` é o array com a amplitude da projeção
+        em cada eixo.
+    
+    Examples
+    --------
+    >>> x = np.array([0., 1., 2.])
+    >>> y = np.array([0., 0., 1.])
+    >>> axis_index, values, extents = select_projection_axis(x, y, (1.0, 0.5), np.eye(2))
+    >>> axis_index, extents
+    (1, array([2., 1.]))
+    """
+    # Projeções escalares sobre os dois eixos: (n, 2)
+    offsets = np.column_stack([x_coords - center_of_mass[0], y_coords - center_of_mass[1]])
+    scalar_projections = offsets @ principal_axes
+    
+    extents = scalar_projections.max(axis=0) - scalar_projections.min(axis=0)
+    axis_index = 0 if extents[0] <= extents[1] else 1
+    
+    return axis_index, scalar_projections[:, axis_index], extents
+
+def _dict_to_flat(input_dict):
+    """
+    Converte um dicionário {(i, j): peso} em arrays planos sobre a caixa envolvente das coordenadas.
+    
+    Parameters
+    ----------
+    input_dict : dict
+        Dicionário com coordenadas como chaves e pesos como valores.
+    
+    Returns
+    -------
+    tuple
+        (keys, indices, flat_weights, shape, origin) onde `keys` é a lista de chaves na ordem
+        do dicionário, `indices` são os índices planos correspondentes, `flat_weights` é o mapa
+        de pesos achatado, `shape` é a forma da caixa envolvente e `origin` o seu canto inferior.
+    """
+    keys = list(input_dict.keys())
+    coords = np.array(keys, dtype=np.int64).reshape(-1, 2)
+    values = np.array(list(input_dict.values()))
+    
+    origin = coords.min(axis=0)
+    local = coords - origin
+    shape = (int(local[:, 0].max()) + 1, int(local[:, 1].max()) + 1)
+    indices = local[:, 0] * shape[1] + local[:, 1]
+    
+    flat_weights = np.zeros(shape[0] * shape[1], dtype=values.dtype)
+    flat_weights[indices] = values
+    
+    return keys, indices, flat_weights, shape, (int(origin[0]), int(origin[1]))
+
+def _indices_to_local(indices, shape):
+    """
+    Reescreve índices planos de uma grade na caixa envolvente mínima que os contém.
+    
+    Parameters
+    ----------
+    indices : numpy.ndarray
+        Índices planos (em ordem C, por exemplo linha * shape[1] + coluna) das células.
+    shape : tuple
+        Forma da grade original: (m, p) para mapas de pesos ou (nx, ny, nz) para malhas 3D.
+    
+    Returns
+    -------
+    tuple
+        (local, local_shape) com os índices planos na caixa envolvente e a forma dessa caixa.
+    """
+    coords = np.unravel_index(indices, shape)
+    lows = [axis_coords.min() for axis_coords in coords]
+    local_shape = tuple(int(axis_coords.max() - low) + 1 for axis_coords, low in zip(coords, lows))
+    local = np.ravel_multi_index([axis_coords - low for axis_coords, low in zip(coords, lows)], local_shape)
+    return local.astype(np.int64), local_shape
+
+def _neighbor_table(local, local_shape):
+    """
+    Monta a tabela de vizinhos de Von Neumann de um conjunto de células.
+    
+    Parameters
+    ----------
+    local : numpy.ndarray
+        Índices planos das células na caixa envolvente (ver `_indices_to_local`).
+    local_shape : tuple
+        Forma da caixa envolvente (2D ou 3D).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array (n, 2 * d), onde d é a dimensão da grade. Em 2D, a linha `p` contém as posições
+        (em `local`) dos vizinhos (i+1, j), (i-1, j), (i, j+1) e (i, j-1) da célula `p`; em 3D,
+        seguem-se (i, j, k+1) e (i, j, k-1) (vizinhança de 6 células). -1 indica que o vizinho
+        não pertence ao conjunto.
+    """
+    position = np.full(int(np.prod(local_shape)), -1, dtype=np.int64)
+    position[local] = np.arange(len(local))
+    coords = np.unravel_index(local, local_shape)
+    
+    table = np.full((len(local), 2 * len(local_shape)), -1, dtype=np.int64)
+    for axis, size in enumerate(local_shape):
+        stride = int(np.prod(local_shape[axis + 1:]))
+        has = coords[axis] + 1 < size
+        table[has, 2 * axis] = position[local[has] + stride]
+        has = coords[axis] > 0
+        table[has, 2 * axis + 1] = position[local[has] - stride]
+    
+    return table
+
+def _select_connected_cut(neighbors, prefix_weights, target_weight1, total_weight):
+    """
+    Escolhe o ponto de corte conectado mais próximo do peso alvo em uma lista ordenada de posições.
+    
+    A conectividade de todos os prefixos e sufixos é obtida com duas chamadas vetorizadas a
+    `conn.prefix_connectivity` (uma a partir de cada extremidade). Os cortes são então avaliados do mais próximo ao mais
+    distante do peso alvo, parando no primeiro corte em que os dois lados são conectados.
+    Empates são resolvidos pelo menor índice de corte. Com o backend compilado, a varredura é
+    linear (`nucleos_compilados.select_cut`), sem ordenar os cortes.
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 4) das posições, na ordem da projeção.
+    prefix_weights : numpy.ndarray
+        Soma acumulada dos pesos na ordem da projeção.
+    target_weight1 : float
+        Peso alvo do primeiro subconjunto.
+    total_weight : float
+        Peso total do conjunto.
+    
+    Returns
+    -------
+    int
+        Índice de corte `c` (o primeiro subconjunto é [0, c)), ou 0 se nenhum corte conectado existir.
+    """
+    n = len(neighbors)
+    if n < 2:
+        return 0
+    
+    prefix_connected = conn.prefix_connectivity(neighbors)
+    reversed_neighbors = np.where(neighbors >= 0, n - 1 - neighbors, -1)[::-1]
+    suffix_connected = conn.prefix_connectivity(reversed_neighbors)[::-1]
+    
+    with instr.phase('cut_sweep'):
+        # Cortes c = 1, ..., n - 1
+        valid = prefix_connected[1:n] & suffix_connected[1:n]
+        if nc.use_compiled():
+            cut, evaluated = nc.select_cut(valid, np.asarray(prefix_weights, dtype=float), target_weight1,
+                                           total_weight)
+            instr.count('cuts_evaluated', int(evaluated))
+            return int(cut)
+        imbalance = np.abs(prefix_weights[:n - 1] - target_weight1)
+        if total_weight > 0:
+            imbalance = imbalance / total_weight
+        
+        # Avalia os cortes do mais próximo ao mais distante do alvo
+        candidates = np.argsort(imbalance, kind='stable')
+        connected_candidates = valid[candidates]
+        if not connected_candidates.any():
+            instr.count('cuts_evaluated', n - 1)
+            return 0
+        
+        first_connected = int(np.argmax(connected_candidates))
+        instr.count('cuts_evaluated', first_connected + 1)
+        return int(candidates[first_connected]) + 1
+
 def find_best_projection_and_division_balanced(input_dict, n1, n2):
     """
-    Finds the best projection for dividing a set into two balanced, connected subsets.
+    Finds the best projection for dividing a set into two balanced, connected subsets.
+    
+    Adaptador sobre `find_best_projection_and_division_indices`: converte o dicionário
+    em índices planos, executa a bisseção sobre arrays e reconstrói os dicionários.
+    
+    Parameters
+    ----------
+    input_dict : dict
+        Dictionary with coordinates as keys and weights as values.
+    n1 : int
+        Target number of elements in the first subset.
+    n2 : int
+        Target number of elements in the second subset.
+    
+    Returns
+    -------
+    tuple
+        (first_subset, second_subset) both are dictionaries.
+    """
+    keys, indices, flat_weights, shape, origin = _dict_to_flat(input_dict)
+    first_indices, second_indices = find_best_projection_and_division_indices(
+        flat_weights, shape, indices, n1, n2, origin
+    )
+    return _indices_to_subset(first_indices, keys, indices, input_dict), \
+        _indices_to_subset(second_indices, keys, indices, input_dict)
+
+def _indices_to_subset(subset_indices, keys, indices, input_dict):
+    """
+    Reconstrói o subdicionário correspondente a um array de índices planos.
+    
+    Parameters
+    ----------
+    subset_indices : numpy.ndarray
+        Índices planos do subconjunto, na ordem desejada para as chaves.
+    keys : list
+        Chaves do dicionário original.
+    indices : numpy.ndarray
+        Índices planos de cada chave em `keys`.
+    input_dict : dict
+        Dicionário original com os pesos.
+    
+    Returns
+    -------
+    dict
+        Subdicionário {(i, j): peso} com as chaves na ordem de `subset_indices`.
+    """
+    lookup = dict(zip(indices.tolist(), range(len(keys))))
+    subset = {}
+    for index in subset_indices.tolist():
+        key = keys[lookup[index]]
+        subset[key] = input_dict[key]
+    return subset
+
+def _projection_order(flat_weights, shape, indices, origin=(0, 0), axis=None):
+    """
+    Ordena um conjunto de células (2D ou 3D) ao longo do eixo principal de projeção.
+    
+    Núcleo comum das bisseções inerciais e da multissecção: calcula a matriz de inércia das
+    células, escolhe entre os eixos principais o de menor amplitude das projeções e ordena as
+    células ao longo dele.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D ou malha 3D achatados.
+    shape : tuple
+        Forma (m, p) do mapa de pesos ou (nx, ny, nz) da malha.
+    indices : numpy.ndarray
+        Índices planos das células (pelo menos duas).
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0 (apenas em 2D).
+    axis : array-like, optional
+        Eixo de projeção a reutilizar. Se fornecido, a matriz de inércia não é calculada.
+    
+    Returns
+    -------
+    tuple
+        (sorted_indices, prefix_weights, axis) com os índices na ordem da projeção, a soma
+        acumulada dos seus pesos (em ponto flutuante) e o eixo usado.
+    """
+    if len(shape) == 2:
+        rows, cols = np.divmod(indices, shape[1])
+        
+        if axis is None:
+            weights = flat_weights[indices]
+            points = np.column_stack([rows + origin[0], cols + origin[1], weights])
+            
+            # Calculate inertia matrix and center of mass
+            inertia_matrix, center_of_mass = m3d.compute_inertia_matrix_from_points(points)
+            
+            # Calculate principal moments and principal axes
+            principal_moments, principal_axes = m3d.calculate_principal_moments(inertia_matrix)
+            
+            with instr.phase('axis_selection'):
+                # Normalize eigenvectors
+                principal_axes = normalize_vectors(principal_axes)
+                
+                # Choose the projection axis with less dispersion
+                axis_index, projection_values, extents = select_projection_axis(
+                    points[:, 0], points[:, 1], center_of_mass, principal_axes
+                )
+                axis = principal_axes[:, axis_index]
+        else:
+            # Eixo reaproveitado: a ordenação não depende do centro de massa
+            axis = np.asarray(axis, dtype=float)
+            projection_values = (rows + origin[0]) * axis[0] + (cols + origin[1]) * axis[1]
+        kind = None
+    else:
+        coords = np.unravel_index(indices, shape)
+        
+        def project(direction):
+            return coords[0] * direction[0] + coords[1] * direction[1] + coords[2] * direction[2]
+        
+        if axis is None:
+            inertia_matrix, center_of_mass = m3d.compute_inertia_matrix_3d(flat_weights.reshape(shape), indices)
+            principal_moments, principal_axes = m3d.calculate_principal_moments(inertia_matrix)
+            principal_axes = normalize_vectors(np.real(principal_axes))
+            
+            # Choose the projection axis with less dispersion
+            with instr.phase('axis_selection'):
+                projections = [project(principal_axes[:, column]) for column in range(3)]
+                axis_index = int(np.argmin([np.ptp(projection) for projection in projections]))
+                axis, projection_values = principal_axes[:, axis_index], projections[axis_index]
+                del projections
+        else:
+            axis = np.asarray(axis, dtype=float)
+            projection_values = project(axis)
+        kind = 'stable'
+    
+    with instr.phase('sort'):
+        # Sort points by projection value
+        sorted_indices = indices[np.argsort(projection_values, kind=kind)]
+        del projection_values
+        prefix_weights = np.cumsum(flat_weights[sorted_indices], dtype=float)
+    
+    return sorted_indices, prefix_weights, axis
+
+def find_best_projection_and_division_indices(flat_weights, shape, indices, n1, n2, origin=(0, 0), axis=None):
+    """
+    Divide um conjunto de células, dado por índices planos, em dois subconjuntos conectados e balanceados.
+    
+    Núcleo da bisseção inercial: calcula a matriz de inércia das células, escolhe o eixo principal
+    de projeção, ordena as células ao longo dele e procura o ponto de corte conectado cujo peso
+    mais se aproxima do alvo n1 / (n1 + n2). Se nenhum corte conectado existir, recorre ao
+    crescimento de região.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado (por exemplo, `weights.ravel()`).
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n1 : int
+        Número de subdomínios alvo do primeiro subconjunto.
+    n2 : int
+        Número de subdomínios alvo do segundo subconjunto.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0, usadas no cálculo da inércia.
+        Valor padrão é (0, 0).
+    axis : array-like, optional
+        Eixo de projeção [a, b] a reutilizar (por exemplo, de uma partição anterior). Se
+        fornecido, a matriz de inércia e os eixos principais não são calculados.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices) com os índices planos de cada subconjunto,
+        na ordem da projeção.
+    """
+    first_indices, second_indices, _ = _bisect_indices(flat_weights, shape, indices, n1, n2, origin, axis)
+    return first_indices, second_indices
+
+def _bisect_indices(flat_weights, shape, indices, n1, n2, origin=(0, 0), axis=None):
+    """
+    Implementação de `find_best_projection_and_division_indices` que também devolve o eixo usado.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices, axis) onde `axis` é o eixo de projeção escolhido
+        (None se o conjunto tiver menos de duas células).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) < 2:
+        return indices, indices[:0], None
+    
+    sorted_indices, prefix_weights, axis = _projection_order(flat_weights, shape, indices, origin, axis)
+    
+    # Calculate total weight
+    total_weight = flat_weights[sorted_indices].sum()
+    target_weight1 = (total_weight * n1) / (n1 + n2)
+    
+    with instr.phase('neighbors'):
+        # As posições na lista ordenada definem os subconjuntos: [0, cut) e [cut, n)
+        local, local_shape = _indices_to_local(sorted_indices, shape)
+        neighbors = _neighbor_table(local, local_shape)
+    
+    # Find the balanced cut that keeps both subsets connected
+    best_cut = _select_connected_cut(neighbors, prefix_weights, target_weight1, total_weight)
+    
+    # If we couldn't find connected subsets with the direct approach, use region growing
+    if best_cut == 0:
+        instr.count('fallback')
+        first_indices, second_indices = region_growing_partition_indices(
+            flat_weights, shape, sorted_indices, n1, n2
+        )
+        return first_indices, second_indices, axis
+    
+    return sorted_indices[:best_cut], sorted_indices[best_cut:], axis
+
+# Número de células a partir do qual o motor multinível deixa de engrossar a grade
+MULTILEVEL_COARSE_CELLS = 4096
+
+def _repair_sides(neighbors, side):
+    """
+    Torna os dois lados de uma bisseção conectados, movendo os componentes menores para o outro lado.
+    
+    Um componente que não é o maior do seu lado só tem vizinhos no outro lado; ao ser
+    transferido, ele passa a fazer parte do componente vizinho.
+    
+    Parameters
+    ----------
+    neighbors : numpy.ndarray
+        Tabela de vizinhos (n, 4) das células.
+    side : numpy.ndarray
+        Array `int8` com o lado (0 ou 1) de cada célula; é alterado no lugar.
+    
+    Returns
+    -------
+    bool
+        True se, ao final, os dois lados são não vazios e conectados.
+    """
+    for current in (0, 1):
+        labels = conn.label_cell_components(neighbors, side)
+        members = side == current
+        if not members.any():
+            return False
+        sizes = np.bincount(labels[members], minlength=len(side))
+        minor = members & (labels != np.argmax(sizes))
+        side[minor] = 1 - current
+    
+    if not minor.any():
+        # Nada foi movido na segunda passagem: o primeiro lado continua conectado
+        return True
+    labels = conn.label_cell_components(neighbors, side)
+    for current in (0, 1):
+        roots = labels[side == current]
+        if len(roots) == 0 or (roots != roots[0]).any():
+            return False
+    return True
+
+def find_best_multilevel_division_indices(flat_weights, shape, indices, n1, n2, origin=(0, 0), axis=None,
+                                          coarse_cells=None):
+    """
+    Bisseção multinível: engrossa a grade, divide a grade grossa e refina o corte nível a nível.
+    
+    A grade é engrossada agregando blocos 2x2 de células (somando os pesos) até restarem no
+    máximo `coarse_cells` células. A grade mais grossa é dividida pela bisseção inercial
+    (`find_best_projection_and_division_indices`) e o lado de cada célula é projetado de volta,
+    nível a nível. Em cada nível, apenas as células dos blocos da fronteira do corte são
+    redistribuídas, por um limiar ao longo do eixo de projeção que aproxima o peso alvo;
+    componentes desconectados criados pelo refinamento são devolvidos ao outro lado.
+    Conjuntos com até `coarse_cells` células são divididos diretamente pela bisseção inercial.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n1 : int
+        Número de subdomínios alvo do primeiro subconjunto.
+    n2 : int
+        Número de subdomínios alvo do segundo subconjunto.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0. Valor padrão é (0, 0).
+    axis : array-like, optional
+        Eixo de projeção [a, b] a reutilizar na grade mais grossa.
+    coarse_cells : int, optional
+        Número máximo de células da grade mais grossa. Se None, usa `MULTILEVEL_COARSE_CELLS`.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices) com os índices planos de cada subconjunto,
+        na ordem da projeção.
+    """
+    first_indices, second_indices, _ = _multilevel_bisect_indices(
+        flat_weights, shape, indices, n1, n2, origin, axis, coarse_cells
+    )
+    return first_indices, second_indices
+
+@instr.timed('multilevel')
+def _multilevel_bisect_indices(flat_weights, shape, indices, n1, n2, origin=(0, 0), axis=None,
+                               coarse_cells=None):
+    """
+    Implementação de `find_best_multilevel_division_indices` que também devolve o eixo usado.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices, axis).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if coarse_cells is None:
+        coarse_cells = MULTILEVEL_COARSE_CELLS
+    if len(indices) <= coarse_cells:
+        return _bisect_indices(flat_weights, shape, indices, n1, n2, origin, axis)
+    
+    # Hierarquia de grades sobre a caixa envolvente: cada nível agrega blocos 2x2 do anterior
+    # As células são mantidas em ordem de linha em todos os níveis
+    indices = np.sort(indices)
+    local, local_shape = _indices_to_local(indices, shape)
+    levels = [(local, local_shape, flat_weights[indices].astype(float))]
+    parents = []
+    while len(levels[-1][0]) > coarse_cells:
+        level_local, level_shape, level_weights = levels[-1]
+        rows, cols = np.divmod(level_local, level_shape[1])
+        coarse_shape = ((level_shape[0] + 1) // 2, (level_shape[1] + 1) // 2)
+        coarse_local, parent = np.unique((rows // 2) * coarse_shape[1] + cols // 2, return_inverse=True)
+        levels.append((coarse_local, coarse_shape, np.bincount(parent, weights=level_weights)))
+        parents.append(parent)
+    
+    # Bisseção inercial da grade mais grossa (os eixos não dependem da escala das coordenadas)
+    coarse_local, coarse_shape, coarse_weights = levels[-1]
+    coarse_grid = np.zeros(coarse_shape[0] * coarse_shape[1])
+    coarse_grid[coarse_local] = coarse_weights
+    first_coarse, _, axis = _bisect_indices(coarse_grid, coarse_shape, coarse_local, n1, n2, axis=axis)
+    
+    side = np.ones(len(coarse_local), dtype=np.int8)
+    side[np.searchsorted(coarse_local, first_coarse)] = 0
+    target = coarse_weights.sum() * n1 / (n1 + n2)
+    
+    for level in range(len(parents) - 1, -1, -1):
+        # Blocos na fronteira do corte no nível grosso
+        coarse_local, coarse_shape, _ = levels[level + 1]
+        coarse_neighbors = _neighbor_table(coarse_local, coarse_shape)
+        neighbor_side = np.where(coarse_neighbors >= 0, side[coarse_neighbors], side[:, None])
+        coarse_boundary = (neighbor_side != side[:, None]).any(axis=1)
+        
+        # Projeção para o nível fino
+        parent = parents[level]
+        level_local, level_shape, level_weights = levels[level]
+        side = side[parent]
+        band = np.flatnonzero(coarse_boundary[parent])
+        
+        # Redistribui as células da faixa por um limiar ao longo do eixo de projeção
+        rows, cols = np.divmod(level_local, level_shape[1])
+        projection = rows * axis[0] + cols * axis[1]
+        if projection[side == 0].mean() > projection[side == 1].mean():
+            projection = -projection
+        band = band[np.argsort(projection[band], kind='stable')]
+        fixed_weight = level_weights[side == 0].sum() - level_weights[band][side[band] == 0].sum()
+        prefix_weights = fixed_weight + np.concatenate([[0.0], np.cumsum(level_weights[band])])
+        best = int(np.argmin(np.abs(prefix_weights - target)))
+        refined = side.copy()
+        refined[band[:best]] = 0
+        refined[band[best:]] = 1
+        
+        # Mantém o refinamento apenas se, após o reparo da conectividade, ele melhora o balanceamento
+        # (um limiar reto pode desconectar cortes curvos, vindos do crescimento de região)
+        neighbors = _neighbor_table(level_local, level_shape)
+        candidates = [candidate for candidate in (refined, side) if _repair_sides(neighbors, candidate)]
+        if not candidates:
+            # O conjunto não admite a projeção multinível (por exemplo, é desconectado)
+            return _bisect_indices(flat_weights, shape, indices, n1, n2, origin, axis)
+        side = min(candidates, key=lambda candidate: abs(level_weights[candidate == 0].sum() - target))
+    
+    rows, cols = np.divmod(indices, shape[1])
+    sorted_positions = np.argsort((rows + origin[0]) * axis[0] + (cols + origin[1]) * axis[1], kind='stable')
+    sorted_indices = indices[sorted_positions]
+    sorted_side = side[sorted_positions]
+    return sorted_indices[sorted_side == 0], sorted_indices[sorted_side == 1], axis
+
+def _simple_cell_table():
+    """
+    Tabela dos 256 arranjos da vizinhança-8 de uma célula, indicando se ela pode deixar o seu lado.
+    
+    O bit `k` do arranjo indica se o k-ésimo vizinho do anel (em sentido horário a partir de
+    (i-1, j-1)) está do mesmo lado. A célula pode ser removida sem desconectar o seu lado se
+    tiver ao menos um vizinho-4 do mesmo lado e todos esses vizinhos forem ligados entre si
+    por células do anel: qualquer caminho que passava pela célula pode então contorná-la.
+    """
+    ring = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+    table = []
+    for bits in range(256):
+        members = {ring[k] for k in range(8) if bits >> k & 1}
+        edge_members = [cell for cell in members if abs(cell[0]) + abs(cell[1]) == 1]
+        if not edge_members:
+            table.append(False)
+            continue
+        visited, stack = {edge_members[0]}, [edge_members[0]]
+        while stack:
+            i, j = stack.pop()
+            for neighbor in [(i+1, j), (i-1, j), (i, j+1), (i, j-1)]:
+                if neighbor in members and neighbor not in visited:
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+        table.append(all(cell in visited for cell in edge_members))
+    return table
+
+_SIMPLE_CELL_TABLE = _simple_cell_table()
+
+@instr.timed('fm_refine')
+def fm_refine_bisection_indices(flat_weights, shape, first_indices, second_indices, n1=1, n2=1, tolerance=0.02,
+                                max_passes=4):
+    """
+    Refina uma bisseção pelo método de Fiduccia–Mattheyses para reduzir o número de arestas cortadas.
+    
+    O corte geométrico balanceia o peso, mas ignora o número de pares de células vizinhas em
+    lados diferentes (que determina o volume de troca de halo). Cada passagem move células da
+    fronteira, uma de cada vez, escolhendo a de maior ganho (redução do corte) em baldes
+    indexados pelo ganho, que em uma grade de Von Neumann varia de -4 a 4. Cada balde é um heap
+    ordenado pelo peso: se a célula mais leve não cabe na folga de balanceamento do seu lado, o
+    balde inteiro é pulado, e as células recusadas não são examinadas de novo, de modo que uma
+    passagem custa tempo proporcional à fronteira. Cada célula é movida no máximo uma vez por
+    passagem e a passagem tem no máximo tantos movimentos quanto células na fronteira do seu
+    início; ao final, os movimentos posteriores ao melhor estado encontrado (menor excesso de
+    desvio além da tolerância e, depois, menor corte) são desfeitos.
+    
+    Um movimento só é aceito se mantiver o peso do primeiro subconjunto a até `tolerance` do
+    peso total em relação ao alvo (ou dentro do desvio no início da passagem, se este for maior)
+    e se a célula puder deixar o seu lado sem desconectá-lo (ver `_simple_cell_table`). Como a
+    célula movida é vizinha do outro lado, a conectividade dos dois subconjuntos é preservada.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    first_indices, second_indices : numpy.ndarray
+        Índices planos dos dois subconjuntos da bisseção.
+    n1, n2 : int, optional
+        Número de subdomínios alvo de cada subconjunto. Valor padrão é 1.
+    tolerance : float, optional
+        Desvio relativo máximo do peso do primeiro subconjunto. Valor padrão é 0.02.
+    max_passes : int, optional
+        Número máximo de passagens com o desvio dentro da tolerância. Valor padrão é 4. Enquanto
+        o desvio exceder a tolerância (um corte inicial desequilibrado), as passagens continuam
+        enquanto houver progresso; se o progresso parar antes, o relatório indica 'balanced' False.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices, report) onde `report` é um dicionário com o corte
+        antes ('cut_before') e depois ('cut_after') do refinamento, o número de células que
+        trocaram de lado ('moves'), o número de passagens executadas ('passes'), o desvio final
+        do peso do primeiro subconjunto em relação ao alvo, relativo ao peso total ('deviation'),
+        e se esse desvio ficou dentro de `tolerance` ('balanced'). Um corte inicial muito
+        desequilibrado pode não ser corrigido (por exemplo, quando um gargalo estreito limita os
+        movimentos); nesse caso, 'balanced' é False.
+    """
+    first_indices = np.asarray(first_indices, dtype=np.int64)
+    second_indices = np.asarray(second_indices, dtype=np.int64)
+    indices = np.concatenate([first_indices, second_indices])
+    if len(first_indices) == 0 or len(second_indices) == 0:
+        total_weight = float(flat_weights[indices].sum())
+        deviation = abs(float(flat_weights[first_indices].sum()) - total_weight * n1 / (n1 + n2))
+        deviation = deviation / total_weight if total_weight > 0 else 0.0
+        return first_indices, second_indices, {'cut_before': 0, 'cut_after': 0, 'moves': 0, 'passes': 0,
+                                               'deviation': deviation, 'balanced': deviation <= tolerance * (1 + 1e-9)}
+    
+    # Grade da caixa envolvente com uma borda de células vazias (-1), em listas para acesso rápido
+    local, local_shape = _indices_to_local(indices, shape)
+    rows, cols = np.divmod(local, local_shape[1])
+    stride = local_shape[1] + 2
+    padded = (rows + 1) * stride + (cols + 1)
+    side_grid = np.full((local_shape[0] + 2) * stride, -1, dtype=np.int8)
+    side_grid[padded] = np.repeat([0, 1], [len(first_indices), len(second_indices)])
+    weight_grid = np.zeros(len(side_grid))
+    weight_grid[padded] = flat_weights[indices]
+    
+    # Corte inicial: pares de vizinhos (i+1, j) e (i, j+1) em lados diferentes
+    cut_before = 0
+    for step in (stride, 1):
+        here, there = side_grid[:-step], side_grid[step:]
+        cut_before += int(np.count_nonzero((here >= 0) & (there >= 0) & (here != there)))
+    
+    side = side_grid.tolist()
+    weight = weight_grid.tolist()
+    steps = (stride, -stride, 1, -1)
+    ring = (-stride - 1, -stride, -stride + 1, 1, stride + 1, stride, stride - 1, -1)
+    
+    total_weight = float(weight_grid.sum())
+    target = total_weight * n1 / (n1 + n2)
+    first_weight = float(weight_grid[padded[:len(first_indices)]].sum())
+    slack = tolerance * total_weight
+    
+    def gain(position):
+        """Redução do corte ao mover a célula para o outro lado (None se não estiver na fronteira)."""
+        own, other = 0, 0
+        for step in steps:
+            neighbor_side = side[position + step]
+            if neighbor_side == side[position]:
+                own += 1
+            elif neighbor_side >= 0:
+                other += 1
+        return other - own if other else None
+    
+    cut = cut_before
+    passes = 0
+    for passes in itertools.count(1):
+        # O desvio admitido nunca cresce: a folga ou o desvio no início da passagem, se maior
+        limit = max(slack, abs(first_weight - target))
+        
+        # Baldes de ganho por lado: buckets[lado][ganho + 4] é um heap (peso, inserção, posição) com
+        # remoção preguiçosa; uma entrada só vale se for a última inserção da célula ainda nos baldes
+        buckets = ([[] for _ in range(9)], [[] for _ in range(9)])
+        bucket_of = {}
+        stamp = {}
+        insertions = itertools.count()
+        locked = set()
+        
+        def insert(position):
+            position_gain = gain(position)
+            if position_gain is not None:
+                stamp[position] = next(insertions)
+                heapq.heappush(buckets[side[position]][position_gain + 4],
+                               (weight[position], stamp[position], position))
+                bucket_of[position] = position_gain
+        
+        def discard(position):
+            bucket_of.pop(position, None)
+        
+        # Fronteira do estado atual: na primeira passagem, a partir da grade; nas seguintes, a
+        # fronteira anterior mais as células movidas e seus vizinhos, em tempo proporcional a ela
+        if passes == 1:
+            boundary = padded[np.any([(side_grid[padded + step] >= 0) &
+                                      (side_grid[padded + step] != side_grid[padded])
+                                      for step in steps], axis=0)].tolist()
+        else:
+            candidates = set(boundary)
+            for position in moves[:best_length]:
+                candidates.add(position)
+                candidates.update(position + step for step in steps)
+            boundary = [position for position in candidates if side[position] >= 0 and gain(position) is not None]
+        for position in boundary:
+            insert(position)
+        
+        def select():
+            """Célula de maior ganho cujo movimento respeita o balanceamento e a conectividade."""
+            for bucket_index in range(8, -1, -1):
+                for own_side in (0, 1):
+                    bucket = buckets[own_side][bucket_index]
+                    # Folga do lado: como o heap está ordenado por peso, se a célula mais leve não
+                    # cabe, nenhuma outra do balde cabe e o balde é pulado sem ser percorrido
+                    room = (first_weight - target if own_side == 0 else target - first_weight) + limit
+                    while bucket:
+                        cell_weight, cell_stamp, position = bucket[0]
+                        if (bucket_of.get(position) != bucket_index - 4 or stamp[position] != cell_stamp
+                                or side[position] != own_side):
+                            heapq.heappop(bucket)
+                            continue
+                        if cell_weight > room:
+                            break
+                        bits = 0
+                        for bit, step in enumerate(ring):
+                            if side[position + step] == own_side:
+                                bits |= 1 << bit
+                        if _SIMPLE_CELL_TABLE[bits]:
+                            return position
+                        # Volta aos baldes quando algum vizinho do anel mudar de lado
+                        heapq.heappop(bucket)
+                        discard(position)
+            return None
+        
+        moves = []
+        # Estados comparados pelo excesso de desvio além da folga e depois pelo corte: um corte
+        # inicial fora da tolerância é primeiro reequilibrado
+        best_excess = max(0.0, abs(first_weight - target) - slack)
+        best_cut, best_deviation, best_length = cut, abs(first_weight - target), 0
+        while len(moves) < len(boundary):
+            position = select()
+            if position is None:
+                break
+            cut -= bucket_of[position]
+            discard(position)
+            first_weight += -weight[position] if side[position] == 0 else weight[position]
+            side[position] = 1 - side[position]
+            locked.add(position)
+            moves.append(position)
+            
+            deviation = abs(first_weight - target)
+            excess = max(0.0, deviation - slack)
+            if (excess, cut, deviation) < (best_excess, best_cut, best_deviation):
+                best_excess, best_cut, best_deviation, best_length = excess, cut, deviation, len(moves)
+            
+            for step in ring:
+                neighbor = position + step
+                if side[neighbor] >= 0 and neighbor not in locked:
+                    discard(neighbor)
+                    insert(neighbor)
+        
+        # Desfaz os movimentos posteriores ao melhor corte da passagem
+        for position in reversed(moves[best_length:]):
+            first_weight += -weight[position] if side[position] == 0 else weight[position]
+            side[position] = 1 - side[position]
+        cut = best_cut
+        if best_length == 0 or (passes >= max_passes and best_excess == 0):
+            break
+    
+    final_side = np.array(side, dtype=np.int8)[padded]
+    deviation = abs(first_weight - target) / total_weight if total_weight > 0 else 0.0
+    report = {
+        'cut_before': cut_before,
+        'cut_after': cut,
+        'moves': int(np.count_nonzero(final_side[:len(first_indices)]) +
+                     np.count_nonzero(final_side[len(first_indices):] == 0)),
+        'passes': passes,
+        'deviation': deviation,
+        'balanced': abs(first_weight - target) <= slack * (1 + 1e-9),
+    }
+    return indices[final_side == 0], indices[final_side == 1], report
+
+def _repair_grid_sides(side_grid):
+    """
+    Versão de `_repair_sides` sobre uma grade de lados (0, 1 ou -1 fora do conjunto), em 2D ou 3D.
+    
+    Returns
+    -------
+    bool
+        True se, ao final, os dois lados são não vazios e conectados.
+    """
+    for current in (0, 1):
+        components, n_components = conn.label_components(side_grid)
+        members = side_grid == current
+        if not members.any():
+            return False
+        sizes = np.bincount(components[members], minlength=n_components)
+        minor = members & (components != np.argmax(sizes))
+        side_grid[minor] = 1 - current
+    
+    if not minor.any():
+        return True
+    return conn.label_components(side_grid)[1] == 2
+
+# Tamanho máximo de um conjunto 3D para a busca exata do corte conectado (varredura de todos os cortes)
+CONNECTED_CUT_SWEEP_CELLS = 200000
+
+def find_best_projection_and_division_indices_3d(flat_weights, shape, indices, n1, n2, origin=(0, 0, 0), axis=None):
+    """
+    Divide um conjunto de células ativas de uma malha 3D em dois subconjuntos conectados e balanceados.
+    
+    Versão 3D de `find_best_projection_and_division_indices`: a matriz de inércia 3x3 das
+    células é calculada por `m3d.compute_inertia_matrix_3d`, o eixo principal de projeção é
+    escolhido pelo mesmo critério de `select_projection_axis` (menor amplitude das projeções)
+    e o corte é feito no ponto da ordenação cujo peso mais se aproxima do alvo n1 / (n1 + n2).
+    A conectividade dos dois lados (vizinhança de 6 células) é verificada sobre a grade da
+    caixa envolvente com `conn.label_components`. Se algum lado ficar desconectado, os seus
+    componentes menores são transferidos para o outro lado; em conjuntos com até
+    `CONNECTED_CUT_SWEEP_CELLS` células, o corte conectado mais balanceado da ordenação
+    (`_select_connected_cut`) é usado no lugar se ficar mais próximo do alvo. As operações sobre o conjunto todo
+    são vetorizadas sobre índices planos, o que permite dividir malhas com dezenas de milhões
+    de células.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Malha 3D achatada (por exemplo, `mesh.ravel()` de `create_3d_mesh` ou `refine_mesh`),
+        usada como peso de cada célula.
+    shape : tuple
+        Forma (nx, ny, nz) da malha.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n1 : int
+        Número de subdomínios alvo do primeiro subconjunto.
+    n2 : int
+        Número de subdomínios alvo do segundo subconjunto.
+    origin : tuple, optional
+        Mantido por compatibilidade com a assinatura 2D; a ordenação não depende da origem.
+    axis : array-like, optional
+        Eixo de projeção [a, b, c] a reutilizar. Se fornecido, a matriz de inércia não é calculada.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices) com os índices planos de cada subconjunto,
+        na ordem da projeção.
+    """
+    first_indices, second_indices, _ = _bisect_indices_3d(flat_weights, shape, indices, n1, n2, origin, axis)
+    return first_indices, second_indices
+
+def _bisect_indices_3d(flat_weights, shape, indices, n1, n2, origin=(0, 0, 0), axis=None):
+    """
+    Implementação de `find_best_projection_and_division_indices_3d` que também devolve o eixo usado.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices, axis).
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) < 2:
+        return indices, indices[:0], None
+    
+    sorted_indices, prefix_weights, axis = _projection_order(flat_weights, shape, indices, origin, axis)
+    
+    with instr.phase('cut_sweep'):
+        target_weight1 = prefix_weights[-1] * n1 / (n1 + n2)
+        best_cut = int(np.argmin(np.abs(prefix_weights[:-1] - target_weight1))) + 1
+        instr.count('cuts_evaluated', len(prefix_weights) - 1)
+    
+    # Lados sobre a grade da caixa envolvente: 0, 1 ou -1 fora do conjunto
+    local, local_shape = _indices_to_local(sorted_indices, shape)
+    side_grid = np.full(int(np.prod(local_shape)), -1, dtype=np.int8)
+    side_grid[local[:best_cut]] = 0
+    side_grid[local[best_cut:]] = 1
+    side_grid = side_grid.reshape(local_shape)
+    
+    if conn.label_components(side_grid)[1] != 2:
+        instr.count('fallback')
+        _repair_grid_sides(side_grid)
+        sides = side_grid.reshape(-1)[local]
+        repaired_weight = prefix_weights[-1] - flat_weights[sorted_indices[sides == 1]].sum()
+        
+        # Conjuntos pequenos: varredura exata do corte conectado mais balanceado
+        if len(indices) <= CONNECTED_CUT_SWEEP_CELLS:
+            connected_cut = _select_connected_cut(
+                _neighbor_table(local, local_shape), prefix_weights, target_weight1, prefix_weights[-1]
+            )
+            if connected_cut and (abs(prefix_weights[connected_cut - 1] - target_weight1) <
+                                  abs(repaired_weight - target_weight1)):
+                return sorted_indices[:connected_cut], sorted_indices[connected_cut:], axis
+    
+    sides = side_grid.reshape(-1)[local]
+    return sorted_indices[sides == 0], sorted_indices[sides == 1], axis
+
+# Motores de bisseção disponíveis para a recursão, por dimensão da grade
+_BISECTION_ENGINES = {
+    2: {
+        'inertial': _bisect_indices,
+        'multilevel': _multilevel_bisect_indices,
+    },
+    3: {
+        'inertial': _bisect_indices_3d,
+    },
+}
+
+def _bisection_engine(engine, ndim=2):
+    """Retorna a função de bisseção correspondente ao nome do motor e à dimensão da grade."""
+    engines = _BISECTION_ENGINES.get(ndim, {})
+    try:
+        return engines[engine]
+    except KeyError:
+        raise ValueError(f"Motor de bisseção desconhecido para grades {ndim}D: {engine!r}. "
+                         f"Opções: {', '.join(engines)}") from None
+
+def _level_tolerance(tolerance, n1, n2, depth=0):
+    """
+    Folga de balanceamento do refinamento FM em um nó, relativa ao peso do nó.
+    
+    Um desvio `d` do peso do nó no primeiro filho desbalanceia o menor filho por um fator
+    `1 + d * n / min(n1, n2)`, e esses fatores se multiplicam ao longo da recursão. A folga por
+    nível é `(1 + tolerance) ** (1 / L) - 1`, com `L = depth + ceil(log2(n1 + n2))` (limite do
+    número de níveis do caminho até as folhas, que não cresce ao descer), de modo que o
+    desbalanceamento composto das folhas (peso máximo / peso médio) fique dentro de `1 + tolerance`
+    quando todos os nós terminam dentro da folga. A folga é um alvo: um corte inicial muito
+    desequilibrado (por exemplo, atrás de um gargalo estreito) pode terminar fora dela, o que o
+    refinamento indica com 'balanced' False no relatório do nó.
+    """
+    n_subsets = n1 + n2
+    levels = depth + max(1, math.ceil(math.log2(n_subsets)))
+    return ((1 + tolerance) ** (1 / levels) - 1) * min(n1, n2) / n_subsets
+
+def _bisect_node(flat_weights, shape, indices, n1, n2, origin=(0, 0), axis=None, engine='inertial', refine=None,
+                 depth=0):
+    """
+    Uma bisseção da recursão: o motor escolhido seguido, opcionalmente, do refinamento FM.
+    
+    A tolerância `refine` é o alvo do desbalanceamento final das folhas; cada nó usa a folga
+    de `_level_tolerance` para a sua profundidade `depth`.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices, axis, report) onde `report` é o relatório de
+        `fm_refine_bisection_indices`, ou None se `refine` for None.
+    """
+    instr.count('bisections')
+    instr.count('cells', len(indices))
+    first_indices, second_indices, axis = _bisection_engine(engine, len(shape))(
+        flat_weights, shape, indices, n1, n2, origin, axis
+    )
+    report = None
+    if refine is not None:
+        if len(shape) != 2:
+            raise ValueError("O refinamento FM está disponível apenas para mapas de pesos 2D")
+        first_indices, second_indices, report = fm_refine_bisection_indices(
+            flat_weights, shape, first_indices, second_indices, n1, n2, _level_tolerance(refine, n1, n2, depth)
+        )
+    return first_indices, second_indices, axis, report
+
+def region_growing_partition(input_dict, n1, n2, sorted_coords):
+    """
+    Uses region growing to create connected, balanced partitions.
+    
+    Este algoritmo implementa uma técnica de "crescimento de região" para dividir um conjunto de pontos
+    em duas partições conectadas e balanceadas. O processo começa com duas "sementes" (pontos iniciais)
+    nas extremidades opostas e vai crescendo cada região de forma balanceada.
+    
+    Adaptador sobre `region_growing_partition_indices`.
+    
+    Parameters
+    ----------
+    input_dict : dict
+        Dictionary with coordinates as keys and weights as values.
+        Um dicionário onde as chaves são coordenadas (tuplas) e os valores são os pesos de cada ponto.
+    n1, n2 : int
+        Target sizes for the subsets.
+        Tamanhos alvo para cada subconjunto, usados para calcular as proporções desejadas.
+    sorted_coords : list
+        Coordinates sorted by projection value.
+        Lista de coordenadas ordenadas por algum valor de projeção (geralmente ordenadas ao longo
+        de algum eixo principal para maximizar a separação espacial).
+    
+    Returns
+    -------
+    tuple
+        (first_subset, second_subset) both are dictionaries.
+        Dois dicionários representando as partições resultantes, mantendo a estrutura do input_dict.
+    """
+    keys, indices, flat_weights, shape, origin = _dict_to_flat(input_dict)
+    lookup = dict(zip(keys, indices.tolist()))
+    sorted_indices = np.array([lookup[coord] for coord in sorted_coords], dtype=np.int64)
+    
+    first_indices, second_indices = region_growing_partition_indices(
+        flat_weights, shape, sorted_indices, n1, n2
+    )
+    return _indices_to_subset(first_indices, keys, indices, input_dict), \
+        _indices_to_subset(second_indices, keys, indices, input_dict)
+
+class _WeightFrontier:
+    """
+    Fronteira de uma região no crescimento de região, organizada pelo peso das células.
+    
+    As células da fronteira são agrupadas pelo posto do seu peso entre os pesos distintos do
+    conjunto. Uma árvore de Fenwick conta as células de cada posto, o que permite localizar em
+    O(log K) os postos não vazios imediatamente abaixo e acima de um valor. Dentro de cada
+    posto, um heap de posições devolve a célula de menor posição na ordem da projeção; células
+    já atribuídas são descartadas de forma preguiçosa ao consultar o heap.
+    
+    Parameters
+    ----------
+    n_ranks : int
+        Número de pesos distintos (postos).
+    """
+    
+    def __init__(self, n_ranks):
+        self.n_ranks = n_ranks
+        self.tree = [0] * (n_ranks + 1)
+        self.heaps = {}
+        self.size = 0
+        self.top_bit = 1 << (n_ranks.bit_length() - 1) if n_ranks else 0
+    
+    def _update(self, rank, delta):
+        i = rank + 1
+        while i <= self.n_ranks:
+            self.tree[i] += delta
+            i += i & -i
+    
+    def _prefix_count(self, rank):
+        """Número de células da fronteira com posto <= rank."""
+        count = 0
+        i = rank + 1
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        return count
+    
+    def _kth_rank(self, k):
+        """Menor posto cuja contagem acumulada atinge k (k >= 1)."""
+        position = 0
+        bit = self.top_bit
+        while bit:
+            candidate = position + bit
+            if candidate <= self.n_ranks and self.tree[candidate] < k:
+                position = candidate
+                k -= self.tree[candidate]
+            bit >>= 1
+        return position
+    
+    def add(self, position, rank):
+        heapq.heappush(self.heaps.setdefault(rank, []), position)
+        self._update(rank, 1)
+        self.size += 1
+    
+    def remove(self, rank):
+        """Remove da contagem uma célula do posto (a entrada no heap é descartada depois)."""
+        self._update(rank, -1)
+        self.size -= 1
+    
+    def nearest_ranks(self, limit_rank):
+        """
+        Postos não vazios mais próximos de `limit_rank`.
+        
+        Returns
+        -------
+        tuple
+            (below, above): o maior posto <= limit_rank e o menor posto > limit_rank
+            com células na fronteira, ou None quando não existem.
+        """
+        count = self._prefix_count(limit_rank) if limit_rank >= 0 else 0
+        below = self._kth_rank(count) if count > 0 else None
+        above = self._kth_rank(count + 1) if count < self.size else None
+        return below, above
+    
+    def first_position(self, rank, owner):
+        """Menor posição ainda não atribuída no posto."""
+        heap = self.heaps[rank]
+        while owner[heap[0]] >= 0:
+            heapq.heappop(heap)
+        return heap[0]
+
+@instr.timed('region_growing')
+def region_growing_partition_indices(flat_weights, shape, sorted_indices, n1, n2):
+    """
+    Crescimento de região sobre índices planos para criar duas partições conectadas e balanceadas.
+    
+    As sementes são a primeira e a última célula de `sorted_indices`. A cada passo, a região com
+    maior déficit de peso normalizado cresce, incorporando o vizinho não atribuído que mais
+    reduz o seu déficit, isto é, aquele cujo peso mais se aproxima do peso que ainda falta à
+    região (empates favorecem a menor posição na ordem da projeção). Células inalcançáveis a
+    partir das sementes são atribuídas ao final, com base apenas no déficit de peso.
+    
+    Cada região mantém a sua fronteira de forma incremental (ver `_WeightFrontier`) e os pesos
+    das regiões são acumulados a cada atribuição, de modo que o custo total é O(n log n). Com o
+    backend compilado (ver `nucleos_compilados`), o laço é executado por
+    `nucleos_compilados.region_growing`, com o mesmo resultado.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    sorted_indices : numpy.ndarray
+        Índices planos das células, ordenados pelo valor de projeção.
+    n1, n2 : int
+        Número de subdomínios alvo de cada subconjunto.
+    
+    Returns
+    -------
+    tuple
+        (first_indices, second_indices) com os índices planos de cada subconjunto.
+    """
+    sorted_indices = np.asarray(sorted_indices, dtype=np.int64)
+    n = len(sorted_indices)
+    if n < 2:
+        return sorted_indices, sorted_indices[:0]
+    
+    weights = flat_weights[sorted_indices].astype(float)
+    local, local_shape = _indices_to_local(sorted_indices, shape)
+    neighbors = _neighbor_table(local, local_shape)
+    
+    # Postos dos pesos distintos, usados para organizar as fronteiras
+    values, ranks = np.unique(weights, return_inverse=True)
+    
+    total_weight = weights.sum()
+    target_weight1 = (total_weight * n1) / (n1 + n2)
+    targets = (target_weight1, total_weight - target_weight1)
+    
+    if nc.use_compiled():
+        owner = nc.region_growing(weights, ranks.reshape(-1).astype(np.int64), values, neighbors, np.array(targets))
+        return sorted_indices[owner == 0], sorted_indices[owner == 1]
+    
+    neighbors = neighbors.tolist()
+    values = values.tolist()
+    ranks = ranks.tolist()
+    weight_list = weights.tolist()
+    
+    # Dono de cada posição: -1 não atribuída, 0 primeira região, 1 segunda região
+    owner = [-1] * n
+    region_weights = [0.0, 0.0]
+    frontiers = (_WeightFrontier(len(values)), _WeightFrontier(len(values)))
+    in_frontier = (bytearray(n), bytearray(n))
+    
+    def assign(position, region):
+        """Atribui a posição à região e atualiza pesos e fronteiras."""
+        owner[position] = region
+        region_weights[region] += weight_list[position]
+        for r in (0, 1):
+            if in_frontier[r][position]:
+                in_frontier[r][position] = 0
+                frontiers[r].remove(ranks[position])
+        for neighbor in neighbors[position]:
+            if neighbor >= 0 and owner[neighbor] < 0 and not in_frontier[region][neighbor]:
+                in_frontier[region][neighbor] = 1
+                frontiers[region].add(neighbor, ranks[neighbor])
+    
+    # Initialize with seeds at opposite ends
+    assign(0, 0)
+    assign(n - 1, 1)
+    n_assigned = 2
+    
+    # Grow regions until all points are assigned
+    while n_assigned < n:
+        # Nenhuma região tem vizinhos não atribuídos (regiões desconectadas no espaço)
+        if not frontiers[0].size and not frontiers[1].size:
+            break
+        
+        deficits = [(targets[r] - region_weights[r]) / targets[r] if targets[r] > 0 else 0
+                    for r in (0, 1)]
+        
+        if frontiers[0].size and (not frontiers[1].size or deficits[0] > deficits[1]):
+            region = 0
+        else:
+            region = 1
+        frontier = frontiers[region]
+        
+        # Vizinho cujo peso mais se aproxima do peso que falta à região
+        remaining = targets[region] - region_weights[region]
+        below, above = frontier.nearest_ranks(bisect.bisect_right(values, remaining) - 1)
+        if above is None:
+            best = frontier.first_position(below, owner)
+        elif below is None:
+            best = frontier.first_position(above, owner)
+        else:
+            gap_below = remaining - values[below]
+            gap_above = values[above] - remaining
+            if gap_below < gap_above:
+                best = frontier.first_position(below, owner)
+            elif gap_above < gap_below:
+                best = frontier.first_position(above, owner)
+            else:
+                best = min(frontier.first_position(below, owner), frontier.first_position(above, owner))
+        
+        assign(best, region)
+        n_assigned += 1
+    
+    # Handle remaining unassigned points based only on the weight deficit
+    owner = np.array(owner, dtype=np.int8)
+    for position in np.flatnonzero(owner < 0).tolist():
+        weight = weight_list[position]
+        if abs(region_weights[0] + weight - targets[0]) < abs(region_weights[0] - targets[0]):
+            owner[position] = 0
+            region_weights[0] += weight
+        else:
+            owner[position] = 1
+    
+    return sorted_indices[owner == 0], sorted_indices[owner == 1]
+
+def recursive_binary_subset_division_balanced(input_dict, n_subsets=2, current_depth=0, binary_prefix='',
+                                              workers=None, cache=None, engine='inertial', refine=None,
+                                              batched=False, multisection=False):
+    """
+    Recursively divides a set of weighted coordinates into balanced, connected subsets.
+    
+    Parameters
+    ----------
+    input_dict : dict
+        Dictionary of coordinates and weights.
+    n_subsets : int
+        Total number of desired subsets.
+    current_depth : int
+        Current recursion depth.
+    binary_prefix : str
+        Current binary prefix for subset identification.
+    workers : int, optional
+        Número de processos. Se maior que 1, a divisão é feita pela recursão paralela
+        sobre arrays (`PartitionState.partition`), com resultado idêntico ao serial.
+    cache : cache_particoes.PartitionCache, optional
+        Cache de partições. Se fornecido, a divisão é feita sobre arrays e servida do cache
+        quando o mesmo conteúdo já foi particionado.
+    engine : str, optional
+        Motor de bisseção: 'inertial' (padrão) ou 'multilevel' (ver
+        `find_best_multilevel_division_indices`), indicado para mapas muito grandes.
+    refine : float, optional
+        Se fornecido, cada bisseção é refinada por `fm_refine_bisection_indices` para reduzir
+        o corte, com alvo de desbalanceamento final `1 + refine` (por exemplo, 0.02); os nós
+        que terminam fora da folga têm 'balanced' False no relatório.
+    batched : bool, optional
+        Se True, todos os nós de cada nível são divididos de uma vez
+        (ver `level_synchronous_binary_subset_division_indices`).
+    multisection : bool or int, optional
+        Se verdadeiro, cada nó é dividido em várias fatias sobre uma única ordenação
+        (ver `multisection_subset_division_indices`).
+    
+    Returns
+    -------
+    dict
+        Dictionary of subsets identified by binary strings.
+    """
+    # Base case: if n_subsets=1 or empty dictionary
+    if n_subsets <= 1 or len(input_dict) <= 1:
+        return {binary_prefix: input_dict}
+    
+    if (cache is not None or (workers is not None and workers > 1) or engine != 'inertial' or refine is not None
+            or batched or multisection):
+        state = PartitionState.from_dict(input_dict)
+        if cache is not None:
+            cache.partition_state(state, n_subsets, workers=workers, engine=engine, refine=refine, batched=batched,
+                                  multisection=multisection)
+        else:
+            state.partition(n_subsets, workers=workers, engine=engine, refine=refine, batched=batched,
+                            multisection=multisection)
+        return {binary_prefix + prefix: subset for prefix, subset in state.to_dict().items()}
+    
+    # Calculate balanced numbers for each branch
+    n1 = n_subsets // 2
+    n2 = n_subsets - n1
+    
+    # Divide set into two balanced, connected subsets
+    first_subset, second_subset = find_best_projection_and_division_balanced(input_dict, n1, n2)
+    
+    # Recursive calls for each subset
+    result = {}
+    
+    if first_subset:
+        result.update(recursive_binary_subset_division_balanced(
+            first_subset, 
+            n1, 
+            current_depth + 1, 
+            binary_prefix + '0'
+        ))
+    
+    if second_subset:
+        result.update(recursive_binary_subset_division_balanced(
+            second_subset, 
+            n2, 
+            current_depth + 1, 
+            binary_prefix + '1'
+        ))
+    
+    return result
+
+def recursive_binary_subset_division_indices(flat_weights, shape, indices, n_subsets=2, current_depth=0,
+                                             binary_prefix='', origin=(0, 0), tree=None, warm_axes=None,
+                                             engine='inertial', refine=None, cut_report=None):
+    """
+    Divide recursivamente um conjunto de células, dado por índices planos, em subconjuntos balanceados e conectados.
+    
+    Versão sobre arrays de `recursive_binary_subset_division_balanced`: cada nível trabalha apenas
+    com arrays de índices, sem criar objetos Python por célula.
+    
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n_subsets : int
+        Número total de subconjuntos desejados.
+    current_depth : int
+        Profundidade atual da recursão.
+    binary_prefix : str
+        Prefixo binário atual para identificação do subconjunto.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0. Valor padrão é (0, 0).
+    tree : dict, optional
+        Se fornecido, recebe o eixo de projeção de cada nó interno, indexado pelo prefixo.
+    warm_axes : dict, optional
+        Eixos de projeção de uma partição anterior, indexados pelo prefixo. Os nós com
+        eixo conhecido reutilizam-no em vez de recalcular a matriz de inércia.
+    engine : str, optional
+        Motor de bisseção: 'inertial' (padrão) ou 'multilevel'.
+    refine : float, optional
+        Alvo de balanceamento das folhas para o refinamento FM após cada bisseção (dividido
+        entre os níveis por `_level_tolerance`). Se None, não há refinamento.
+    cut_report : dict, optional
+        Se fornecido, recebe o relatório do refinamento FM de cada nó interno, indexado pelo prefixo.
+    
+    Returns
+    -------
+    list
+        Lista de pares (prefixo binário, índices planos) com as folhas da recursão,
+        em ordem de prefixo.
+    """
+    _bisection_engine(engine, len(shape))
+    
+    # Base case: if n_subsets=1 or at most one cell
+    if n_subsets <= 1 or len(indices) <= 1:
+        return [(binary_prefix, indices)]
+    
+    # Calculate balanced numbers for each branch
+    n1 = n_subsets // 2
+    n2 = n_subsets - n1
+    
+    with instr.node(binary_prefix, len(indices)):
+        warm_axis = warm_axes.get(binary_prefix) if warm_axes else None
+        first_indices, second_indices, axis, report = _bisect_node(
+            flat_weights, shape, indices, n1, n2, origin, warm_axis, engine, refine, current_depth
+        )
+        if tree is not None:
+            tree[binary_prefix] = axis
+        if cut_report is not None and report is not None:
+            cut_report[binary_prefix] = report
+        
+        leaves = []
+        if len(first_indices):
+            leaves.extend(recursive_binary_subset_division_indices(
+                flat_weights, shape, first_indices, n1, current_depth + 1, binary_prefix + '0', origin,
+                tree, warm_axes, engine, refine, cut_report
+            ))
+        if len(second_indices):
+            leaves.extend(recursive_binary_subset_division_indices(
+                flat_weights, shape, second_indices, n2, current_depth + 1, binary_prefix + '1', origin,
+                tree, warm_axes, engine, refine, cut_report
+            ))
+    
+    return leaves
+
+def _multisection_levels(n_subsets, ndim):
+    """Níveis da árvore binária resolvidos por uma multissecção automática: cerca de n^(1/d) fatias."""
+    return max(1, round(math.log2(n_subsets) / ndim))
+
+def _multisection_nodes(prefix_weights, n_subsets, levels):
+    """
+    Cortes dos nós virtuais de uma multissecção sobre uma única ordenação.
+    
+    Os nós virtuais são os `levels` primeiros níveis da árvore binária do nó (n1 = n // 2 em
+    cada um). O corte de cada nó virtual fica na posição cujo peso acumulado mais se aproxima do
+    alvo absoluto total * (subdomínios à esquerda) / n_subsets.
+    
+    Parameters
+    ----------
+    prefix_weights : numpy.ndarray
+        Soma acumulada dos pesos na ordem da projeção.
+    n_subsets : int
+        Número de subdomínios do nó.
+    levels : int
+        Número de níveis da árvore binária resolvidos.
+    
+    Returns
+    -------
+    dict
+        {sufixo: (n_subsets, lo, hi, cut)} para cada nó virtual interno, onde [lo, hi) são as
+        posições do nó na ordenação e o primeiro filho é [lo, cut). `cut` é None se o nó tiver
+        menos de duas células.
+    """
+    total_weight = prefix_weights[-1]
+    nodes = {}
+    stack = [('', n_subsets, 0, 0, len(prefix_weights))]
+    while stack:
+        suffix, node_subsets, offset, lo, hi = stack.pop()
+        if node_subsets <= 1 or len(suffix) == levels:
+            continue
+        if hi - lo < 2:
+            nodes[suffix] = (node_subsets, lo, hi, None)
+            continue
+        
+        n1 = node_subsets // 2
+        target = total_weight * (offset + n1) / n_subsets
+        # prefix_weights[cut - 2] < alvo <= prefix_weights[cut - 1]; empates ficam com o menor corte
+        cut = int(np.searchsorted(prefix_weights, target)) + 1
+        if cut >= 2 and (cut > len(prefix_weights) or
+                         target - prefix_weights[cut - 2] <= prefix_weights[cut - 1] - target):
+            cut -= 1
+        cut = min(max(cut, lo + 1), hi - 1)
+        
+        nodes[suffix] = (node_subsets, lo, hi, cut)
+        stack.append((suffix + '1', node_subsets - n1, offset + n1, cut, hi))
+        stack.append((suffix + '0', n1, offset, lo, cut))
+    return nodes
+
+def _connected_multisection_nodes(sorted_indices, shape, nodes):
+    """
+    Sufixos dos nós virtuais de uma multissecção cujos dois lados são conectados.
+    
+    Os filhos de todos os nós virtuais de um mesmo nível são rotulados sobre a grade da caixa
+    envolvente, e os componentes de cada rótulo são contados com uma única chamada a
+    `conn.components_per_label` por nível.
+    """
+    local, local_shape = _indices_to_local(sorted_indices, shape)
+    grid = np.empty(int(np.prod(local_shape)), dtype=np.int64)
+    connected = set()
+    
+    for depth in sorted({len(suffix) for suffix in nodes}):
+        level = [(suffix, lo, hi, cut) for suffix, (_, lo, hi, cut) in nodes.items()
+                 if len(suffix) == depth and cut is not None]
+        if not level:
+            continue
+        grid.fill(-1)
+        for position, (_, lo, hi, cut) in enumerate(level):
+            grid[local[lo:cut]] = 2 * position
+            grid[local[cut:hi]] = 2 * position + 1
+        components = conn.components_per_label(grid.reshape(local_shape), n_labels=2 * len(level))
+        for position, (suffix, _, _, _) in enumerate(level):
+            if components[2 * position] == 1 and components[2 * position + 1] == 1:
+                connected.add(suffix)
+    return connected
+
+def multisection_subset_division_indices(flat_weights, shape, indices, n_subsets=2, current_depth=0,
+                                         binary_prefix='', origin=(0, 0), tree=None, warm_axes=None, levels=None):
+    """
+    Divide recursivamente um conjunto de células em subconjuntos balanceados e conectados por multissecção.
+    
+    Em cada nó, as células são ordenadas uma única vez ao longo do eixo principal (como na
+    bisseção inercial) e vários cortes são colocados sobre a mesma ordenação com a soma
+    acumulada dos pesos: os `levels` primeiros níveis da árvore binária do nó viram fatias
+    consecutivas da projeção. Os alvos são absolutos (o corte à direita dos s primeiros
+    subdomínios fica no peso total * s / n_subsets), de modo que o desbalanceamento das divisões
+    desiguais n1 / n2 não se acumula de um nível para o outro. Apenas as fatias com mais de um
+    subdomínio são divididas de novo, com nova inércia e ordenação, o que reduz a profundidade
+    da recursão (por exemplo, de 7 para 4 ordenações com 96 subdomínios em 2D).
+    
+    A conectividade dos dois lados de cada corte é verificada de uma vez por nível. Um corte com
+    um lado desconectado é substituído por uma bisseção inercial comum (`_bisect_node`, com o
+    eixo do nó), e a multissecção continua nos seus filhos.
+    
+    As folhas e o dicionário `tree` usam os mesmos prefixos binários de
+    `recursive_binary_subset_division_indices` (os nós internos de uma mesma multissecção
+    compartilham o eixo), o que mantém a compatibilidade com `PartitionState.repartition`.
     
     Parameters
     ----------
-    input_dict : dict
-        Dictionary with coordinates as keys and weights as values.
-    n1 : int
-        Target number of elements in the first subset.
-    n2 : int
-        Target number of elements in the second subset.
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D ou malha 3D achatados.
+    shape : tuple
+        Forma (m, p) do mapa de pesos ou (nx, ny, nz) da malha.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n_subsets : int
+        Número total de subconjuntos desejados.
+    current_depth : int
+        Profundidade atual da recursão.
+    binary_prefix : str
+        Prefixo binário atual para identificação do subconjunto.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0. Valor padrão é (0, 0).
+    tree : dict, optional
+        Se fornecido, recebe o eixo de projeção de cada nó interno, indexado pelo prefixo.
+    warm_axes : dict, optional
+        Eixos de projeção de uma partição anterior, indexados pelo prefixo, reutilizados nos
+        nós em que uma nova ordenação é feita.
+    levels : int, optional
+        Níveis da árvore binária resolvidos por cada ordenação (até 2**levels fatias). Se None,
+        escolhido em cada nó para gerar cerca de n_subsets^(1/d) fatias em uma grade de dimensão d,
+        o que mantém as fatias próximas de quadradas (ou cúbicas).
     
     Returns
     -------
-    tuple
-        (first_subset, second_subset) both are dictionaries.
+    list
+        Lista de pares (prefixo binário, índices planos) com as folhas da recursão,
+        em ordem de prefixo.
+    
+    Examples
+    --------
+    >>> leaves = multisection_subset_division_indices(weights.ravel(), weights.shape,
+    ...                                               np.flatnonzero(weights > 0), 24)
     """
-    # Convert dictionary to array
-    points = np.array([[coord[0], coord[1], weight] for coord, weight in input_dict.items()])
+    # Base case: if n_subsets=1 or at most one cell
+    if n_subsets <= 1 or len(indices) <= 1:
+        return [(binary_prefix, indices)]
+    
+    indices = np.asarray(indices, dtype=np.int64)
+    node_levels = levels or _multisection_levels(n_subsets, len(shape))
+    leaves = []
     
-    # Calculate inertia matrix and center of mass
-    inertia_matrix, center_of_mass = m3d.compute_inertia_matrix_from_points(points)
+    with instr.node(binary_prefix, len(indices)):
+        instr.count('multisections')
+        instr.count('cells', len(indices))
+        warm_axis = warm_axes.get(binary_prefix) if warm_axes else None
+        sorted_indices, prefix_weights, axis = _projection_order(flat_weights, shape, indices, origin, warm_axis)
+        
+        with instr.phase('cut_sweep'):
+            nodes = _multisection_nodes(prefix_weights, n_subsets, node_levels)
+            instr.count('cuts_evaluated', len(nodes))
+        connected = _connected_multisection_nodes(sorted_indices, shape, nodes)
+        
+        def divide(node_indices, node_subsets, prefix):
+            """Novo nó da recursão, com a sua própria ordenação."""
+            leaves.extend(multisection_subset_division_indices(
+                flat_weights, shape, node_indices, node_subsets, current_depth + len(prefix) - len(binary_prefix),
+                prefix, origin, tree, warm_axes, levels
+            ))
+        
+        def resolve(suffix, node_subsets, lo, hi):
+            """Percorre os nós virtuais da multissecção a partir das posições [lo, hi) da ordenação."""
+            prefix = binary_prefix + suffix
+            if node_subsets <= 1 or hi - lo <= 1:
+                leaves.append((prefix, sorted_indices[lo:hi]))
+                return
+            if suffix not in nodes:
+                # Fatia com vários subdomínios: nova inércia e ordenação
+                divide(sorted_indices[lo:hi], node_subsets, prefix)
+                return
+            
+            n1 = node_subsets // 2
+            if suffix in connected:
+                cut = nodes[suffix][3]
+                if tree is not None:
+                    tree[prefix] = axis
+                resolve(suffix + '0', n1, lo, cut)
+                resolve(suffix + '1', node_subsets - n1, cut, hi)
+                return
+            
+            # Corte desconectado: bisseção comum do nó virtual, com o eixo da multissecção
+            instr.count('multisection_fallback')
+            first_indices, second_indices, node_axis, _ = _bisect_node(
+                flat_weights, shape, sorted_indices[lo:hi], n1, node_subsets - n1, origin, axis
+            )
+            if tree is not None:
+                tree[prefix] = node_axis
+            if len(first_indices):
+                divide(first_indices, n1, prefix + '0')
+            if len(second_indices):
+                divide(second_indices, node_subsets - n1, prefix + '1')
+        
+        resolve('', n_subsets, 0, len(sorted_indices))
     
-    # Calculate principal moments and principal axes
-    principal_moments, principal_axes = m3d.calculate_principal_moments(inertia_matrix)
+    return leaves
+
+def _segment_argmin(values, bounds, segment):
+    """
+    Posição (global) do menor valor de cada segmento contíguo de um array, com empates resolvidos pela menor posição.
     
-    # Normalize eigenvectors
-    principal_axes = normalize_vectors(principal_axes)
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Valores a minimizar; os segmentos são `values[bounds[s]:bounds[s + 1]]`, todos não vazios.
+    bounds : numpy.ndarray
+        Limites dos segmentos (tamanho S + 1).
+    segment : numpy.ndarray
+        Segmento de cada posição (`np.repeat(np.arange(S), np.diff(bounds))`).
     
-    # Project points onto eigenvectors
-    projections1 = project_points_on_eigenvector(points, center_of_mass, principal_axes[:, 0])
-    projections2 = project_points_on_eigenvector(points, center_of_mass, principal_axes[:, 1])
+    Returns
+    -------
+    numpy.ndarray
+        Array de tamanho S com a posição do mínimo de cada segmento.
+    """
+    minima = np.minimum.reduceat(values, bounds[:-1])
+    hits = np.flatnonzero(values == minima[segment])
+    _, first = np.unique(segment[hits], return_index=True)
+    return hits[first]
+
+def _segmented_argsort(values, segment):
+    """
+    Ordena um array dentro de cada segmento, mantendo os segmentos na ordem crescente.
     
-    # Calculate max distance for each projection
-    max_dist1 = calculate_max_distance(projections1)
-    max_dist2 = calculate_max_distance(projections2)
+    Os valores são ordenados uma única vez e a ordem é então estabilizada pelo segmento, com
+    o menor tipo inteiro que o representa (para o qual o NumPy usa ordenação radix).
     
-    # Choose projection with less dispersion
-    chosen_projections = projections1 if max_dist1 <= max_dist2 else projections2
-    chosen_axis = principal_axes[:, 0] if max_dist1 <= max_dist2 else principal_axes[:, 1]
+    Returns
+    -------
+    numpy.ndarray
+        Permutação equivalente a `np.lexsort((values, segment))`.
+    """
+    order = np.argsort(values, kind="stable")
+    segment = segment.astype(np.min_scalar_type(int(segment.max())), copy=False)
+    return order[np.argsort(segment[order], kind='stable')]
+
+def level_synchronous_binary_subset_division_indices(flat_weights, shape, indices, n_subsets=2, origin=(0, 0),
+                                                     tree=None):
+    """
+    Bisseção recursiva inercial processada em largura: todos os nós de um nível são divididos de uma vez.
     
-    # Calculate projection value for each point (distance along the chosen axis)
-    projection_values = np.zeros(chosen_projections.shape[0])
-    for i in range(chosen_projections.shape[0]):
-        x, y = chosen_projections[i, 0], chosen_projections[i, 1]
-        # Calculate projection value as the dot product with the axis
-        projection_values[i] = (x - center_of_mass[0]) * chosen_axis[0] + (y - center_of_mass[1]) * chosen_axis[1]
+    Em vez de uma sequência de pequenas chamadas NumPy por nó, cada nível trabalha sobre um único
+    array com as células de todos os nós, agrupadas em segmentos contíguos:
     
-    # Convert coordinates to tuples for dict keys
-    coords = [(int(chosen_projections[i, 0]), int(chosen_projections[i, 1])) for i in range(chosen_projections.shape[0])]
+    - os momentos de inércia de todos os nós vêm de `np.bincount` sobre o índice do segmento;
+    - os problemas de autovalores 2x2 são resolvidos juntos pela forma fechada do ângulo
+      principal, theta = atan2(2 Ixy, Ixx - Iyy) / 2;
+    - as projeções de todos os nós são ordenadas por uma única ordenação segmentada;
+    - o corte mais próximo do peso alvo de cada nó vem de uma soma acumulada segmentada, e a
+      conectividade dos dois lados de todos os nós é verificada por uma única rotulação
+      (`conn.components_per_label`).
     
-    # Sort points by projection value
-    sorted_indices = np.argsort(projection_values)
-    sorted_coords = [coords[i] for i in sorted_indices]
+    O custo de cada nível é O(n) operações vetorizadas (além da ordenação), independentemente do
+    número de nós. Os nós cujo corte mais próximo do alvo não deixa os dois lados conectados são
+    divididos individualmente por `_bisect_indices`, sobre o mesmo eixo, como na recursão serial.
     
-    # Calculate total weight
-    total_weight = sum(input_dict.values())
-    target_weight1 = (total_weight * n1) / (n1 + n2)
+    Parameters
+    ----------
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n_subsets : int
+        Número total de subconjuntos desejados.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0. Valor padrão é (0, 0).
+    tree : dict, optional
+        Se fornecido, recebe o eixo de projeção de cada nó interno, indexado pelo prefixo.
     
-    # Helper functions for connectivity
-    def is_connected(subset):
-        """
-        Verifica se um subconjunto de coordenadas forma um componente conectado.
-        
-        Esta função determina se todas as coordenadas no subconjunto fornecido
-        podem ser alcançadas a partir de qualquer outra coordenada, movendo-se
-        apenas entre vizinhos adjacentes (acima, abaixo, esquerda, direita).
-
-        Esta função implementa um algoritmo de busca em largura (BFS) para verificar a conectividade de um conjunto de coordenadas. A ideia principal é começar em um ponto e verificar se todos os outros pontos podem ser alcançados seguindo apenas movimentos adjacentes.
-       
-        Args:
-            subset: Um dicionário onde as chaves são tuplas (i, j) representando coordenadas.
-                    Os valores do dicionário não são utilizados nesta função.
-        
-        Returns:
-            bool: True se o subconjunto forma um componente conectado, False caso contrário.
-        """
-        # Caso base: um conjunto vazio é considerado conectado por definição
-        if not subset:
-            return True
-        
-        # Extrai todas as coordenadas do subconjunto
-        coords = list(subset.keys())
-        
-        # Inicializa estruturas para o algoritmo de busca em largura (BFS)
-        visited = set()  # Conjunto para rastrear coordenadas já visitadas
-        queue = [coords[0]]  # Fila começa com a primeira coordenada
-        visited.add(coords[0])  # Marca a primeira coordenada como visitada
-        
-        # Implementação do algoritmo BFS para explorar o componente conectado
-        while queue:
-            # Remove e processa a próxima coordenada da fila
-            current = queue.pop(0)
-            i, j = current
+    Returns
+    -------
+    list
+        Lista de pares (prefixo binário, índices planos) com as folhas, em ordem de prefixo
+        (a mesma estrutura de `recursive_binary_subset_division_indices`).
+    
+    Examples
+    --------
+    >>> weights = m3d.compute_weight_array(m3d.create_3d_mesh())
+    >>> leaves = level_synchronous_binary_subset_division_indices(
+    ...     weights.ravel(), weights.shape, np.flatnonzero(weights), 8)
+    >>> [prefix for prefix, _ in leaves]
+    ['000', '001', '010', '011', '100', '101', '110', '111']
+    """
+    if len(shape) != 2:
+        raise ValueError("A recursão em largura está disponível apenas para mapas de pesos 2D")
+    
+    order = np.asarray(indices, dtype=np.int64)
+    bounds = np.array([0, len(order)], dtype=np.int64)
+    subsets = np.array([n_subsets], dtype=np.int64)
+    prefixes = ['']
+    leaves = []
+    depth = 0
+    
+    while len(prefixes):
+        # Nós terminais saem do nível; os demais continuam contíguos em `order`
+        sizes = np.diff(bounds)
+        split = (subsets > 1) & (sizes > 1)
+        for node in np.flatnonzero(~split & (sizes > 0)):
+            leaves.append((prefixes[node], order[bounds[node]:bounds[node + 1]]))
+        if not split.any():
+            break
+        keep = np.repeat(split, sizes)
+        order = order[keep]
+        sizes, subsets = sizes[split], subsets[split]
+        prefixes = [prefix for prefix, kept in zip(prefixes, split) if kept]
+        bounds = np.concatenate([[0], np.cumsum(sizes)])
+        with instr.node(str(depth), len(order), category='nível'):
+            instr.count('bisections', int(split.sum()))
+            instr.count('cells', len(order))
+            n_nodes = len(prefixes)
+            segment = np.repeat(np.arange(n_nodes), sizes)
             
-            # Gera as quatro coordenadas adjacentes (vizinhos)
-            # Vizinhos: direita, esquerda, abaixo, acima
-            neighbors = [(i+1, j), (i-1, j), (i, j+1), (i, j-1)]
+            with instr.phase('inertia'):
+                # Momentos de todos os nós: centro de massa e matriz de inércia por bincount
+                rows, cols = np.divmod(order, shape[1])
+                x = rows + float(origin[0])
+                y = cols + float(origin[1])
+                w = flat_weights[order].astype(float)
+                total = np.bincount(segment, w, n_nodes)
+                safe_total = np.where(total > 0, total, 1.0)
+                x_bar = np.where(total > 0, np.bincount(segment, w * x, n_nodes) / safe_total, 0.0)
+                y_bar = np.where(total > 0, np.bincount(segment, w * y, n_nodes) / safe_total, 0.0)
+                dx = x - x_bar[segment]
+                dy = y - y_bar[segment]
+                i_xx = np.bincount(segment, w * dy * dy, n_nodes)
+                i_yy = np.bincount(segment, w * dx * dx, n_nodes)
+                i_xy = -np.bincount(segment, w * dx * dy, n_nodes)
+                
+                # Autovetores de todas as matrizes 2x2 simétricas pela forma fechada
+                theta = 0.5 * np.arctan2(2 * i_xy, i_xx - i_yy)
+                cos, sin = np.cos(theta), np.sin(theta)
+                first_projection = dx * cos[segment] + dy * sin[segment]
+                second_projection = dy * cos[segment] - dx * sin[segment]
             
-            # Processa cada vizinho
-            for neighbor in neighbors:
-                # Verifica se o vizinho está no subconjunto e ainda não foi visitado
-                if neighbor in subset and neighbor not in visited:
-                    visited.add(neighbor)  # Marca o vizinho como visitado
-                    queue.append(neighbor)  # Adiciona o vizinho à fila para processamento posterior
-        
-        # Um componente é conectado se todas as coordenadas foram visitadas
-        # durante a busca em largura a partir da primeira coordenada
-        return len(visited) == len(subset)    
-        
-    # Try different cut points to find a balanced division that maintains connectivity
-    best_imbalance = float('inf')
-    best_first_subset = {}
-    best_second_subset = {}
-    
-    for cut_index in range(1, len(sorted_coords)):
-        # Create two potential subsets
-        first_subset = {sorted_coords[i]: input_dict[sorted_coords[i]] for i in range(cut_index)}
-        second_subset = {sorted_coords[i]: input_dict[sorted_coords[i]] for i in range(cut_index, len(sorted_coords))}
-        
-        # Check connectivity
-        if is_connected(first_subset) and is_connected(second_subset):
-            # Calculate weight imbalance
-            weight1 = sum(first_subset.values())
-            weight2 = sum(second_subset.values())
+            with instr.phase('axis_selection'):
+                # Eixo de menor dispersão de cada nó, como em `select_projection_axis`
+                starts = bounds[:-1]
+                first_extent = (np.maximum.reduceat(first_projection, starts) -
+                                np.minimum.reduceat(first_projection, starts))
+                second_extent = (np.maximum.reduceat(second_projection, starts) -
+                                 np.minimum.reduceat(second_projection, starts))
+                use_first = first_extent <= second_extent
+                axes = np.where(use_first[:, None], np.column_stack([cos, sin]), np.column_stack([-sin, cos]))
+                projection = np.where(use_first[segment], first_projection, second_projection)
             
-            # MODIFICAÇÃO: Remover o cálculo do size_imbalance e usar apenas weight_imbalance
-            weight_imbalance = abs(weight1 - target_weight1)
+            with instr.phase('sort'):
+                # Ordenação segmentada: os segmentos já são contíguos, ordena-se cada um pela projeção
+                order = order[_segmented_argsort(projection, segment)]
             
-            # MODIFICAÇÃO: Usar apenas normalized_weight_imb como métrica de imbalance 
-            normalized_weight_imb = weight_imbalance / total_weight
+            with instr.phase('cut_sweep'):
+                # Corte mais próximo do alvo em cada nó, pela soma acumulada segmentada
+                n1 = subsets // 2
+                n2 = subsets - n1
+                cumulative = np.cumsum(flat_weights[order])
+                before = np.concatenate([[0], cumulative])[starts]
+                prefix_weights = cumulative - before[segment]
+                node_weights = cumulative[bounds[1:] - 1] - before
+                imbalance = np.abs(prefix_weights - (node_weights * n1 / (n1 + n2))[segment])
+                imbalance[bounds[1:] - 1] = np.inf
+                cuts = _segment_argmin(imbalance, bounds, segment) + 1
+                instr.count('cuts_evaluated', len(order) - n_nodes)
             
-            # MODIFICAÇÃO: imbalance agora considera apenas o peso
-            imbalance = normalized_weight_imb
+            # Conectividade dos dois lados de todos os nós em uma única rotulação da grade
+            side = np.arange(len(order)) >= cuts[segment]
+            grid = np.full(shape[0] * shape[1], -1, dtype=np.int64)
+            grid[order] = 2 * segment + side
+            counts = conn.components_per_label(grid.reshape(shape), n_labels=2 * n_nodes)
+            connected = (counts[0::2] == 1) & (counts[1::2] == 1)
             
-            if imbalance < best_imbalance:
-                best_imbalance = imbalance
-                best_first_subset = first_subset
-                best_second_subset = second_subset
+            # Próximo nível: os dois filhos de cada nó, em ordem de prefixo
+            next_order = []
+            next_sizes = []
+            next_subsets = []
+            next_prefixes = []
+            for node, prefix in enumerate(prefixes):
+                start, stop = bounds[node], bounds[node + 1]
+                if connected[node]:
+                    first_indices, second_indices = order[start:cuts[node]], order[cuts[node]:stop]
+                else:
+                    instr.count('level_fallback')
+                    first_indices, second_indices, _ = _bisect_indices(
+                        flat_weights, shape, order[start:stop], n1[node], n2[node], origin, axes[node]
+                    )
+                if tree is not None:
+                    tree[prefix] = axes[node].copy()
+                next_order.extend([first_indices, second_indices])
+                next_sizes.extend([len(first_indices), len(second_indices)])
+                next_subsets.extend([n1[node], n2[node]])
+                next_prefixes.extend([prefix + '0', prefix + '1'])
+        
+        order = np.concatenate(next_order)
+        bounds = np.concatenate([[0], np.cumsum(next_sizes)]).astype(np.int64)
+        subsets = np.array(next_subsets, dtype=np.int64)
+        prefixes = next_prefixes
+        depth += 1
+    
+    leaves.sort(key=lambda leaf: leaf[0])
+    return leaves
 
-    # If we couldn't find connected subsets with the direct approach, use region growing
-    if not best_first_subset or not best_second_subset:
-        return region_growing_partition(input_dict, n1, n2, sorted_coords)
+# Estado compartilhado pelos processos de trabalho da recursão paralela
+_WORKER_STATE = {}
+
+def _init_partition_worker(flat_weights, shape, origin, engine='inertial', refine=None, backend='auto'):
+    """
+    Inicializa um processo de trabalho com o mapa de pesos (enviado uma única vez por processo).
     
-    return best_first_subset, best_second_subset
+    O backend dos núcleos compilados do processo principal é repassado: com os métodos de
+    início 'spawn' e 'forkserver', o processo reimporta `nucleos_compilados` com o padrão.
+    """
+    nc.set_backend(backend)
+    _WORKER_STATE['flat_weights'] = flat_weights
+    _WORKER_STATE['shape'] = shape
+    _WORKER_STATE['origin'] = origin
+    _WORKER_STATE['engine'] = engine
+    _WORKER_STATE['refine'] = refine
 
-def region_growing_partition(input_dict, n1, n2, sorted_coords):
+def _bisect_task(indices, n1, n2, depth=0):
+    """Tarefa de um processo de trabalho: uma única bisseção."""
+    return _bisect_node(
+        _WORKER_STATE['flat_weights'], _WORKER_STATE['shape'], indices, n1, n2, _WORKER_STATE['origin'],
+        engine=_WORKER_STATE['engine'], refine=_WORKER_STATE['refine'], depth=depth
+    )
+
+def _subtree_task(indices, n_subsets, current_depth, binary_prefix):
+    """Tarefa de um processo de trabalho: uma subárvore completa da recursão."""
+    tree = {}
+    cut_report = {}
+    leaves = recursive_binary_subset_division_indices(
+        _WORKER_STATE['flat_weights'], _WORKER_STATE['shape'], indices, n_subsets,
+        current_depth, binary_prefix, _WORKER_STATE['origin'], tree, engine=_WORKER_STATE['engine'],
+        refine=_WORKER_STATE['refine'], cut_report=cut_report
+    )
+    return leaves, tree, cut_report
+
+def parallel_recursive_binary_subset_division_indices(flat_weights, shape, indices, n_subsets=2, origin=(0, 0),
+                                                      workers=None, parallel_depth=None,
+                                                      min_parallel_cells=50000, tree=None, engine='inertial',
+                                                      refine=None, cut_report=None):
     """
-    Uses region growing to create connected, balanced partitions.
+    Versão paralela (por processos) de `recursive_binary_subset_division_indices`.
     
-    Este algoritmo implementa uma técnica de "crescimento de região" para dividir um conjunto de pontos
-    em duas partições conectadas e balanceadas. O processo começa com duas "sementes" (pontos iniciais)
-    nas extremidades opostas e vai crescendo cada região de forma balanceada.
+    Após cada bisseção, as duas metades são independentes. Os nós acima de `parallel_depth`
+    são bisseccionados individualmente no pool de processos, de modo que as metades de um
+    mesmo nível são divididas em paralelo; ao atingir `parallel_depth`, a subárvore inteira
+    é enviada como uma única tarefa. Nós com menos de `min_parallel_cells` células são
+    processados no próprio processo principal. O resultado é idêntico ao da execução serial.
     
     Parameters
     ----------
-    input_dict : dict
-        Dictionary with coordinates as keys and weights as values.
-        Um dicionário onde as chaves são coordenadas (tuplas) e os valores são os pesos de cada ponto.
-    n1, n2 : int
-        Target sizes for the subsets.
-        Tamanhos alvo para cada subconjunto, usados para calcular as proporções desejadas.
-    sorted_coords : list
-        Coordinates sorted by projection value.
-        Lista de coordenadas ordenadas por algum valor de projeção (geralmente ordenadas ao longo
-        de algum eixo principal para maximizar a separação espacial).
+    flat_weights : numpy.ndarray
+        Mapa de pesos 2D achatado.
+    shape : tuple
+        Forma (m, p) do mapa de pesos.
+    indices : numpy.ndarray
+        Índices planos das células a dividir.
+    n_subsets : int
+        Número total de subconjuntos desejados.
+    origin : tuple, optional
+        Coordenadas (i, j) da célula de índice plano 0. Valor padrão é (0, 0).
+    workers : int, optional
+        Número de processos. Se None, usa `os.cpu_count()`.
+    parallel_depth : int, optional
+        Profundidade a partir da qual subárvores inteiras são enviadas ao pool. Se None,
+        usa ceil(log2(workers)), o que gera aproximadamente uma subárvore por processo.
+    min_parallel_cells : int, optional
+        Tamanho mínimo de um nó para ser enviado ao pool. Valor padrão é 50000.
+    tree : dict, optional
+        Se fornecido, recebe o eixo de projeção de cada nó interno, indexado pelo prefixo.
+    engine : str, optional
+        Motor de bisseção: 'inertial' (padrão) ou 'multilevel'.
+    refine : float, optional
+        Alvo de balanceamento das folhas para o refinamento FM após cada bisseção (dividido
+        entre os níveis por `_level_tolerance`). Se None, não há refinamento.
+    cut_report : dict, optional
+        Se fornecido, recebe o relatório do refinamento FM de cada nó interno, indexado pelo prefixo.
     
     Returns
     -------
-    tuple
-        (first_subset, second_subset) both are dictionaries.
-        Dois dicionários representando as partições resultantes, mantendo a estrutura do input_dict.
+    list
+        Lista de pares (prefixo binário, índices planos) com as folhas da recursão,
+        em ordem de prefixo.
     """
-    # Initialize with seeds at opposite ends
-    # Inicializa os subconjuntos com as sementes nos extremos opostos da lista ordenada
-    first_seed = sorted_coords[0]  # Primeira semente (início da lista ordenada)
-    second_seed = sorted_coords[-1]  # Segunda semente (final da lista ordenada)
-    
-    # Cria os subconjuntos iniciais com as sementes e seus respectivos pesos
-    first_subset = {first_seed: input_dict[first_seed]}
-    second_subset = {second_seed: input_dict[second_seed]}
-    assigned = {first_seed, second_seed}  # Conjunto de pontos já atribuídos a algum subconjunto
-    
-    # Calcula o peso total e os pesos alvo para cada subconjunto baseado nas proporções n1 e n2
-    total_weight = sum(input_dict.values())
-    target_weight1 = (total_weight * n1) / (n1 + n2)  # Peso alvo para o primeiro subconjunto
-    target_weight2 = total_weight - target_weight1  # Peso alvo para o segundo subconjunto
-    
-    # Calcula o número de pontos alvo para cada subconjunto
-    target_size1 = (len(input_dict) * n1) // (n1 + n2)
-    target_size2 = len(input_dict) - target_size1
-    
-    # Helper function to find unassigned neighbors
-    # Função auxiliar que encontra vizinhos não atribuídos de um subconjunto
-    def get_unassigned_neighbors(subset):
+    _bisection_engine(engine, len(shape))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if parallel_depth is None:
+        parallel_depth = max(1, math.ceil(math.log2(max(workers, 2))))
+    
+    leaves = []
+    pending = {}
+    if tree is None:
+        tree = {}
+    if cut_report is None:
+        cut_report = {}
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_partition_worker,
+                             initargs=(flat_weights, shape, origin, engine, refine, nc.get_backend())) as pool:
+        
+        def schedule(node_indices, node_subsets, depth, prefix):
+            """Resolve um nó no processo principal ou o envia ao pool."""
+            if node_subsets <= 1 or len(node_indices) <= 1 or len(node_indices) < min_parallel_cells:
+                leaves.extend(recursive_binary_subset_division_indices(
+                    flat_weights, shape, node_indices, node_subsets, depth, prefix, origin, tree,
+                    engine=engine, refine=refine, cut_report=cut_report
+                ))
+            elif depth >= parallel_depth:
+                future = pool.submit(_subtree_task, node_indices, node_subsets, depth, prefix)
+                pending[future] = None
+            else:
+                n1 = node_subsets // 2
+                future = pool.submit(_bisect_task, node_indices, n1, node_subsets - n1, depth)
+                pending[future] = (node_subsets, depth, prefix)
+        
+        schedule(np.asarray(indices, dtype=np.int64), n_subsets, 0, '')
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = pending.pop(future)
+                if node is None:
+                    subtree_leaves, subtree, subtree_report = future.result()
+                    leaves.extend(subtree_leaves)
+                    tree.update(subtree)
+                    cut_report.update(subtree_report)
+                    continue
+                
+                node_subsets, depth, prefix = node
+                n1 = node_subsets // 2
+                first_indices, second_indices, tree[prefix], report = future.result()
+                if report is not None:
+                    cut_report[prefix] = report
+                if len(first_indices):
+                    schedule(first_indices, n1, depth + 1, prefix + '0')
+                if len(second_indices):
+                    schedule(second_indices, node_subsets - n1, depth + 1, prefix + '1')
+    
+    # Os prefixos das folhas não são prefixos uns dos outros: a ordem lexicográfica é a ordem da recursão
+    leaves.sort(key=lambda leaf: leaf[0])
+    return leaves
+
+class PartitionState:
+    """
+    Estado de particionamento de um mapa de pesos 2D (ou de uma malha 3D) representado por arrays.
+    
+    Substitui os dicionários {(i, j): peso} por um array de pesos e um array de rótulos `int32`.
+    Cada subdomínio recebe um rótulo inteiro; `prefixes[rótulo]` guarda o prefixo binário
+    correspondente da árvore de bisseção.
+    
+    Com um array 3D (por exemplo, a saída de `m3d.create_3d_mesh` ou `m3d.refine_mesh`), as
+    células ativas são particionadas diretamente em 3D por
+    `find_best_projection_and_division_indices_3d`, sem a projeção em colunas.
+    
+    Parameters
+    ----------
+    weights : numpy.ndarray
+        Mapa de pesos 2D, por exemplo a saída de `m3d.compute_weight_array`, ou malha 3D.
+    mask : numpy.ndarray, optional
+        Máscara booleana com as células a particionar. Se None, todas as células são
+        particionadas (inclusive as de peso zero), como no dicionário sintético.
+    
+    Attributes
+    ----------
+    weights : numpy.ndarray
+        Mapa de pesos 2D.
+    mask : numpy.ndarray
+        Máscara booleana das células particionadas.
+    labels : numpy.ndarray
+        Array `int32` com o rótulo de cada célula; -1 para células fora da máscara.
+    prefixes : list
+        Prefixo binário de cada rótulo.
+    tree : dict
+        Eixo de projeção de cada nó interno da árvore de bisseção, indexado pelo prefixo.
+    n_subsets : int
+        Número de subdomínios pedido na última partição.
+    engine : str
+        Motor de bisseção usado na última partição (reutilizado por `repartition`).
+    refine : float or None
+        Tolerância do refinamento FM usada na última partição (reutilizada por `repartition`).
+    multisection : bool or int
+        Opção de multissecção usada na última partição (reutilizada por `repartition`).
+    cut_report : dict
+        Relatório do refinamento FM de cada nó interno, indexado pelo prefixo (ver
+        `fm_refine_bisection_indices`). Os nós cujo desvio final ficou acima da folga têm
+        'balanced' False.
+    recut_prefixes : list
+        Prefixos dos nós recortados no último `repartition`.
+    splits : dict
+        Fração do peso de cada nó interno no primeiro filho quando o nó foi cortado pela última
+        vez, indexada pelo prefixo (referência de `repartition`).
+    origin : tuple
+        Coordenadas (i, j) da célula [0, 0] do array (diferente de (0, 0) apenas
+        quando o estado é criado a partir de um dicionário deslocado).
+    
+    Examples
+    --------
+    >>> weights = m3d.compute_weight_array(m3d.create_3d_mesh())
+    >>> state = PartitionState(weights, mask=weights > 0)
+    >>> labels = state.partition(4)
+    >>> state.prefix_table
+    {'00': 0, '01': 1, '10': 2, '11': 3}
+    
+    >>> mesh = m3d.create_3d_mesh()
+    >>> state = PartitionState(mesh, mask=mesh > 0)
+    >>> labels = state.partition(4)      # rótulos por célula ativa, forma (8, 8, 3)
+    """
+    
+    def __init__(self, weights, mask=None):
+        weights = np.asarray(weights)
+        if weights.ndim not in (2, 3):
+            raise ValueError("O mapa de pesos deve ser bidimensional (ou uma malha 3D)")
+        
+        self.weights = weights
+        self.shape = weights.shape
+        if mask is None:
+            self.mask = np.ones(self.shape, dtype=bool)
+        else:
+            self.mask = np.asarray(mask, dtype=bool)
+            if self.mask.shape != self.shape:
+                raise ValueError("A máscara deve ter a mesma forma do mapa de pesos")
+        
+        self.labels = np.full(self.shape, -1, dtype=np.int32)
+        self.prefixes = []
+        self.tree = {}
+        self.n_subsets = None
+        self.engine = 'inertial'
+        self.refine = None
+        self.multisection = False
+        self.cut_report = {}
+        self.recut_prefixes = []
+        self.splits = {}
+        self.origin = (0,) * weights.ndim
+        # Ordem das células na raiz da recursão (a ordem das chaves, para estados vindos de dicionários)
+        self._order = None
+    
+    @classmethod
+    def from_dict(cls, input_dict):
         """
-        Identifica todos os pontos vizinhos não atribuídos dos pontos em um subconjunto.
+        Cria um estado a partir de um dicionário {(i, j): peso}.
         
-        Um ponto é considerado vizinho se estiver adjacente em uma das quatro direções
-        (acima, abaixo, esquerda, direita) a qualquer ponto do subconjunto.
+        Parameters
+        ----------
+        input_dict : dict
+            Dicionário com coordenadas como chaves e pesos como valores.
         
-        Args:
-            subset: Dicionário representando um subconjunto de pontos
-            
-        Returns:
-            Set contendo todos os vizinhos não atribuídos do subconjunto
+        Returns
+        -------
+        PartitionState
+            Estado sobre a caixa envolvente das coordenadas, com máscara nas chaves do dicionário.
         """
-        neighbors = set()
-        for coord in subset:
-            i, j = coord  # Coordenadas do ponto atual
-            # Verifica os quatro vizinhos adjacentes (vizinhança de Von Neumann)
-            for neighbor in [(i+1, j), (i-1, j), (i, j+1), (i, j-1)]:
-                # Adiciona apenas se o vizinho existir no dicionário original e não estiver atribuído
-                if neighbor in input_dict and neighbor not in assigned:
-                    neighbors.add(neighbor)
-        return neighbors
+        keys, indices, flat_weights, shape, origin = _dict_to_flat(input_dict)
+        mask = np.zeros(shape[0] * shape[1], dtype=bool)
+        mask[indices] = True
+        
+        state = cls(flat_weights.reshape(shape), mask.reshape(shape))
+        state.origin = origin
+        state._order = indices
+        return state
     
-    # Grow regions until all points are assigned
-    # Cresce as regiões até que todos os pontos sejam atribuídos
-    while len(assigned) < len(input_dict):
-        # Obtém os vizinhos não atribuídos de cada subconjunto
-        first_neighbors = get_unassigned_neighbors(first_subset)
-        second_neighbors = get_unassigned_neighbors(second_subset)
-        
-        # Se nenhum dos subconjuntos tiver vizinhos não atribuídos, encerra o loop
-        # (pode acontecer se houver regiões desconectadas no espaço)
-        if not first_neighbors and not second_neighbors:
-            break
+    def partition(self, n_subsets=2, workers=None, parallel_depth=None, min_parallel_cells=50000,
+                  engine='inertial', refine=None, batched=False, multisection=False):
+        """
+        Particiona as células da máscara em `n_subsets` subdomínios balanceados e conectados.
         
-        # Calcula os pesos atuais de cada subconjunto
-        weight1 = sum(first_subset.values())
-        weight2 = sum(second_subset.values())
+        Parameters
+        ----------
+        n_subsets : int
+            Número total de subdomínios desejados.
+        workers : int, optional
+            Número de processos para a recursão paralela. Se None ou 1, a recursão é serial.
+        parallel_depth : int, optional
+            Profundidade a partir da qual subárvores inteiras são enviadas aos processos
+            (ver `parallel_recursive_binary_subset_division_indices`).
+        min_parallel_cells : int, optional
+            Tamanho mínimo de um nó para ser processado em paralelo. Valor padrão é 50000.
+        engine : str, optional
+            Motor de bisseção: 'inertial' (padrão) ou 'multilevel'.
+        refine : float, optional
+            Se fornecido, cada bisseção é refinada por `fm_refine_bisection_indices`, com alvo
+            de desbalanceamento final (peso máximo / peso médio) `1 + refine` (a folga é
+            dividida entre os níveis da árvore); os relatórios ficam em `cut_report`, e os nós
+            que não alcançaram a folga têm 'balanced' False.
+        batched : bool, optional
+            Se True, a recursão é feita em largura por
+            `level_synchronous_binary_subset_division_indices`, dividindo todos os nós de um
+            nível de uma vez. Disponível para mapas 2D com o motor 'inertial', sem `refine`
+            e sem `workers`.
+        multisection : bool or int, optional
+            Se True, cada nó é dividido em várias fatias sobre uma única ordenação por
+            `multisection_subset_division_indices`, com o número de fatias escolhido por nó; um
+            inteiro fixa o número de níveis da árvore binária resolvidos por ordenação. Indicado
+            para números de subdomínios que não são potências de 2. Disponível com o motor
+            'inertial', sem `refine`, `batched` nem `workers`.
         
-        # Calcula quanto cada subconjunto está distante do seu peso alvo
-        weight_deficit1 = target_weight1 - weight1
-        weight_deficit2 = target_weight2 - weight2
+        Returns
+        -------
+        numpy.ndarray
+            Array `int32` de rótulos (o mesmo objeto de `self.labels`).
+        """
+        indices = self._order
+        if indices is None:
+            indices = np.flatnonzero(self.mask)
         
-        # MODIFICAÇÃO: Remover o cálculo dos déficits de tamanho (size_deficit)
-        # Nota: Esta linha indica que o código original considerava também o tamanho dos subconjuntos,
-        # mas essa parte foi removida na implementação atual para focar apenas no equilíbrio de pesos.
+        tree = {}
+        cut_report = {}
+        if multisection:
+            if (engine != 'inertial' or refine is not None or batched or
+                    (workers is not None and workers > 1)):
+                raise ValueError("A multissecção não aceita 'engine', 'refine', 'batched' nem 'workers'")
+            leaves = multisection_subset_division_indices(
+                self.weights.ravel(), self.shape, indices, n_subsets, origin=self.origin, tree=tree,
+                levels=None if multisection is True else int(multisection)
+            )
+        elif batched:
+            if engine != 'inertial' or refine is not None or (workers is not None and workers > 1):
+                raise ValueError("A recursão em largura não aceita 'engine', 'refine' nem 'workers'")
+            leaves = level_synchronous_binary_subset_division_indices(
+                self.weights.ravel(), self.shape, indices, n_subsets, self.origin, tree
+            )
+        elif workers is not None and workers > 1:
+            leaves = parallel_recursive_binary_subset_division_indices(
+                self.weights.ravel(), self.shape, indices, n_subsets, self.origin,
+                workers, parallel_depth, min_parallel_cells, tree, engine, refine, cut_report
+            )
+        else:
+            leaves = recursive_binary_subset_division_indices(
+                self.weights.ravel(), self.shape, indices, n_subsets, origin=self.origin, tree=tree,
+                engine=engine, refine=refine, cut_report=cut_report
+            )
+        self.tree = tree
+        self.n_subsets = n_subsets
+        self.engine = engine
+        self.refine = refine
+        self.multisection = multisection
+        self.cut_report = cut_report
+        self.recut_prefixes = []
+        self._set_leaves(leaves)
+        self._record_splits()
+        return self.labels
+    
+    def repartition(self, weights, tolerance=0.02):
+        """
+        Reparticiona com novos pesos reaproveitando as subárvores cujo corte não se alterou.
         
-        # Normaliza os déficits de peso para poder compará-los
-        weight_deficit_norm1 = weight_deficit1 / target_weight1 if target_weight1 > 0 else 0
-        weight_deficit_norm2 = weight_deficit2 / target_weight2 if target_weight2 > 0 else 0
+        A árvore anterior é percorrida a partir da raiz. Para cada nó interno, o peso de cada
+        filho é recalculado com os novos pesos (por `np.bincount` sobre os rótulos das folhas).
+        O corte é mantido, e a verificação desce aos filhos, se a fração do peso no primeiro
+        filho variou no máximo `tolerance` em relação à do último corte do nó (`splits`), ou se
+        o desvio do alvo não passa de `max(tolerance, desvio no último corte)`. Assim, um corte
+        legitimamente desigual (por exemplo, em um domínio não convexo) não é refeito enquanto
+        os pesos não mudam. Caso contrário, a subárvore do nó é recortada, reutilizando os eixos de projeção anteriores dos nós de
+        mesmo prefixo em vez de recalcular a inércia. As demais subárvores ficam intactas.
         
-        # MODIFICAÇÃO: Usar apenas os déficits de peso como critério
-        # Define o déficit total de cada subconjunto usando apenas o déficit de peso normalizado
-        deficit1 = weight_deficit_norm1
-        deficit2 = weight_deficit_norm2
+        Parameters
+        ----------
+        weights : numpy.ndarray
+            Novo mapa de pesos 2D, com a mesma forma do anterior. A máscara não muda.
+        tolerance : float, optional
+            Variação relativa máxima do corte de um nó para que seja mantido. Valor padrão é 0.02.
         
-        # PARTE ADICIONADA: Lógica para escolher qual vizinho adicionar a cada subconjunto
-        # Decide qual subconjunto deve crescer com base nos déficits calculados
-        if first_neighbors and (not second_neighbors or deficit1 > deficit2):
-            # Primeiro subconjunto precisa crescer mais (tem maior déficit) ou é o único com vizinhos
-            
-            # Seleciona o vizinho que mais contribui para equilibrar o peso
-            best_neighbor = None
-            best_score = float('-inf')
-            
-            for neighbor in first_neighbors:
-                # Calcula quanto esse vizinho aproximaria o subconjunto do seu peso alvo
-                new_deficit = deficit1 - (input_dict[neighbor] / target_weight1)
-                score = abs(new_deficit) - abs(deficit1)
-                
-                # Quanto mais negativo o score, melhor (significa maior redução no déficit)
-                if score < best_score:
-                    best_score = score
-                    best_neighbor = neighbor
-            
-            # Adiciona o melhor vizinho ao primeiro subconjunto
-            first_subset[best_neighbor] = input_dict[best_neighbor]
-            assigned.add(best_neighbor)
-            
-        elif second_neighbors:
-            # Segundo subconjunto precisa crescer mais (tem maior déficit) ou é o único com vizinhos
-            
-            # Seleciona o vizinho que mais contribui para equilibrar o peso
-            best_neighbor = None
-            best_score = float('-inf')
+        Returns
+        -------
+        numpy.ndarray
+            Array `int32` de rótulos atualizado (o mesmo objeto de `self.labels`).
+        """
+        weights = np.asarray(weights)
+        if weights.shape != self.shape:
+            raise ValueError("O novo mapa de pesos deve ter a mesma forma do anterior")
+        if self.n_subsets is None:
+            raise ValueError("Execute partition antes de repartition")
+        
+        if not self.splits:
+            # Estado restaurado sem as frações de referência: usa as dos pesos anteriores
+            self._record_splits()
+        self.weights = weights
+        flat_weights = weights.reshape(-1)
+        order, bounds = self._label_order()
+        node_weights = self._node_weights(flat_weights, order)
+        
+        leaf_labels = self.prefix_table
+        leaves = []
+        tree = {}
+        cut_report = {}
+        recut = []
+        kept = {}
+        
+        def node_indices(prefix):
+            """Células atuais de um nó: as folhas com esse prefixo têm rótulos consecutivos."""
+            first = bisect.bisect_left(self.prefixes, prefix)
+            last = bisect.bisect_left(self.prefixes, prefix + '2')
+            return order[bounds[first]:bounds[last]]
+        
+        def descend(prefix, n_subsets):
+            if prefix in leaf_labels:
+                leaves.append((prefix, node_indices(prefix)))
+                return
             
-            for neighbor in second_neighbors:
-                # Calcula quanto esse vizinho aproximaria o subconjunto do seu peso alvo
-                new_deficit = deficit2 - (input_dict[neighbor] / target_weight2)
-                score = abs(new_deficit) - abs(deficit2)
-                
-                # Quanto mais negativo o score, melhor (significa maior redução no déficit)
-                if score < best_score:
-                    best_score = score
-                    best_neighbor = neighbor
+            total = node_weights[prefix]
+            split = node_weights.get(prefix + '0', 0.0) / total if total > 0 else 0.0
+            n1 = n_subsets // 2
+            target = n1 / n_subsets
+            previous = self.splits.get(prefix, target)
             
-            # Adiciona o melhor vizinho ao segundo subconjunto
-            second_subset[best_neighbor] = input_dict[best_neighbor]
-            assigned.add(best_neighbor)
- 
-    # Handle remaining unassigned points
-    # Trata os pontos que não foram atribuídos durante o crescimento de região
-    # (geralmente pontos que estão desconectados ou isolados)
-    unassigned = [coord for coord in input_dict if coord not in assigned]
-    
-    # MODIFICAÇÃO: Atribuir pontos restantes apenas com base no déficit de peso
-    # Para cada ponto não atribuído, verifica qual subconjunto ficaria mais próximo
-    # do seu peso alvo ao receber este ponto
-    for coord in unassigned:
-        weight1 = sum(first_subset.values())
-        weight2 = sum(second_subset.values())
-        
-        # Verifica se adicionar o ponto ao primeiro subconjunto o aproximaria mais
-        # do seu peso alvo do que deixá-lo como está
-        if abs(weight1 + input_dict[coord] - target_weight1) < abs(weight1 - target_weight1):
-            first_subset[coord] = input_dict[coord]
-        else:
-            # Caso contrário, adiciona ao segundo subconjunto
-            second_subset[coord] = input_dict[coord]
-  
-    return first_subset, second_subset
-
-def recursive_binary_subset_division_balanced(input_dict, n_subsets=2, current_depth=0, binary_prefix=''):
-    """
-    Recursively divides a set of weighted coordinates into balanced, connected subsets.
+            if (abs(split - previous) <= tolerance or
+                    abs(split - target) <= max(tolerance, abs(previous - target))):
+                kept[prefix] = previous
+                tree[prefix] = self.tree[prefix]
+                if prefix in self.cut_report:
+                    cut_report[prefix] = self.cut_report[prefix]
+                for child, child_subsets in ((prefix + '0', n1), (prefix + '1', n_subsets - n1)):
+                    if child in node_weights:
+                        descend(child, child_subsets)
+            elif self.multisection:
+                recut.append(prefix)
+                leaves.extend(multisection_subset_division_indices(
+                    flat_weights, self.shape, node_indices(prefix), n_subsets, len(prefix), prefix,
+                    self.origin, tree, self.tree, None if self.multisection is True else int(self.multisection)
+                ))
+            else:
+                recut.append(prefix)
+                leaves.extend(recursive_binary_subset_division_indices(
+                    flat_weights, self.shape, node_indices(prefix), n_subsets, len(prefix), prefix,
+                    self.origin, tree, self.tree, self.engine, self.refine, cut_report
+                ))
+        
+        descend('', self.n_subsets)
+        
+        leaves.sort(key=lambda leaf: leaf[0])
+        self.tree = tree
+        self.cut_report = cut_report
+        self.recut_prefixes = recut
+        self._set_leaves(leaves)
+        # Os nós mantidos guardam a fração do seu último corte, para que pequenas variações
+        # sucessivas não se acumulem sem recorte
+        self._record_splits()
+        self.splits.update(kept)
+        return self.labels
     
-    Parameters
-    ----------
-    input_dict : dict
-        Dictionary of coordinates and weights.
-    n_subsets : int
-        Total number of desired subsets.
-    current_depth : int
-        Current recursion depth.
-    binary_prefix : str
-        Current binary prefix for subset identification.
+    def _node_weights(self, flat_weights, order):
+        """Peso de cada nó da árvore (folhas e nós internos), indexado pelo prefixo."""
+        leaf_weights = np.bincount(self.labels.reshape(-1)[order], weights=flat_weights[order],
+                                   minlength=self.n_parts)
+        node_weights = {}
+        for prefix, weight in zip(self.prefixes, leaf_weights.tolist()):
+            for length in range(len(prefix) + 1):
+                node_weights[prefix[:length]] = node_weights.get(prefix[:length], 0.0) + weight
+        return node_weights
     
-    Returns
-    -------
-    dict
-        Dictionary of subsets identified by binary strings.
-    """
-    # Base case: if n_subsets=1 or empty dictionary
-    if n_subsets <= 1 or len(input_dict) <= 1:
-        return {binary_prefix: input_dict}
+    def _record_splits(self):
+        """Guarda em `splits` a fração do peso no primeiro filho de cada nó interno."""
+        order, _ = self._label_order()
+        node_weights = self._node_weights(self.weights.reshape(-1), order)
+        leaves = set(self.prefixes)
+        self.splits = {prefix: node_weights.get(prefix + '0', 0.0) / total if total > 0 else 0.0
+                       for prefix, total in node_weights.items() if prefix not in leaves}
     
-    # Calculate balanced numbers for each branch
-    n1 = n_subsets // 2
-    n2 = n_subsets - n1
+    def _label_order(self):
+        """
+        Ordena as células rotuladas por rótulo.
+        
+        Returns
+        -------
+        tuple
+            (order, bounds) onde `order` contém os índices planos das células rotuladas agrupados
+            por rótulo e as células do rótulo `l` são `order[bounds[l]:bounds[l + 1]]`.
+        """
+        flat_labels = self.labels.reshape(-1)
+        order = np.flatnonzero(flat_labels >= 0)
+        order = order[np.argsort(flat_labels[order], kind='stable')]
+        bounds = np.searchsorted(flat_labels[order], np.arange(self.n_parts + 1))
+        return order, bounds
     
-    # Divide set into two balanced, connected subsets
-    first_subset, second_subset = find_best_projection_and_division_balanced(input_dict, n1, n2)
+    def _set_leaves(self, leaves):
+        """Preenche `labels` e `prefixes` a partir das folhas (prefixo, índices) da recursão."""
+        self.labels.fill(-1)
+        flat_labels = self.labels.reshape(-1)
+        self.prefixes = []
+        for label, (prefix, indices) in enumerate(leaves):
+            flat_labels[indices] = label
+            self.prefixes.append(prefix)
     
-    # Recursive calls for each subset
-    result = {}
+    @property
+    def n_parts(self):
+        """Número de subdomínios efetivamente criados."""
+        return len(self.prefixes)
     
-    if first_subset:
-        result.update(recursive_binary_subset_division_balanced(
-            first_subset, 
-            n1, 
-            current_depth + 1, 
-            binary_prefix + '0'
-        ))
+    @property
+    def prefix_table(self):
+        """Dicionário prefixo binário -> rótulo inteiro."""
+        return {prefix: label for label, prefix in enumerate(self.prefixes)}
     
-    if second_subset:
-        result.update(recursive_binary_subset_division_balanced(
-            second_subset, 
-            n2, 
-            current_depth + 1, 
-            binary_prefix + '1'
-        ))
+    def part_indices(self, label):
+        """
+        Retorna os índices planos das células de um subdomínio.
+        
+        Parameters
+        ----------
+        label : int
+            Rótulo do subdomínio.
+        
+        Returns
+        -------
+        numpy.ndarray
+            Índices planos (linha * p + coluna) das células com esse rótulo.
+        """
+        return np.flatnonzero(self.labels.reshape(-1) == label)
     
-    return result
+    def quality(self):
+        """
+        Avalia a partição atual com `evaluate_label_quality`.
+        
+        Returns
+        -------
+        dict
+            Métricas de balanceamento, corte, conectividade e cobertura da partição.
+        """
+        return evaluate_label_quality(self.labels, self.weights, self.mask, self.n_parts)
+    
+    def to_dict(self):
+        """
+        Converte o estado no formato de resultado de `recursive_binary_subset_division_balanced`.
+        
+        Returns
+        -------
+        dict
+            Dicionário {prefixo: {(i, j): peso}} ({prefixo: {(i, j, k): peso}} para malhas 3D).
+        """
+        flat_weights = self.weights.reshape(-1)
+        order, bounds = self._label_order()
+        
+        result = {}
+        for label, prefix in enumerate(self.prefixes):
+            cells = order[bounds[label]:bounds[label + 1]]
+            coords = np.unravel_index(cells, self.shape)
+            result[prefix] = dict(zip(
+                zip(*[(axis_coords + offset).tolist() for axis_coords, offset in zip(coords, self.origin)]),
+                flat_weights[cells].tolist()
+            ))
+        return result
+
 def evaluate_partition_quality(result, original_dict):
     """
     Avalia a qualidade da partição considerando equilibrio de pesos.
@@ -537,6 +2518,123 @@ def evaluate_partition_quality(result, original_dict):
         'subset_sizes': subset_sizes
     }
 
+def evaluate_label_quality(labels, weights, mask=None, n_parts=None):
+    """
+    Avalia a qualidade e a validade de uma partição representada por um array de rótulos.
+    
+    Todas as métricas são calculadas com operações vetorizadas em O(n) (`np.bincount` e
+    comparações entre o array e suas versões deslocadas), de modo que a avaliação pode ser
+    executada como verificação após cada reparticionamento, mesmo com milhões de células.
+    
+    Parameters
+    ----------
+    labels : numpy.ndarray
+        Array 2D ou 3D de rótulos inteiros (por exemplo, `PartitionState.labels`); -1 indica
+        célula não atribuída.
+    weights : numpy.ndarray
+        Mapa de pesos 2D (ou malha 3D) com a mesma forma de `labels`.
+    mask : numpy.ndarray, optional
+        Máscara booleana das células que devem estar atribuídas. Se None, são as células
+        com rótulo não negativo (e as verificações de cobertura são triviais).
+    n_parts : int, optional
+        Número de subdomínios esperado. Se None, usa o maior rótulo mais um.
+    
+    Returns
+    -------
+    dict
+        Métricas da partição:
+        
+        - 'total_weight', 'mean_weight', 'max_weight', 'min_weight', 'weight_variance',
+          'weight_range', 'weight_percentage_range': estatísticas de peso, como em
+          `evaluate_partition_quality`;
+        - 'imbalance': fator de desbalanceamento (peso máximo / peso médio);
+        - 'subset_weights', 'subset_sizes': peso e número de células de cada rótulo;
+        - 'edge_cut': número de pares de células vizinhas por face (Von Neumann) com rótulos
+          diferentes;
+        - 'boundary_cells': número de células de cada rótulo com vizinho de outro rótulo;
+        - 'components': número de componentes conectados de cada rótulo;
+        - 'unassigned_cells': células da máscara sem rótulo;
+        - 'cells_outside_mask': células rotuladas fora da máscara;
+        - 'empty_parts': rótulos sem nenhuma célula;
+        - 'disconnected_parts': rótulos com mais de um componente;
+        - 'valid': True se todas as células da máscara estão atribuídas, nenhuma célula fora
+          dela está rotulada e todos os rótulos são não vazios e conectados.
+    
+    Examples
+    --------
+    >>> state = PartitionState(weights, mask=weights > 0)
+    >>> quality = evaluate_label_quality(state.partition(8), weights, state.mask)
+    >>> quality['valid'], quality['imbalance']
+    (True, 1.0003)
+    """
+    labels = np.asarray(labels)
+    weights = np.asarray(weights)
+    if labels.shape != weights.shape or labels.ndim not in (2, 3):
+        raise ValueError("Os rótulos e os pesos devem ser arrays 2D ou 3D de mesma forma")
+    
+    assigned = labels >= 0
+    if mask is None:
+        mask = assigned
+    else:
+        mask = np.asarray(mask, dtype=bool)
+    if n_parts is None:
+        n_parts = int(labels.max()) + 1 if assigned.any() else 0
+    
+    flat_labels = labels[assigned].astype(np.int64)
+    subset_weights = np.bincount(flat_labels, weights=weights[assigned], minlength=n_parts)
+    subset_sizes = np.bincount(flat_labels, minlength=n_parts)
+    
+    # Pares de vizinhos ao longo de cada eixo ((i+1, j) e (i, j+1) em 2D) com os dois lados
+    # atribuídos e rótulos diferentes
+    edge_cut = 0
+    on_boundary = np.zeros(labels.shape, dtype=bool)
+    for axis in range(labels.ndim):
+        lower = tuple(slice(None, -1) if dim == axis else slice(None) for dim in range(labels.ndim))
+        upper = tuple(slice(1, None) if dim == axis else slice(None) for dim in range(labels.ndim))
+        here, there = labels[lower], labels[upper]
+        here_flag, there_flag = on_boundary[lower], on_boundary[upper]
+        differ = (here >= 0) & (there >= 0) & (here != there)
+        edge_cut += int(np.count_nonzero(differ))
+        here_flag |= differ
+        there_flag |= differ
+    boundary_cells = np.bincount(labels[on_boundary].astype(np.int64), minlength=n_parts)
+    
+    # Componentes conectados de cada rótulo
+    components = conn.components_per_label(labels, n_labels=n_parts)
+    
+    total_weight = float(weights[mask].sum())
+    mean_weight = total_weight / n_parts if n_parts else 0.0
+    max_weight = float(subset_weights.max()) if n_parts else 0.0
+    min_weight = float(subset_weights.min()) if n_parts else 0.0
+    weight_range = max_weight - min_weight
+    
+    unassigned_cells = int(np.count_nonzero(mask & ~assigned))
+    cells_outside_mask = int(np.count_nonzero(assigned & ~mask))
+    empty_parts = np.flatnonzero(subset_sizes[:n_parts] == 0)
+    disconnected_parts = np.flatnonzero(components[:n_parts] > 1)
+    
+    return {
+        'total_weight': total_weight,
+        'mean_weight': mean_weight,
+        'max_weight': max_weight,
+        'min_weight': min_weight,
+        'weight_variance': float(np.var(subset_weights)) if n_parts else 0.0,
+        'weight_range': weight_range,
+        'weight_percentage_range': weight_range / mean_weight * 100 if mean_weight else 0.0,
+        'imbalance': max_weight / mean_weight if mean_weight else 0.0,
+        'subset_weights': subset_weights,
+        'subset_sizes': subset_sizes,
+        'edge_cut': edge_cut,
+        'boundary_cells': boundary_cells,
+        'components': components,
+        'unassigned_cells': unassigned_cells,
+        'cells_outside_mask': cells_outside_mask,
+        'empty_parts': empty_parts,
+        'disconnected_parts': disconnected_parts,
+        'valid': (unassigned_cells == 0 and cells_outside_mask == 0 and len(empty_parts) == 0
+                  and len(disconnected_parts) == 0 and len(subset_sizes) == n_parts),
+    }
+
 def convert_result_to_domain_assignment(result, m, p):
     """
     Converte os subconjuntos resultantes em um array 2D de atribuições de domínio.
@@ -566,6 +2664,38 @@ def convert_result_to_domain_assignment(result, m, p):
     
     return domain_assignment
 
+def convert_result_to_label_array(result, m, p):
+    """
+    Converte os subconjuntos resultantes em um array 2D de rótulos inteiros.
+    
+    Alternativa compacta a `convert_result_to_domain_assignment`: em vez de um array de strings
+    (dtype object), retorna rótulos `int32` e a tabela que associa cada prefixo binário ao rótulo.
+    
+    Parameters
+    ----------
+    result : dict
+        Dicionário com os subconjuntos particionados.
+    m : int
+        Primeira dimensão da grade.
+    p : int
+        Segunda dimensão da grade.
+    
+    Returns
+    -------
+    tuple
+        (labels, prefix_table) onde `labels` é um array `int32` (m, p) com -1 nas células
+        não atribuídas e `prefix_table` é o dicionário prefixo -> rótulo, em ordem de prefixo.
+    """
+    labels = np.full((m, p), -1, dtype=np.int32)
+    prefix_table = {prefix: label for label, prefix in enumerate(sorted(result))}
+    
+    for prefix, subset in result.items():
+        if subset:
+            coords = np.array(list(subset.keys()), dtype=np.int64).reshape(-1, 2)
+            labels[coords[:, 0], coords[:, 1]] = prefix_table[prefix]
+    
+    return labels, prefix_table
+
 def main():
     """
     Função principal para teste do algoritmo de divisão de subconjuntos.
@@ -0,0 +1,300 @@
+"""
+Renderização em lote, fora da tela, de séries temporais de partições: um PNG por passo de tempo
+com o mapa de pesos, as fronteiras dos subdomínios e, opcionalmente, as duas vistas da malha 3D
+de `plot_both_mesh_views`.
+
+Os quadros são desenhados em figuras `matplotlib.figure.Figure` com o canvas Agg, sem `pyplot`
+e sem janela, em um pool de processos. Cada processo cria uma única figura e, a cada passo,
+apenas atualiza os dados dos artistas (imagem, fronteiras, faces 3D e títulos).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+from matplotlib import colormaps
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+import mesh3d
+import nucleos_compilados as nc
+
+# Nome padrão dos arquivos dos quadros
+DEFAULT_FILENAME = 'passo_{step:05d}.png'
+
+class FrameRenderer:
+    """
+    Desenha quadros de uma série temporal reutilizando uma única figura.
+    
+    A figura e os artistas são criados no primeiro quadro; nos seguintes, apenas os dados são
+    trocados (`set_data`, `set_segments`, `set_verts`, ...), o que evita recriar eixos, barras de
+    cores e textos a cada passo.
+    
+    Parameters
+    ----------
+    figsize : tuple, optional
+        Tamanho da figura em polegadas. Se None, (7, 6) sem malha 3D e (20, 6) com malha 3D.
+    dpi : int, optional
+        Resolução dos PNGs. Valor padrão é 100.
+    clim : tuple, optional
+        Limites (vmin, vmax) fixos da escala de cores dos pesos, para comparar os passos. Se None,
+        a escala acompanha os valores de cada passo.
+    max_pixels : int, optional
+        Número máximo de elementos da imagem do mapa de pesos; mapas maiores são reduzidos em
+        blocos com a média (ver `mesh3d.block_reduce`). Valor padrão é 250000.
+    
+    Examples
+    --------
+    >>> renderer = FrameRenderer(clim=(0, 10))
+    >>> renderer.render({'weights': weights, 'labels': labels}, 0, 'passo_00000.png')
+    """
+    
+    def __init__(self, figsize=None, dpi=100, clim=None, max_pixels=250000):
+        self.figsize = figsize
+        self.dpi = dpi
+        self.clim = clim
+        self.max_pixels = max_pixels
+        self.figure = None
+    
+    def _setup(self, frame):
+        """Cria a figura e os artistas a partir do primeiro quadro."""
+        with_mesh = frame.get('mesh') is not None
+        figsize = self.figsize or ((20, 6) if with_mesh else (7, 6))
+        self.figure = Figure(figsize=figsize, dpi=self.dpi)
+        FigureCanvasAgg(self.figure)
+        
+        # Mapa de pesos com as fronteiras da partição
+        self.ax = self.figure.add_subplot(1, 3 if with_mesh else 1, 1)
+        self.image = self.ax.imshow(np.zeros((1, 1)), cmap=colormaps['viridis'], interpolation='nearest')
+        self.boundaries = LineCollection([], colors='k', linewidths=0.8)
+        self.ax.add_collection(self.boundaries, autolim=False)
+        self.figure.colorbar(self.image, ax=self.ax)
+        self.ax.set_title('Matriz de Pesos')
+        self.ax.set_xlabel('Índice da Coluna')
+        self.ax.set_ylabel('Índice da Linha')
+        self.title = self.figure.suptitle('')
+        
+        # Vistas 3D da malha, como em `plot_both_mesh_views`
+        self.mesh_views = []
+        if with_mesh:
+            for position, show_refinement in ((2, False), (3, True)):
+                ax = self.figure.add_subplot(1, 3, position, projection='3d')
+                collection = Poly3DCollection(np.zeros((0, 4, 3)), linewidths=0.1, edgecolors='k')
+                ax.add_collection3d(collection)
+                ax.set_xlabel('X')
+                ax.set_ylabel('Y')
+                ax.set_zlabel('Z')
+                ax.view_init(elev=20, azim=30)
+                if show_refinement:
+                    ax.set_title('Malha 3D com Células Refinadas')
+                    mappable = ScalarMappable(cmap=colormaps['viridis'], norm=Normalize(vmin=1, vmax=2))
+                    self.figure.colorbar(mappable, ax=ax, orientation='vertical', label='Fator de Refinamento')
+                else:
+                    ax.set_title('Malha 3D com Células Ativas/Inativas')
+                    mappable = None
+                self.mesh_views.append((ax, collection, show_refinement, mappable))
+    
+    def _update_weights(self, weights, labels):
+        nx, ny = weights.shape
+        block = max(1, int(np.ceil(np.sqrt(weights.size / self.max_pixels))))
+        data = mesh3d.block_reduce(weights, block)
+        bx, by = data.shape
+        self.image.set_data(data)
+        self.image.set_extent((-0.5, by * block - 0.5, bx * block - 0.5, -0.5))
+        if self.clim is not None:
+            self.image.set_clim(*self.clim)
+        else:
+            self.image.set_clim(np.nanmin(data), np.nanmax(data))
+        self.ax.set_xlim(-0.5, ny - 0.5)
+        self.ax.set_ylim(nx - 0.5, -0.5)
+        self.boundaries.set_segments([] if labels is None else mesh3d.partition_boundaries(labels))
+    
+    def _update_mesh(self, mesh):
+        mesh = np.asarray(mesh)
+        for ax, collection, show_refinement, mappable in self.mesh_views:
+            classes, cell_colors, norm, _ = mesh3d._mesh_cell_colors(mesh, show_refinement)
+            vertices, cells = mesh3d.mesh_boundary_faces(classes)
+            collection.set_verts(vertices)
+            collection.set_facecolor(cell_colors[cells])
+            collection.set_edgecolor('k')
+            if mappable is not None:
+                mappable.set_norm(norm)
+            ax.set_xlim(0, mesh.shape[0])
+            ax.set_ylim(0, mesh.shape[1])
+            ax.set_zlim(0, mesh.shape[2])
+    
+    def render(self, frame, step, path):
+        """
+        Desenha um quadro e grava o PNG.
+        
+        Parameters
+        ----------
+        frame : dict
+            Dados do passo: 'weights' (mapa de pesos 2D), e opcionalmente 'labels' (rótulos 2D da
+            partição) e 'mesh' (malha 3D).
+        step : int
+            Número do passo, mostrado no título.
+        path : str
+            Arquivo PNG de saída.
+        
+        Returns
+        -------
+        str
+            O caminho do arquivo gravado.
+        """
+        if self.figure is None:
+            self._setup(frame)
+        self._update_weights(np.asarray(frame['weights']), frame.get('labels'))
+        if self.mesh_views and frame.get('mesh') is not None:
+            self._update_mesh(frame['mesh'])
+        self.title.set_text(f'Passo {step}')
+        self.figure.savefig(path, dpi=self.dpi)
+        return path
+
+# Estado de cada processo do pool: fonte dos quadros, renderizador e opções
+_WORKER_STATE = {}
+
+def _init_render_worker(loader, output_dir, filename, options, backend='auto'):
+    """Inicializa um processo do pool com um único `FrameRenderer` e o backend do processo principal."""
+    nc.set_backend(backend)
+    _WORKER_STATE['loader'] = loader
+    _WORKER_STATE['output_dir'] = output_dir
+    _WORKER_STATE['filename'] = filename
+    _WORKER_STATE['renderer'] = FrameRenderer(**options)
+
+def _render_task(items):
+    """Desenha um bloco de passos consecutivos no processo atual."""
+    renderer = _WORKER_STATE['renderer']
+    paths = []
+    for step, frame in items:
+        if frame is None:
+            frame = _WORKER_STATE['loader'](step)
+        path = os.path.join(_WORKER_STATE['output_dir'], _WORKER_STATE['filename'].format(step=step))
+        paths.append(renderer.render(frame, step, path))
+    return paths
+
+def render_frames(frames, output_dir, steps=None, workers=None, chunk_size=8, filename=DEFAULT_FILENAME,
+                  animation=None, fps=10, **options):
+    """
+    Grava um PNG por passo de tempo, em paralelo e fora da tela.
+    
+    Os passos são divididos em blocos consecutivos de `chunk_size` e distribuídos a um pool de
+    processos; cada processo reutiliza uma única figura (`FrameRenderer`) para todos os seus quadros.
+    
+    Parameters
+    ----------
+    frames : sequence or callable
+        Sequência de quadros (dicionários com 'weights' e, opcionalmente, 'labels' e 'mesh'; ver
+        `FrameRenderer.render`) ou função `frames(step)` que carrega o quadro de um passo. Com uma
+        função (que deve ser definida no nível de um módulo), cada processo lê os seus próprios
+        quadros, sem enviar os arrays pelo pool.
+    output_dir : str
+        Diretório dos PNGs (criado se não existir).
+    steps : iterable of int, optional
+        Passos a desenhar. Obrigatório se `frames` for uma função; para uma sequência, o padrão é
+        todos os seus índices.
+    workers : int, optional
+        Número de processos. Se None, usa `os.cpu_count()`; com 1, desenha no processo atual.
+    chunk_size : int, optional
+        Número de passos por tarefa do pool. Valor padrão é 8.
+    filename : str, optional
+        Modelo do nome dos arquivos, formatado com `step`. Valor padrão é 'passo_{step:05d}.png'.
+    animation : str, optional
+        Se dado, monta os quadros em uma animação nesse arquivo (ver `assemble_animation`).
+    fps : float, optional
+        Quadros por segundo da animação. Valor padrão é 10.
+    **options
+        Opções de `FrameRenderer` (`figsize`, `dpi`, `clim`, `max_pixels`).
+    
+    Returns
+    -------
+    list of str
+        Caminhos dos PNGs, na ordem dos passos.
+    
+    Examples
+    --------
+    >>> frames = [{'weights': w, 'labels': PartitionState(w).partition(16)} for w in series]
+    >>> paths = render_frames(frames, 'quadros', workers=8, clim=(0, 10), animation='particao.gif')
+    """
+    if callable(frames):
+        if steps is None:
+            raise ValueError("`steps` é obrigatório quando `frames` é uma função")
+        loader = frames
+        items = [(step, None) for step in steps]
+    else:
+        loader = None
+        steps = range(len(frames)) if steps is None else steps
+        items = [(step, frames[step]) for step in steps]
+    
+    os.makedirs(output_dir, exist_ok=True)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    
+    if workers <= 1 or len(chunks) <= 1:
+        _init_render_worker(loader, output_dir, filename, options, nc.get_backend())
+        try:
+            paths = [path for chunk in chunks for path in _render_task(chunk)]
+        finally:
+            _WORKER_STATE.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_render_worker,
+                                 initargs=(loader, output_dir, filename, options, nc.get_backend())) as pool:
+            paths = [path for chunk_paths in pool.map(_render_task, chunks) for path in chunk_paths]
+    
+    if animation is not None:
+        assemble_animation(paths, animation, fps=fps)
+    return paths
+
+def assemble_animation(paths, output, fps=10):
+    """
+    Monta uma sequência de PNGs em uma animação.
+    
+    Arquivos '.gif' são gravados com o Pillow (dependência do Matplotlib); outros formatos (por
+    exemplo '.mp4') usam o `FFMpegWriter` do Matplotlib e exigem o ffmpeg instalado.
+    
+    Parameters
+    ----------
+    paths : list of str
+        PNGs dos quadros, na ordem da animação.
+    output : str
+        Arquivo da animação.
+    fps : float, optional
+        Quadros por segundo. Valor padrão é 10.
+    
+    Returns
+    -------
+    str
+        O caminho da animação.
+    """
+    if not paths:
+        raise ValueError("Nenhum quadro para montar a animação")
+    
+    if output.lower().endswith('.gif'):
+        from PIL import Image
+        
+        first = Image.open(paths[0])
+        # Os demais quadros são lidos sob demanda, sem manter todos em memória
+        others = (Image.open(path) for path in paths[1:])
+        first.save(output, save_all=True, append_images=others, duration=1000 / fps, loop=0)
+        return output
+    
+    from matplotlib.animation import FFMpegWriter
+    from matplotlib.image import imread
+    
+    if not FFMpegWriter.isAvailable():
+        raise RuntimeError("ffmpeg não encontrado: use um arquivo '.gif' ou instale o ffmpeg")
+    pixels = imread(paths[0])
+    height, width = pixels.shape[:2]
+    figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_axes((0, 0, 1, 1))
+    ax.set_axis_off()
+    image = ax.imshow(pixels)
+    writer = FFMpegWriter(fps=fps)
+    with writer.saving(figure, output, dpi=100):
+        for path in paths:
+            image.set_data(imread(path))
+            writer.grab_frame()
+    return output
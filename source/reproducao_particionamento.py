@@ -0,0 +1,363 @@
+"""
+Reprodução offline de séries de mapas de pesos para estudar políticas de reparticionamento.
+
+Os mapas de cada passo de tempo são lidos um de cada vez (de um diretório de arquivos `.npy`,
+de uma pilha `.npy` mapeada em memória ou de qualquer sequência de arrays) e aplicados a uma
+ou mais políticas, como "a cada N passos" ou "quando o desbalanceamento passar de um limiar".
+Para cada passo e política são registrados o tempo de particionamento, o desbalanceamento, o
+corte de arestas e o número de células que mudaram de subdomínio em relação ao passo anterior.
+
+Uso
+---
+    python reproducao_particionamento.py pesos_aim.npy -k 64 --policy every:1 --policy every:10 \\
+        --policy imbalance:1.05 --policy imbalance:1.05:repartition -o resumo.csv --steps passos.csv
+"""
+import os
+import sys
+import abc
+import csv
+import glob
+import time
+import argparse
+import numpy as np
+import particionamento_por_bissecao as ppb
+
+# Colunas da tabela por passo (`write_records`) e do resumo por política (`write_summary`)
+RECORD_FIELDS = ('policy', 'step', 'action', 'time', 'imbalance_before', 'imbalance', 'edge_cut', 'valid',
+                 'migrated_cells', 'migrated_weight', 'recut_nodes')
+SUMMARY_FIELDS = ('policy', 'steps', 'partitions', 'total_time', 'mean_time', 'mean_imbalance', 'max_imbalance',
+                  'mean_edge_cut', 'migrated_cells', 'migrated_weight', 'invalid_steps')
+
+# Métodos de atualização das políticas: partição do zero ou reparticionamento incremental
+METHODS = ('partition', 'repartition')
+
+class ReplayPolicy(abc.ABC):
+    """
+    Política de reparticionamento: decide, a cada passo, se a partição é atualizada.
+    
+    Classe abstrata: as subclasses implementam `_name` e `due`.
+    
+    Parameters
+    ----------
+    method : str, optional
+        'partition' (padrão) particiona do zero com `PartitionState.partition`; 'repartition'
+        reaproveita a árvore anterior com `PartitionState.repartition`.
+    tolerance : float, optional
+        Tolerância de `repartition`. Valor padrão é 0.02.
+    """
+    
+    def __init__(self, method='partition', tolerance=0.02):
+        if method not in METHODS:
+            raise ValueError(f"Método {method!r} inválido. Opções: {METHODS}")
+        self.method = method
+        self.tolerance = tolerance
+    
+    @property
+    def name(self):
+        suffix = '' if self.method == 'partition' else ':' + self.method
+        return self._name() + suffix
+    
+    @abc.abstractmethod
+    def _name(self):
+        """Nome da política sem o sufixo do método (por exemplo, 'every:10')."""
+    
+    @abc.abstractmethod
+    def due(self, steps_since, imbalance):
+        """
+        Indica se o passo deve ser reparticionado.
+        
+        Parameters
+        ----------
+        steps_since : int
+            Passos desde a última atualização (1 no passo seguinte a ela).
+        imbalance : float
+            Desbalanceamento (peso máximo / peso médio) da partição atual com os pesos do passo.
+        """
+
+class EveryNSteps(ReplayPolicy):
+    """Atualiza a partição a cada `n` passos (`n = 1`: em todos os passos)."""
+    
+    def __init__(self, n, method='partition', tolerance=0.02):
+        super().__init__(method, tolerance)
+        if n < 1:
+            raise ValueError("O intervalo entre atualizações deve ser ao menos 1")
+        self.n = int(n)
+    
+    def _name(self):
+        return f'every:{self.n}'
+    
+    def due(self, steps_since, imbalance):
+        return steps_since >= self.n
+
+class ImbalanceThreshold(ReplayPolicy):
+    """Atualiza a partição quando o desbalanceamento com os pesos do passo passa de `threshold`."""
+    
+    def __init__(self, threshold, method='partition', tolerance=0.02):
+        super().__init__(method, tolerance)
+        self.threshold = float(threshold)
+    
+    def _name(self):
+        return f'imbalance:{self.threshold:g}'
+    
+    def due(self, steps_since, imbalance):
+        return imbalance > self.threshold
+
+# Políticas aceitas por `parse_policy`
+POLICIES = {'every': EveryNSteps, 'imbalance': ImbalanceThreshold}
+
+def parse_policy(spec):
+    """
+    Cria uma política a partir de um texto 'tipo:parâmetro[:método]'.
+    
+    Examples
+    --------
+    >>> parse_policy('every:10').name
+    'every:10'
+    >>> parse_policy('imbalance:1.05:repartition').name
+    'imbalance:1.05:repartition'
+    >>> parse_policy('always').name
+    'every:1'
+    """
+    if isinstance(spec, ReplayPolicy):
+        return spec
+    if spec == 'always':
+        return EveryNSteps(1)
+    kind, _, rest = spec.partition(':')
+    parameter, _, method = rest.partition(':')
+    if kind not in POLICIES or not parameter:
+        raise ValueError(f"Política {spec!r} inválida. Use 'always', 'every:N' ou 'imbalance:LIMIAR', "
+                         f"opcionalmente seguidos de ':repartition'")
+    value = int(parameter) if kind == 'every' else float(parameter)
+    return POLICIES[kind](value, method or 'partition')
+
+def iter_weight_maps(source, pattern='*.npy'):
+    """
+    Percorre os mapas de pesos de uma série, um passo de cada vez.
+    
+    Parameters
+    ----------
+    source : str or numpy.ndarray or iterable
+        Diretório com um arquivo `.npy` por passo (em ordem alfabética), arquivo `.npy` com uma
+        pilha (n_passos, m, p) ou um único mapa (aberto com `mmap_mode='r'`), array ou sequência
+        de arrays 2D.
+    pattern : str, optional
+        Padrão dos arquivos de um diretório. Valor padrão é '*.npy'.
+    
+    Yields
+    ------
+    numpy.ndarray
+        Mapa de pesos 2D de cada passo, copiado para a memória.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if os.path.isdir(source):
+            for path in sorted(glob.glob(os.path.join(source, pattern))):
+                yield np.array(np.load(path, mmap_mode='r'))
+            return
+        source = np.load(source, mmap_mode='r')
+    if isinstance(source, np.ndarray) and source.ndim == 2:
+        source = source[None]
+    for weights in source:
+        yield np.array(weights)
+
+def _quality(labels, weights, mask, n_parts):
+    """Desbalanceamento, corte de arestas e validade dos rótulos com os pesos dados."""
+    quality = ppb.evaluate_label_quality(labels, weights, mask, n_parts)
+    return quality['imbalance'], quality['edge_cut'], quality['valid']
+
+class _PolicyReplay:
+    """Estado da reprodução de uma política: partição atual e registros por passo."""
+    
+    def __init__(self, policy, n_parts, mask, options):
+        self.policy = policy
+        self.n_parts = n_parts
+        self.mask = mask
+        self.options = options
+        self.state = None
+        self.steps_since = 0
+        self.records = []
+    
+    def step(self, step, weights):
+        """Decide e aplica a ação do passo e registra as métricas com os pesos do passo."""
+        previous = None if self.state is None else self.state.labels.copy()
+        self.steps_since += 1
+        
+        # Partição atual avaliada com os novos pesos
+        before = None if previous is None else _quality(previous, weights, self.mask, self.state.n_parts)
+        if before is None:
+            action = 'partition'
+        elif self.policy.due(self.steps_since, before[0]):
+            action = self.policy.method
+        else:
+            action = 'keep'
+        
+        start = time.perf_counter()
+        if action == 'partition':
+            self.state = ppb.PartitionState(weights, self.mask)
+            self.state.partition(self.n_parts, **self.options)
+        elif action == 'repartition':
+            self.state.repartition(weights, self.policy.tolerance)
+        elapsed = time.perf_counter() - start
+        
+        if action == 'keep':
+            elapsed = 0.0
+            imbalance, edge_cut, valid = before
+            migrated = np.zeros(weights.shape, dtype=bool)
+        else:
+            self.steps_since = 0
+            labels = self.state.labels
+            imbalance, edge_cut, valid = _quality(labels, weights, self.mask, self.state.n_parts)
+            migrated = np.zeros(weights.shape, dtype=bool) if previous is None else \
+                (previous >= 0) & (labels >= 0) & (previous != labels)
+        
+        self.records.append({
+            'policy': self.policy.name, 'step': step, 'action': action, 'time': elapsed,
+            'imbalance_before': None if before is None else before[0], 'imbalance': imbalance,
+            'edge_cut': edge_cut, 'valid': valid, 'migrated_cells': int(np.count_nonzero(migrated)),
+            'migrated_weight': float(weights[migrated].sum()),
+            'recut_nodes': len(self.state.recut_prefixes) if action == 'repartition' else 0,
+        })
+        return self.records[-1]
+
+def replay(source, n_parts, policies=('always',), mask=None, log=None, **options):
+    """
+    Reproduz uma série de mapas de pesos com cada política, lendo cada passo uma única vez.
+    
+    No primeiro passo todas as políticas particionam do zero. Nos seguintes, a partição atual
+    é avaliada com os novos pesos e a política decide se ela é mantida ou atualizada.
+    
+    Parameters
+    ----------
+    source : str or numpy.ndarray or iterable
+        Série de mapas de pesos 2D (ver `iter_weight_maps`).
+    n_parts : int
+        Número de subdomínios.
+    policies : sequence, optional
+        Políticas (`ReplayPolicy` ou textos aceitos por `parse_policy`). Valor padrão é ('always',).
+    mask : numpy.ndarray, optional
+        Máscara das células particionadas, fixa em toda a série. Se None, as células de peso
+        positivo do primeiro passo; pesos fora da máscara são ignorados.
+    log : callable, optional
+        Função chamada com uma linha de texto após cada passo de cada política.
+    **options
+        Opções de `PartitionState.partition` (por exemplo `engine`, `multisection`, `batched`).
+    
+    Returns
+    -------
+    dict
+        {nome da política: lista de registros por passo}, com os campos de `RECORD_FIELDS`.
+    
+    Examples
+    --------
+    >>> results = replay('pesos_aim.npy', 64, ['every:1', 'every:10', 'imbalance:1.05'])
+    >>> print(format_summary(results))
+    """
+    policies = [parse_policy(policy) for policy in policies]
+    names = [policy.name for policy in policies]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Políticas repetidas: {names}")
+    
+    replays = None
+    for step, weights in enumerate(iter_weight_maps(source)):
+        if weights.ndim != 2:
+            raise ValueError("Os mapas de pesos devem ser bidimensionais")
+        if replays is None:
+            mask = weights > 0 if mask is None else np.asarray(mask, dtype=bool)
+            replays = [_PolicyReplay(policy, n_parts, mask, options) for policy in policies]
+        for policy_replay in replays:
+            record = policy_replay.step(step, weights)
+            if log is not None:
+                log(f"{record['policy']:<28} passo {step:>5} {record['action']:<12} "
+                    f"{record['time'] * 1e3:9.2f} ms  desbalanceamento {record['imbalance']:.4f}")
+    
+    return {policy_replay.policy.name: policy_replay.records for policy_replay in replays or []}
+
+def summarize(records):
+    """
+    Resumo dos registros de uma política.
+    
+    Returns
+    -------
+    dict
+        Campos de `SUMMARY_FIELDS`: passos, atualizações (incluindo a partição inicial), tempo
+        total e médio por atualização, desbalanceamento médio e máximo, corte médio, células e
+        peso migrados e passos com partição inválida.
+    """
+    updates = [record for record in records if record['action'] != 'keep']
+    imbalances = [record['imbalance'] for record in records]
+    total_time = sum(record['time'] for record in updates)
+    return {
+        'policy': records[0]['policy'] if records else None,
+        'steps': len(records),
+        'partitions': len(updates),
+        'total_time': total_time,
+        'mean_time': total_time / len(updates) if updates else 0.0,
+        'mean_imbalance': float(np.mean(imbalances)) if records else 0.0,
+        'max_imbalance': max(imbalances, default=0.0),
+        'mean_edge_cut': float(np.mean([record['edge_cut'] for record in records])) if records else 0.0,
+        'migrated_cells': sum(record['migrated_cells'] for record in records),
+        'migrated_weight': sum(record['migrated_weight'] for record in records),
+        'invalid_steps': sum(not record['valid'] for record in records),
+    }
+
+def summary_table(results):
+    """Lista com o resumo (`summarize`) de cada política, na ordem de `results`."""
+    return [summarize(records) for records in results.values()]
+
+def format_summary(results):
+    """Tabela em texto com uma linha por política."""
+    lines = [f"{'política':<28} {'passos':>6} {'partições':>9} {'tempo (s)':>10} {'desb. médio':>11} "
+             f"{'desb. máx.':>10} {'corte médio':>11} {'migradas':>10} {'inválidos':>9}"]
+    for row in summary_table(results):
+        lines.append(f"{row['policy']:<28} {row['steps']:>6} {row['partitions']:>9} {row['total_time']:>10.3f} "
+                     f"{row['mean_imbalance']:>11.4f} {row['max_imbalance']:>10.4f} {row['mean_edge_cut']:>11.1f} "
+                     f"{row['migrated_cells']:>10} {row['invalid_steps']:>9}")
+    return '\n'.join(lines)
+
+def _write_csv(rows, fields, path):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_summary(results, path):
+    """Grava o resumo de cada política em CSV (colunas de `SUMMARY_FIELDS`)."""
+    _write_csv(summary_table(results), SUMMARY_FIELDS, path)
+
+def write_records(results, path):
+    """Grava os registros de todos os passos e políticas em CSV (colunas de `RECORD_FIELDS`)."""
+    _write_csv([record for records in results.values() for record in records], RECORD_FIELDS, path)
+
+def main(argv=None):
+    """
+    Linha de comando: reproduz a série com as políticas dadas, imprime o resumo e grava as tabelas.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('source', help='diretório com um .npy por passo ou pilha .npy (n_passos, m, p)')
+    parser.add_argument('-k', '--parts', type=int, required=True, help='número de subdomínios')
+    parser.add_argument('--policy', action='append', dest='policies',
+                        help="política: 'always', 'every:N' ou 'imbalance:LIMIAR', com ':repartition' opcional "
+                             "(pode ser repetida; padrão: always)")
+    parser.add_argument('--engine', default='inertial', help='motor de bisseção')
+    parser.add_argument('--multisection', action='store_true', help='multissecção por ordenação')
+    parser.add_argument('--batched', action='store_true', help='recursão por níveis')
+    parser.add_argument('-o', '--output', help='CSV com o resumo por política')
+    parser.add_argument('--steps', help='CSV com os registros de cada passo')
+    parser.add_argument('--quiet', action='store_true', help='não imprime uma linha por passo')
+    
+    args = parser.parse_args(argv)
+    options = {'engine': args.engine}
+    if args.multisection:
+        options['multisection'] = True
+    if args.batched:
+        options['batched'] = True
+    results = replay(args.source, args.parts, args.policies or ['always'], log=None if args.quiet else print,
+                     **options)
+    print(format_summary(results))
+    if args.output:
+        write_summary(results, args.output)
+    if args.steps:
+        write_records(results, args.steps)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+"""
+Gerador vetorizado de reservatórios sintéticos para testes de escala e benchmarks.
+
+A partir de um `numpy.random.Generator` com semente, constrói malhas 3D com estrutura realista:
+contorno irregular com entalhes e furos de células inativas, falhas com rejeito entre camadas,
+canais sinuosos e manchas de refinamento agrupadas em torno de poços, aplicadas com
+`mesh3d.refine_mesh`. Também gera séries temporais das células implícitas do método
+adaptativo implícito (AIM), cuja frente avança a partir dos poços, mais rápido nos canais.
+
+Todas as saídas são arrays (ou arquivos `.npy`, que podem ser abertos com `mmap_mode='r'`),
+sem dicionários intermediários, de modo que malhas de 10^6 células ou mais são geradas em
+poucos segundos.
+
+Examples
+--------
+>>> reservoir = synthetic_reservoir(200, 200, 25, seed=7)
+>>> reservoir['weights'].shape
+(200, 200)
+>>> weights = aim_weight_maps(reservoir, n_steps=50, seed=7, out='pesos_aim.npy')
+"""
+import os
+import numpy as np
+import mesh3d as m3d
+import conectividade as conn
+
+# Arrays de `synthetic_reservoir` gravados por `save_reservoir`
+RESERVOIR_ARRAYS = ('mesh', 'refined', 'weights', 'channels', 'wells', 'intervals', 'refinement')
+
+def _normalized_coordinates(nx, ny):
+    """Coordenadas (x, y) dos centros das colunas, normalizadas para [-1, 1]."""
+    return np.meshgrid((np.arange(nx) + 0.5) / nx * 2 - 1, (np.arange(ny) + 0.5) / ny * 2 - 1, indexing='ij')
+
+def _rotated(x, y, center, angle):
+    """Coordenadas (u, v) ao longo e através da direção `angle`, com origem em `center`."""
+    dx, dy = x - center[0], y - center[1]
+    return dx * np.cos(angle) + dy * np.sin(angle), -dx * np.sin(angle) + dy * np.cos(angle)
+
+def _layer_range(rng, nz, max_thickness):
+    """Intervalo aleatório [k0, k1) de camadas com espessura de 1 a `max_thickness`."""
+    thickness = int(rng.integers(1, max(1, min(nz, max_thickness)) + 1))
+    k0 = int(rng.integers(0, nz - thickness + 1))
+    return k0, k0 + thickness
+
+def _runs_along_y(ids):
+    """
+    Sequências de valores iguais e não nulos ao longo do eixo Y de um array (nx, ny, nz).
+    
+    Returns
+    -------
+    tuple
+        (k, i, j_start, j_stop, value) de cada sequência, com `j_stop` exclusivo.
+    """
+    nx, ny, nz = ids.shape
+    flat = np.ascontiguousarray(ids.transpose(2, 0, 1)).reshape(-1)
+    boundary = np.ones(flat.size, dtype=bool)
+    boundary[1:] = flat[1:] != flat[:-1]
+    boundary[::ny] = True
+    starts = np.flatnonzero(boundary)
+    stops = np.append(starts[1:], flat.size)
+    keep = flat[starts] != 0
+    starts, stops = starts[keep], stops[keep]
+    layers, rows = np.divmod(starts // ny, nx)
+    return layers, rows, starts % ny, (stops - 1) % ny + 1, flat[starts]
+
+def active_region(nx, ny, nz, seed=0, n_notches=3, n_holes=4, n_faults=2, roughness=0.15):
+    """
+    Máscara das células ativas de um reservatório sintético.
+    
+    O contorno de cada camada é uma elipse deformada por alguns modos de Fourier aleatórios,
+    um pouco menor nas camadas do topo e da base. São então aplicados o rejeito das falhas (as
+    camadas de um lado de cada falha, ao longo de um segmento, são deslocadas em Z), furos
+    elípticos de células inativas em algumas camadas e entalhes em cunha a partir do contorno.
+    Como nos simuladores, as regiões isoladas são desativadas: apenas o maior componente
+    conectado (6 vizinhos) é mantido, de modo que a projeção em Z também é conectada.
+    
+    Parameters
+    ----------
+    nx, ny, nz : int
+        Dimensões da malha.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório. Valor padrão é 0.
+    n_notches, n_holes, n_faults : int, optional
+        Número de entalhes, furos e falhas.
+    roughness : float, optional
+        Amplitude relativa das deformações do contorno. Valor padrão é 0.15.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array booleano (nx, ny, nz).
+    """
+    rng = np.random.default_rng(seed)
+    x, y = _normalized_coordinates(nx, ny)
+    radius, angle = np.hypot(x, y), np.arctan2(y, x)
+    
+    # Contorno: elipse deformada, 10% menor nas camadas extremas
+    outline = np.full(x.shape, 0.9)
+    for mode in range(2, 6):
+        outline += 0.9 * roughness / mode * rng.uniform(-1, 1) * np.cos(mode * angle + rng.uniform(0, 2 * np.pi))
+    scale = 1 - 0.1 * np.abs(2 * (np.arange(nz) + 0.5) / nz - 1)
+    active = radius[:, :, None] < outline[:, :, None] * scale
+    
+    # Falhas: rejeito de 1 a nz / 4 camadas de um lado do traço, ao longo de um segmento
+    for _ in range(n_faults):
+        center = rng.uniform(-0.5, 0.5, 2)
+        along, across = _rotated(x, y, center, rng.uniform(0, np.pi))
+        segment = np.abs(along) < rng.uniform(0.6, 1.2)
+        throw = int(rng.integers(1, max(1, nz // 4) + 1))
+        if throw < nz:
+            shifted = np.zeros_like(active)
+            shifted[:, :, throw:] = active[:, :, :-throw]
+            active = np.where(((across > 0) & segment)[:, :, None], shifted, active)
+    
+    # Furos elípticos em algumas camadas
+    for _ in range(n_holes):
+        u, v = _rotated(x, y, rng.uniform(-0.6, 0.6, 2), rng.uniform(0, np.pi))
+        hole = (u / rng.uniform(0.04, 0.12)) ** 2 + (v / rng.uniform(0.03, 0.08)) ** 2 < 1
+        k0, k1 = _layer_range(rng, nz, nz)
+        active[:, :, k0:k1] &= ~hole[:, :, None]
+    
+    # Entalhes em cunha a partir do contorno
+    for _ in range(n_notches):
+        offset = np.abs((angle - rng.uniform(-np.pi, np.pi) + np.pi) % (2 * np.pi) - np.pi)
+        notch = (offset < rng.uniform(0.15, 0.35)) & (radius > outline * (1 - rng.uniform(0.1, 0.25)))
+        active &= ~notch[:, :, None]
+    
+    components, n_components = conn.label_components(active)
+    if n_components > 1:
+        active = components == np.argmax(np.bincount(components[active]))
+    return active
+
+def channel_mask(active, seed=0, n_channels=3):
+    """
+    Canais sinuosos: faixas de largura variável em torno de uma linha central senoidal, em
+    algumas camadas consecutivas.
+    
+    Parameters
+    ----------
+    active : numpy.ndarray
+        Máscara (nx, ny, nz) das células ativas; os canais são restritos a ela.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório. Valor padrão é 0.
+    n_channels : int, optional
+        Número de canais. Valor padrão é 3.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array booleano (nx, ny, nz) das células de canal.
+    """
+    rng = np.random.default_rng(seed)
+    nx, ny, nz = active.shape
+    x, y = _normalized_coordinates(nx, ny)
+    cell = max(2 / nx, 2 / ny)
+    channels = np.zeros(active.shape, dtype=bool)
+    for _ in range(n_channels):
+        along, across = _rotated(x, y, rng.uniform(-0.3, 0.3, 2), rng.uniform(0, np.pi))
+        centerline = rng.uniform(0.05, 0.2) * np.sin(2 * np.pi * rng.uniform(0.5, 1.5) * along + rng.uniform(0, 2 * np.pi))
+        width = np.maximum(rng.uniform(0.02, 0.05) * (1 + 0.5 * np.cos(3 * along)), cell)
+        k0, k1 = _layer_range(rng, nz, max(1, nz // 3))
+        channels[:, :, k0:k1] |= (np.abs(across - centerline) < width)[:, :, None]
+    return channels & active
+
+def refinement_patches(active, channels=None, seed=0, n_wells=4, patches_per_well=5, channel_factors=(1, 2, 1)):
+    """
+    Regiões de refinamento agrupadas em torno de poços, mais o refinamento dos canais.
+    
+    Os poços são colunas ativas sorteadas; em torno de cada um são colocadas caixas de
+    refinamento com centros de distribuição normal, fatores 2 ou 3 em X e Y e 1 ou 2 em Z. As
+    caixas têm prioridade sobre os canais e, entre si, a última prevalece, de modo que as
+    regiões resultantes são disjuntas.
+    
+    Parameters
+    ----------
+    active : numpy.ndarray
+        Máscara (nx, ny, nz) das células ativas.
+    channels : numpy.ndarray, optional
+        Máscara das células de canal, refinadas com `channel_factors`.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório. Valor padrão é 0.
+    n_wells : int, optional
+        Número de poços (agrupamentos de caixas). Valor padrão é 4.
+    patches_per_well : int, optional
+        Número de caixas por poço. Valor padrão é 5.
+    channel_factors : tuple, optional
+        Fatores (factor_i, factor_j, factor_k) das células de canal. Valor padrão é (1, 2, 1).
+    
+    Returns
+    -------
+    tuple
+        (table, wells) onde `table` é um array estruturado com os campos de
+        `mesh3d.REFINEMENT_INTERVAL_DTYPE` (uma entrada por sequência ao longo de Y) e `wells`
+        é um array (n_wells, 2) com as colunas (i, j) dos poços.
+    """
+    rng = np.random.default_rng(seed)
+    nx, ny, nz = active.shape
+    columns = np.flatnonzero(active.any(axis=2))
+    wells = np.column_stack(np.unravel_index(
+        rng.choice(columns, size=min(n_wells, len(columns)), replace=False), (nx, ny)))
+    
+    # Identificador da região de cada célula: 0 sem refinamento, 1 canal, 2... caixas
+    ids = np.zeros(active.shape, dtype=np.int32)
+    factors = [(1, 1, 1), tuple(channel_factors)]
+    if channels is not None:
+        ids[channels] = 1
+    spread = max(1.0, 0.05 * min(nx, ny))
+    for well in wells:
+        for _ in range(patches_per_well):
+            ci, cj = np.clip(np.round(well + rng.normal(0, spread, 2)).astype(int), 0, (nx - 1, ny - 1))
+            hi, hj = rng.integers(1, max(1, int(spread)) + 1, 2)
+            k0, k1 = _layer_range(rng, nz, nz)
+            factors.append((int(rng.integers(2, 4)), int(rng.integers(2, 4)), int(rng.integers(1, 3))))
+            ids[max(0, ci - hi):ci + hi + 1, max(0, cj - hj):cj + hj + 1, k0:k1] = len(factors) - 1
+    ids[~active] = 0
+    
+    layers, rows, starts, stops, values = _runs_along_y(ids)
+    factors = np.array(factors, dtype=np.int64)
+    table = np.zeros(len(values), dtype=m3d.REFINEMENT_INTERVAL_DTYPE)
+    table['k'], table['i'], table['j_start'], table['j_end'] = layers, rows, starts, stops - 1
+    table['factor_i'], table['factor_j'], table['factor_k'] = factors[values].T
+    return table, wells
+
+def active_intervals(active):
+    """
+    Intervalos ativos de uma máscara, no formato de `create_3d_mesh` e `IntervalMesh.from_intervals`.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array estruturado com os campos de `mesh3d.ACTIVE_INTERVAL_DTYPE` (`j_end` exclusivo).
+    """
+    layers, rows, starts, stops, _ = _runs_along_y(np.asarray(active, dtype=np.int8))
+    table = np.zeros(len(rows), dtype=m3d.ACTIVE_INTERVAL_DTYPE)
+    table['k'], table['i'], table['j_start'], table['j_end'] = layers, rows, starts, stops
+    return table
+
+def synthetic_reservoir(nx, ny, nz, seed=0, n_notches=3, n_holes=4, n_faults=2, n_channels=3, n_wells=4,
+                        patches_per_well=5, dtype=np.int32):
+    """
+    Gera um reservatório sintético completo: malha, refinamento e mapa de pesos.
+    
+    A malha é criada com `mesh3d.create_3d_mesh` a partir dos intervalos de `active_region` e
+    refinada com `mesh3d.refine_mesh` pelas regiões de `refinement_patches`; o mapa de pesos é
+    a projeção em Z da malha refinada (`mesh3d.compute_weight_array`).
+    
+    Parameters
+    ----------
+    nx, ny, nz : int
+        Dimensões da malha.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório; a mesma semente reproduz o mesmo reservatório.
+    n_notches, n_holes, n_faults : int, optional
+        Estrutura das regiões inativas (ver `active_region`).
+    n_channels : int, optional
+        Número de canais (ver `channel_mask`).
+    n_wells, patches_per_well : int, optional
+        Agrupamentos de refinamento (ver `refinement_patches`).
+    dtype : numpy.dtype, optional
+        Tipo das malhas. Valor padrão é `int32`.
+    
+    Returns
+    -------
+    dict
+        {'mesh', 'refined', 'weights', 'channels', 'wells', 'intervals', 'refinement'}: malha
+        ativa (0/1), malha refinada, mapa de pesos 2D, máscara dos canais, colunas dos poços e as
+        tabelas de intervalos ativos e de refinamento.
+    """
+    rng = np.random.default_rng(seed)
+    active = active_region(nx, ny, nz, rng, n_notches, n_holes, n_faults)
+    channels = channel_mask(active, rng, n_channels)
+    refinement, wells = refinement_patches(active, channels, rng, n_wells, patches_per_well)
+    intervals = active_intervals(active)
+    
+    mesh = m3d.create_3d_mesh(nx, ny, nz, intervals, dtype=dtype)
+    refined = m3d.refine_mesh(mesh, refinement)
+    return {'mesh': mesh, 'refined': refined, 'weights': m3d.compute_weight_array(refined),
+            'channels': channels, 'wells': wells, 'intervals': intervals, 'refinement': refinement}
+
+def implicit_cells(reservoir, n_steps, seed=0, front_width=0.05, well_radius=0.04, channel_speedup=2.0,
+                   noise=0.002):
+    """
+    Células implícitas do AIM em cada passo de tempo.
+    
+    A frente de saturação parte dos poços e avança com a raiz do tempo; a distância percorrida
+    é a distância ao poço mais próximo, dividida por (1 + `channel_speedup`) nas células de canal.
+    São implícitas as células ativas na faixa da frente, as vizinhas dos poços e uma pequena
+    fração aleatória (trocas de estabilidade).
+    
+    Parameters
+    ----------
+    reservoir : dict
+        Saída de `synthetic_reservoir` (usa 'mesh', 'channels' e 'wells').
+    n_steps : int
+        Número de passos de tempo.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório. Valor padrão é 0.
+    front_width : float, optional
+        Meia largura da faixa da frente, em coordenadas normalizadas. Valor padrão é 0.05.
+    well_radius : float, optional
+        Raio das regiões sempre implícitas em torno dos poços. Valor padrão é 0.04.
+    channel_speedup : float, optional
+        Aceleração relativa da frente nos canais. Valor padrão é 2.0.
+    noise : float, optional
+        Probabilidade de uma célula ativa qualquer ser implícita. Valor padrão é 0.002.
+    
+    Yields
+    ------
+    numpy.ndarray
+        Máscara booleana (nx, ny, nz) das células implícitas do passo.
+    """
+    rng = np.random.default_rng(seed)
+    active = np.asarray(reservoir['mesh']) > 0
+    nx, ny, nz = active.shape
+    x, y = _normalized_coordinates(nx, ny)
+    wells = np.asarray(reservoir['wells']).reshape(-1, 2)
+    
+    distance = np.full(x.shape, np.inf)
+    for i, j in wells:
+        distance = np.minimum(distance, np.hypot(x - x[i, j], y - y[i, j]))
+    travel = (distance[:, :, None] / np.where(reservoir['channels'], 1 + channel_speedup, 1.0)).astype(np.float32)
+    reach = float(travel[active].max()) if active.any() and len(wells) else 0.0
+    
+    for step in range(n_steps):
+        front = reach * np.sqrt((step + 1) / n_steps)
+        implicit = (np.abs(travel - front) < front_width) | (travel < well_radius)
+        implicit |= rng.random(active.shape, dtype=np.float32) < noise
+        yield implicit & active
+
+def _stack(out, n_steps, shape, dtype):
+    """Array (n_steps, nx, ny) em memória ou, se `out` for um caminho, em um `.npy` mapeado."""
+    if out is None:
+        return np.empty((n_steps,) + shape, dtype=dtype)
+    return np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=(n_steps,) + shape)
+
+def aim_implicit_fractions(reservoir, n_steps, seed=0, out=None, **options):
+    """
+    Fração implícita de cada coluna em cada passo: células implícitas sobre células ativas.
+    
+    Parameters
+    ----------
+    reservoir : dict
+        Saída de `synthetic_reservoir`.
+    n_steps : int
+        Número de passos de tempo.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório. Valor padrão é 0.
+    out : str, optional
+        Caminho de um `.npy` gravado passo a passo (sem manter a série na memória).
+    **options
+        Parâmetros da frente (ver `implicit_cells`).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array `float32` (n_steps, nx, ny) com valores em [0, 1] (0 nas colunas sem células
+        ativas); um `numpy.memmap` se `out` for dado.
+    """
+    active = np.asarray(reservoir['mesh']) > 0
+    counts = np.maximum(active.sum(axis=2), 1)
+    fractions = _stack(out, n_steps, active.shape[:2], np.float32)
+    for step, implicit in enumerate(implicit_cells(reservoir, n_steps, seed, **options)):
+        fractions[step] = implicit.sum(axis=2) / counts
+    if out is not None:
+        fractions.flush()
+    return fractions
+
+def aim_weight_maps(reservoir, n_steps, seed=0, implicit_cost=4.0, out=None, **options):
+    """
+    Mapas de pesos de cada passo com o custo das células implícitas.
+    
+    O peso de uma coluna é a soma, em Z, da malha refinada multiplicada por `implicit_cost` nas
+    células implícitas, isto é, o mapa de `synthetic_reservoir` com o custo extra do AIM.
+    
+    Parameters
+    ----------
+    reservoir : dict
+        Saída de `synthetic_reservoir`.
+    n_steps : int
+        Número de passos de tempo.
+    seed : int or numpy.random.Generator, optional
+        Semente ou gerador aleatório (a mesma de `aim_implicit_fractions` gera as mesmas frentes).
+    implicit_cost : float, optional
+        Custo relativo de uma célula implícita. Valor padrão é 4.0.
+    out : str, optional
+        Caminho de um `.npy` gravado passo a passo.
+    **options
+        Parâmetros da frente (ver `implicit_cells`).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Array `float64` (n_steps, nx, ny); um `numpy.memmap` se `out` for dado.
+    
+    Examples
+    --------
+    >>> weights = aim_weight_maps(reservoir, 100, out='pesos.npy')
+    >>> state = ppb.PartitionState(weights[0]).partition(64)
+    """
+    refined = np.asarray(reservoir['refined'], dtype=float)
+    weights = _stack(out, n_steps, refined.shape[:2], np.float64)
+    for step, implicit in enumerate(implicit_cells(reservoir, n_steps, seed, **options)):
+        weights[step] = (refined * np.where(implicit, implicit_cost, 1.0)).sum(axis=2)
+    if out is not None:
+        weights.flush()
+    return weights
+
+def save_reservoir(reservoir, directory):
+    """
+    Grava os arrays de um reservatório como arquivos `.npy` em um diretório.
+    
+    Parameters
+    ----------
+    reservoir : dict
+        Saída de `synthetic_reservoir`.
+    directory : str
+        Diretório de saída (criado se não existir).
+    
+    Returns
+    -------
+    dict
+        Caminho do arquivo de cada array ('mesh.npy', 'weights.npy', ...).
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name in RESERVOIR_ARRAYS:
+        paths[name] = os.path.join(directory, name + '.npy')
+        np.save(paths[name], reservoir[name])
+    return paths
+
+def load_reservoir(directory, mmap_mode='r'):
+    """
+    Lê um reservatório gravado por `save_reservoir`, por padrão com os arrays mapeados.
+    
+    Returns
+    -------
+    dict
+        Arrays do reservatório, com as mesmas chaves de `synthetic_reservoir`.
+    """
+    return {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in RESERVOIR_ARRAYS}